@@ -1,8 +1,25 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
-from model import LoanPredictor
+from model import LoanPredictor, current_rss_mb
+from feature_pipeline import UnknownCategoryError
+from metrics import MetricsRegistry, SIZE_BUCKETS, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from prediction_cache import PredictionCache
+from jobs import JobManager, JobQueueFull
+from registry import ModelRegistry, FAILED, IDLE, NOT_TRAINED
+from scorer_pool import ScorerPool
+from micro_batcher import MicroBatcher
+import columnar
 import pandas as pd
+import csv
+import functools
+import hmac
+import io
+import json
+import math
 import os
+import shutil
+import tempfile
+import time
 
 app = Flask(__name__)
 
@@ -25,16 +42,222 @@ CORS(app, resources={
 })
 
 
-# Initialize predictor
-predictor = LoanPredictor()
+# Streaming batch scoring (?stream=ndjson|csv)
+STREAM_CHUNK_ROWS = int(os.getenv('STREAM_CHUNK_ROWS', 5000))
+STREAM_MIMETYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+STREAM_CSV_COLUMNS = ['loan_id', 'prediction', 'probability', 'confidence', 'error']
 
-# Load model if it exists
-model_dir = 'models'
-if os.path.exists(os.path.join(model_dir, 'loan_model.pkl')):
-    predictor.load_model(model_dir)
-    print("Model loaded successfully!")
-else:
-    print("No trained model found. Please train the model first.")
+# Predictor settings
+# CASCADE_MARGIN enables the distilled fast path (e.g. 0.8)
+cascade_margin = os.getenv('CASCADE_MARGIN')
+# UNKNOWN_CATEGORY: what an unseen category value encodes to (first, default, error)
+unknown_category = os.getenv('UNKNOWN_CATEGORY', 'first')
+# PREDICTION_CACHE_SIZE=0 turns the single-prediction cache off
+cache_size = int(os.getenv('PREDICTION_CACHE_SIZE', 10000))
+prediction_cache = PredictionCache(
+    maxsize=cache_size,
+    ttl=float(os.getenv('PREDICTION_CACHE_TTL', 300)),
+) if cache_size > 0 else None
+
+# Prometheus-style metrics served at /metrics
+metrics = MetricsRegistry()
+REQUESTS = metrics.counter(
+    'loan_api_requests_total', 'HTTP requests handled', ('endpoint', 'method', 'status'))
+REQUEST_ERRORS = metrics.counter(
+    'loan_api_request_errors_total', 'HTTP requests answered with a 5xx status', ('endpoint',))
+REQUEST_LATENCY = metrics.histogram(
+    'loan_api_request_duration_seconds', 'Time to produce a response (excludes streamed bodies)', ('endpoint',))
+STAGE_LATENCY = metrics.histogram(
+    'loan_predict_stage_duration_seconds', 'Time spent in each prediction stage', ('stage',))
+BATCH_SIZE = metrics.histogram(
+    'loan_batch_size_rows', 'Rows per batch scoring call', ('source',), buckets=SIZE_BUCKETS)
+MICROBATCH_SIZE = metrics.histogram(
+    'loan_microbatch_size_requests', 'Single predictions scored together by the micro-batcher',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+MICROBATCH_WAIT = metrics.histogram(
+    'loan_microbatch_wait_seconds', 'Time a single prediction waited for its micro-batch to start scoring',
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.1, 0.5))
+UNKNOWN_CATEGORIES = metrics.counter(
+    'loan_unknown_category_values_total', 'Category values the encoders never saw', ('column',))
+COMPILED_FALLBACKS = metrics.counter(
+    'loan_model_compiled_fallbacks_total', 'Loaded models whose compiled backend failed its parity check')
+
+def _new_predictor():
+    predictor = LoanPredictor(
+        cascade_margin=float(cascade_margin) if cascade_margin else None,
+        cache=prediction_cache,
+        unknown_category=unknown_category,
+    )
+    predictor.stage_hook = lambda stage, seconds: STAGE_LATENCY.observe(seconds, stage=stage)
+    predictor.unknown_hook = lambda column, count: UNKNOWN_CATEGORIES.inc(count, column=column)
+    return predictor
+
+# SCORER_PROCESSES > 0 scores the ensemble in that many processes per worker,
+# all mapping one shared-memory copy of the model; concurrent requests are
+# batched together (SCORER_MAX_BATCH rows, waiting up to SCORER_MAX_WAIT_MS)
+scorer_processes = int(os.getenv('SCORER_PROCESSES', 0))
+scorer_pool = ScorerPool(
+    processes=scorer_processes,
+    max_batch=int(os.getenv('SCORER_MAX_BATCH', 64)),
+    max_wait_ms=float(os.getenv('SCORER_MAX_WAIT_MS', 1)),
+    timeout=float(os.getenv('SCORER_TIMEOUT', 30)),
+) if scorer_processes > 0 else None
+
+def _prepare_predictor(predictor):
+    """Runs on every loaded model before it goes live"""
+    stats = predictor.load_stats
+    if stats['backend'] != stats['backend_requested']:
+        check = stats['compiled_check']
+        COMPILED_FALLBACKS.inc()
+        app.logger.error(
+            "Compiled ensemble in %s disagrees with the model (max |diff| = %.2e, tolerance %.0e); "
+            "scoring with sklearn instead", predictor.model_dir, check['parity_error'], check['tolerance'])
+    if scorer_pool is not None:
+        scorer_pool.bind(predictor)
+
+# Model registry: tracks loading / ready / failed / not_trained
+# MODEL_BACKEND=compiled scores with the flattened-tree evaluator;
+# MODEL_DIR=models/compressed serves the compressed model (python model.py --compress)
+registry = ModelRegistry(
+    factory=_new_predictor,
+    model_dir=os.getenv('MODEL_DIR', 'models'),
+    backend=os.getenv('MODEL_BACKEND', 'sklearn'),
+    prepare=_prepare_predictor,
+    # A failed load is retried on a request after MODEL_RETRY_SECONDS
+    retry_seconds=float(os.getenv('MODEL_RETRY_SECONDS', 30)),
+)
+
+def _observe_microbatch(size, waits):
+    MICROBATCH_SIZE.observe(size)
+    for wait in waits:
+        MICROBATCH_WAIT.observe(wait)
+
+# MICROBATCH_MAX_WAIT_MS > 0 coalesces concurrent /api/predict requests: each
+# waits up to that long for others (at most MICROBATCH_MAX_BATCH) to share
+# one vectorised scoring call
+microbatch_wait_ms = float(os.getenv('MICROBATCH_MAX_WAIT_MS', 0))
+micro_batcher = MicroBatcher(
+    lambda records: registry.predictor.predict_records(records),
+    max_batch=int(os.getenv('MICROBATCH_MAX_BATCH', 64)),
+    max_wait_ms=microbatch_wait_ms,
+    workers=int(os.getenv('MICROBATCH_WORKERS', max(1, scorer_processes))),
+    observe=_observe_microbatch,
+) if microbatch_wait_ms > 0 else None
+
+# MODEL_LOAD_MODE=eager (default) loads at import time; under `gunicorn --preload`
+# that is once in the master, and workers fork with the model already in memory.
+# MODEL_LOAD_MODE=lazy loads on a background thread in each process instead,
+# starting with its first request.
+if os.getenv('MODEL_LOAD_MODE', 'eager') == 'eager':
+    registry.load()
+
+metrics.gauge('loan_model_ready', 'Whether the model is loaded and serving',
+              function=lambda: float(registry.ready))
+metrics.gauge('loan_model_version', 'Models loaded by this process (hot swaps included)',
+              function=lambda: registry.version)
+metrics.gauge('loan_model_load_seconds', 'Time the initial model load took',
+              function=lambda: registry.load_seconds)
+metrics.gauge('process_resident_memory_bytes', 'Resident memory of this process',
+              function=lambda: (current_rss_mb() or 0) * 1024 * 1024)
+if micro_batcher is not None:
+    metrics.gauge('loan_microbatch_max_wait_seconds', 'Longest a single prediction waits for its micro-batch to fill',
+                  function=lambda: micro_batcher.max_wait)
+    metrics.gauge('loan_microbatch_max_batch', 'Most single predictions scored together',
+                  function=lambda: micro_batcher.max_batch)
+if scorer_pool is not None:
+    metrics.gauge('loan_scorer_processes_alive', 'Scorer processes running for this worker',
+                  function=lambda: scorer_pool.status()['alive'])
+if prediction_cache is not None:
+    # Read from the cache's own totals, which clear() leaves alone
+    metrics.counter('loan_prediction_cache_hits_total', 'Prediction cache hits',
+                    function=lambda: prediction_cache.hits)
+    metrics.counter('loan_prediction_cache_misses_total', 'Prediction cache misses',
+                    function=lambda: prediction_cache.misses)
+    metrics.counter('loan_prediction_cache_evictions_total', 'Prediction cache LRU evictions',
+                    function=lambda: prediction_cache.evictions)
+
+def _score_job_chunk(chunk, offset):
+    BATCH_SIZE.observe(len(chunk), source='job')
+    return _prediction_records(_loan_ids(chunk, offset), registry.predictor.predict_many(chunk))
+
+# Background batch jobs, scored on a bounded thread pool sharing the loaded predictor
+job_manager = JobManager(
+    _score_job_chunk,
+    jobs_dir=os.getenv('JOBS_DIR', os.path.join(tempfile.gettempdir(), 'loan-jobs')),
+    workers=int(os.getenv('JOB_WORKERS', 2)),
+    max_queued=int(os.getenv('JOB_QUEUE_DEPTH', 8)),
+    chunksize=STREAM_CHUNK_ROWS,
+)
+
+# MODEL_WATCH_INTERVAL (seconds) polls models/ and hot-swaps a newly saved model
+watch_interval = float(os.getenv('MODEL_WATCH_INTERVAL', 0))
+
+# Admin endpoints are disabled unless ADMIN_TOKEN is set
+admin_token = os.getenv('ADMIN_TOKEN')
+
+@app.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def _record_request(response):
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    start = g.get('request_start')
+    if start is not None:
+        REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
+    REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    if response.status_code >= 500:
+        REQUEST_ERRORS.inc(endpoint=endpoint)
+    return response
+
+@app.before_request
+def _start_background_tasks():
+    # Threads do not survive a fork, so these start per worker on first request
+    # A failed load (e.g. a bundle still being written) is retried once its backoff has passed
+    if registry.state in (IDLE, FAILED):
+        registry.load_in_background()
+    if watch_interval > 0:
+        registry.watch(watch_interval)
+
+def requires_admin(view):
+    """Reject the request unless it carries the X-Admin-Token header"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not admin_token:
+            return jsonify({'error': 'Admin endpoints are disabled'}), 403
+        if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token):
+            return jsonify({'error': 'Invalid admin token'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+def _model_unavailable():
+    """(payload, status, headers) to answer with unless the model is ready, else None"""
+    if registry.state == NOT_TRAINED:
+        return {'error': 'Model not loaded'}, 404, {}
+    if not registry.ready:
+        return {
+            'success': False,
+            'error': f'Model is not ready ({registry.state})',
+            'model_state': registry.state
+        }, 503, {'Retry-After': str(math.ceil(registry.retry_in() or 5))}
+    return None
+
+def requires_model(view):
+    """Answer straight away with 404/503 unless the model is ready"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        unavailable = _model_unavailable()
+        if unavailable:
+            payload, status, headers = unavailable
+            response = jsonify(payload)
+            response.headers.update(headers)
+            return response, status
+        return view(*args, **kwargs)
+    return wrapper
+
+def _flag(name):
+    """Read a boolean query-string flag such as ?timings=true"""
+    return request.args.get(name, '').lower() in ('1', 'true', 'yes')
 
 @app.route('/', methods=['GET'])
 def home():
@@ -46,86 +269,362 @@ def home():
             'health': '/api/health',
             'predict': '/api/predict',
             'batch_predict': '/api/predict-batch',
+            'bulk_predict': '/api/predict-bulk',
             'model_info': '/api/model-info',
-            'feature_info': '/api/feature-info'
+            'feature_info': '/api/feature-info',
+            'cache_stats': '/api/cache-stats',
+            'jobs': '/api/jobs',
+            'metrics': '/metrics'
         }
     })
 
-@app.route('/api/health', methods=['GET'])
-def health_check():
-    """Health check endpoint"""
-    return jsonify({
+# ─── Route logic shared with the ASGI entry point (asgi.py) ─────────── #
+# Each returns (payload, status); the front ends only parse and serialise.
+
+def _health_result(ready_only=False):
+    if ready_only and not registry.ready:
+        return {
+            'status': 'unavailable',
+            'model_loaded': False,
+            'model': registry.status()
+        }, 503
+    
+    response = {
         'status': 'healthy',
-        'model_loaded': predictor.model is not None
-    })
+        'model_loaded': registry.ready,
+        'model': registry.status()
+    }
+    if scorer_pool is not None:
+        response['scorers'] = scorer_pool.status()
+    if micro_batcher is not None:
+        response['micro_batching'] = micro_batcher.stats()
+    return response, 200
 
-@app.route('/api/predict', methods=['POST'])
-def predict():
-    """Single prediction endpoint"""
+def _predict_result(data, timings=None, explain=False):
+    """/api/predict for a parsed JSON body; pass a dict as timings for ?timings=true"""
     try:
-        data = request.json
+        predictor = registry.predictor
         
         if not data:
-            return jsonify({'error': 'No data provided'}), 400
+            return {'error': 'No data provided'}, 400
         
-        # Make prediction
-        result = predictor.predict(data)
+        if not isinstance(data, dict):
+            # A list would silently be scored as its first application only
+            return {
+                'success': False,
+                'error': 'Body must be one application as a JSON object; '
+                         'use /api/predict-bulk or /api/predict-batch for several'
+            }, 400
         
-        return jsonify({
+        # Make prediction, sharing a scoring call with concurrent requests if enabled
+        if micro_batcher is not None and timings is None and not explain:
+            result = micro_batcher.submit(data)
+        else:
+            result = predictor.predict(data, timings=timings, explain=explain)
+        
+        response = {
             'success': True,
             'data': result
-        })
+        }
+        if timings is not None:
+            response['meta'] = {'timings_ms': timings}
+        return response, 200
     
+    except UnknownCategoryError as e:
+        # UNKNOWN_CATEGORY=error: the application itself is invalid
+        return {
+            'success': False,
+            'error': str(e)
+        }, 400
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 500
+
+def _upload_error(file):
+    """(payload, status) rejecting an uploaded CSV file, or None if it is usable"""
+    if file is None:
+        return {'error': 'No file provided'}, 400
+    
+    if file.filename == '':
+        return {'error': 'No file selected'}, 400
+    
+    if not file.filename.endswith('.csv'):
+        return {'error': 'File must be a CSV'}, 400
+    
+    return None
+
+def _stream_options(args):
+    """(stream format or '', chunk size) of a batch request, or raise ValueError"""
+    stream_format = args.get('stream', '').lower()
+    if not stream_format:
+        return '', None
+    if stream_format not in STREAM_MIMETYPES:
+        raise ValueError('stream must be ndjson or csv')
+    if stream_format == 'csv' and args.get('explain', '').lower() in ('1', 'true', 'yes'):
+        raise ValueError('explain is not available with stream=csv; use stream=ndjson')
+    # Checked here so a bad value is a 400, not a stream that breaks after its headers
+    try:
+        chunksize = int(args.get('chunksize', STREAM_CHUNK_ROWS))
+    except ValueError:
+        raise ValueError('chunksize must be an integer')
+    if chunksize < 1:
+        raise ValueError('chunksize must be at least 1')
+    return stream_format, chunksize
+
+def _batch_result(file, explain=False):
+    """/api/predict-batch (without ?stream) for an uploaded CSV file"""
+    try:
+        predictor = registry.predictor
+        
+        # Read CSV
+        df = pd.read_csv(file)
+        
+        # Make predictions (single vectorised pass, errors reported per row)
+        BATCH_SIZE.observe(len(df), source='batch')
+        predictions = _prediction_records(_loan_ids(df), predictor.predict_many(df, explain=explain))
+        
+        return {
+            'success': True,
+            'total': len(predictions),
+            'predictions': predictions
+        }, 200
+    
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 500
+
+def _bulk_result(data, requested_format='', accept=''):
+    """
+    /api/predict-bulk for a parsed JSON body: (body, status, mimetype), where
+    body is a JSON payload when mimetype is None and encoded bytes otherwise
+    """
+    try:
+        fmt = columnar.negotiate(requested_format, accept)
+        df, loan_ids = columnar.frame_from_columns(data)
+    except columnar.UnsupportedFormat as e:
+        return {'success': False, 'error': str(e)}, 406, None
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}, 400, None
+    
+    try:
+        BATCH_SIZE.observe(len(df), source='bulk')
+        result = columnar.result_columns(registry.predictor.predict_columns(df), loan_ids)
+        if fmt != 'json':
+            return columnar.encode(result, fmt), 200, columnar.FORMATS[fmt]
+        return {
+            'success': True,
+            'total': len(df),
+            'columns': columnar.to_lists(result)
+        }, 200, None
+    
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 500, None
+
+def _model_info_result():
+    stats = registry.predictor.load_stats
+    return {
+        'success': True,
+        'metrics': registry.predictor.model_metrics,
+        # Scoring backend in use; differs from 'requested' after a failed compiled parity check
+        'backend': {
+            'active':         stats['backend'],
+            'requested':      stats['backend_requested'],
+            'compiled_check': stats['compiled_check'],
+        }
+    }, 200
+
+def _feature_info_result():
+    predictor = registry.predictor
+    return {
+        'success': True,
+        'features': predictor.feature_columns,
+        'total_features': len(predictor.feature_columns),
+        # Raw application fields, in the order positional bulk columns use
+        'inputs': columnar.INPUT_COLUMNS
+    }, 200
+
+# ───────────────────────────────────────────────────────────────────── #
+
+@app.route('/api/health', methods=['GET'])
+def health_check():
+    """Health check endpoint (?ready=true answers 503 until the model is loaded)"""
+    payload, status = _health_result(_flag('ready'))
+    return jsonify(payload), status
+
+@app.route('/api/predict', methods=['POST'])
+@requires_model
+def predict():
+    """Single prediction endpoint"""
+    try:
+        start = time.perf_counter()
+        data = request.json
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage='parse')
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
+    
+    # Per-sub-model latency breakdown (?timings=true) and feature contributions (?explain=true) on request
+    payload, status = _predict_result(data, {} if _flag('timings') else None, _flag('explain'))
+    
+    start = time.perf_counter()
+    response = jsonify(payload)
+    STAGE_LATENCY.observe(time.perf_counter() - start, stage='serialize')
+    return response, status
+
+def _uploaded_csv():
+    """The uploaded CSV file, or (None, error response) if the upload is invalid"""
+    file = request.files.get('file')
+    error = _upload_error(file)
+    if error:
+        payload, status = error
+        return None, (jsonify(payload), status)
+    return file, None
+
+def _loan_ids(df, offset=0):
+    """Loan_IDs of a frame, or running row numbers when the column is absent"""
+    if 'Loan_ID' not in df.columns:
+        return list(range(offset, offset + len(df)))
+    return df['Loan_ID'].astype(object).where(df['Loan_ID'].notna(), None).tolist()
+
+def _prediction_records(loan_ids, results):
+    """Shape predict_many results into the batch response records"""
+    records = []
+    for loan_id, result in zip(loan_ids, results):
+        if 'error' in result:
+            records.append({
+                'loan_id': loan_id,
+                'prediction': 'Error',
+                'error': result['error']
+            })
+        else:
+            records.append({
+                'loan_id': loan_id,
+                'prediction': result['prediction'],
+                'probability': result['probability'],
+                'confidence': result['confidence']
+            })
+            if 'explanation' in result:
+                records[-1]['explanation'] = result['explanation']
+    return records
+
+def _stream_predictions(predictor, file, stream_format, chunksize, explain=False):
+    """Score an uploaded CSV chunk by chunk, yielding NDJSON lines or CSV rows"""
+    def encode(records):
+        buffer = io.StringIO()
+        if stream_format == 'csv':
+            writer = csv.DictWriter(buffer, fieldnames=STREAM_CSV_COLUMNS, lineterminator='\n')
+            writer.writerows(records)
+        else:
+            for record in records:
+                buffer.write(json.dumps(record) + '\n')
+        return buffer.getvalue()
+
+    if stream_format == 'csv':
+        yield ','.join(STREAM_CSV_COLUMNS) + '\n'
+    
+    offset = 0
+    try:
+        for chunk in pd.read_csv(file, chunksize=chunksize):
+            BATCH_SIZE.observe(len(chunk), source='stream')
+            records = _prediction_records(_loan_ids(chunk, offset), predictor.predict_many(chunk, explain=explain))
+            offset += len(chunk)
+            yield encode(records)
+    except Exception as e:
+        # Headers are already sent; report the failure in-band, encoded like any other row
+        yield encode([{'loan_id': offset, 'prediction': 'Error', 'error': str(e)}])
+    finally:
+        file.close()
 
 @app.route('/api/predict-batch', methods=['POST'])
+@requires_model
 def predict_batch():
     """Batch prediction endpoint for CSV files"""
     try:
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file provided'}), 400
-        
-        file = request.files['file']
+        predictor = registry.predictor
+        file, error = _uploaded_csv()
+        if error:
+            return error
         
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
+        # Streaming mode: read in chunks and send rows back as they are scored
+        try:
+            stream_format, chunksize = _stream_options(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if stream_format:
+            # The upload is closed with the request, before the body is streamed;
+            # hand the generator its own on-disk copy (copied in fixed-size blocks)
+            upload = tempfile.TemporaryFile()
+            shutil.copyfileobj(file.stream, upload)
+            upload.seek(0)
+            return Response(
+                stream_with_context(_stream_predictions(predictor, upload, stream_format, chunksize, _flag('explain'))),
+                mimetype=STREAM_MIMETYPES[stream_format]
+            )
         
-        if not file.filename.endswith('.csv'):
-            return jsonify({'error': 'File must be a CSV'}), 400
-        
-        # Read CSV
-        df = pd.read_csv(file)
-        
-        # Store Loan_IDs if present
-        loan_ids = df['Loan_ID'].tolist() if 'Loan_ID' in df.columns else list(range(len(df)))
+        payload, status = _batch_result(file, _flag('explain'))
+        return jsonify(payload), status
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/predict-bulk', methods=['POST'])
+@requires_model
+def predict_bulk():
+    """Bulk prediction endpoint for column-oriented JSON (?format=json|arrow|msgpack)"""
+    try:
+        start = time.perf_counter()
+        data = request.get_json()
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage='parse')
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    body, status, mimetype = _bulk_result(data, request.args.get('format', ''), request.headers.get('Accept', ''))
+    
+    start = time.perf_counter()
+    response = jsonify(body) if mimetype is None else Response(body, mimetype=mimetype)
+    STAGE_LATENCY.observe(time.perf_counter() - start, stage='serialize')
+    return response, status
+
+@app.route('/api/jobs', methods=['POST'])
+@requires_model
+def create_job():
+    """Queue a CSV for background scoring"""
+    try:
+        file, error = _uploaded_csv()
+        if error:
+            return error
         
-        # Make predictions
-        predictions = []
-        for idx, row in df.iterrows():
-            try:
-                result = predictor.predict(row.to_dict())
-                predictions.append({
-                    'loan_id': loan_ids[idx],
-                    'prediction': result['prediction'],
-                    'probability': result['probability'],
-                    'confidence': result['confidence']
-                })
-            except Exception as e:
-                predictions.append({
-                    'loan_id': loan_ids[idx],
-                    'prediction': 'Error',
-                    'error': str(e)
-                })
+        job_id = job_manager.submit(file.stream)
         
         return jsonify({
             'success': True,
-            'total': len(predictions),
-            'predictions': predictions
+            'job_id': job_id,
+            'status_url': f'/api/jobs/{job_id}',
+            'result_url': f'/api/jobs/{job_id}/result'
+        }), 202
+    
+    except JobQueueFull as e:
+        response = jsonify({
+            'success': False,
+            'error': f'Job queue is full ({e}), retry later'
         })
+        response.headers['Retry-After'] = '5'
+        return response, 429
     
     except Exception as e:
         return jsonify({
@@ -133,17 +632,88 @@ def predict_batch():
             'error': str(e)
         }), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Progress of a background scoring job"""
+    state = job_manager.status(job_id)
+    if state is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify({
+        'success': True,
+        'job': state
+    })
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Results of a finished job, in the /api/predict-batch shape (or ?stream=ndjson)"""
+    state = job_manager.status(job_id)
+    if state is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    path = job_manager.result_path(job_id)
+    if path is None:
+        return jsonify({
+            'success': False,
+            'error': f"Job is {state['status']}",
+            'job': state
+        }), 409
+    
+    if request.args.get('stream', '').lower() == 'ndjson':
+        return send_file(path, mimetype=STREAM_MIMETYPES['ndjson'])
+    
+    with open(path) as f:
+        predictions = [json.loads(line) for line in f]
+    
+    return jsonify({
+        'success': True,
+        'total': len(predictions),
+        'predictions': predictions
+    })
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus text-format metrics for this worker"""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/api/admin/reload', methods=['POST'])
+@requires_admin
+def admin_reload():
+    """Load a model directory beside the live one, smoke-test it and swap it in"""
+    body = request.get_json(silent=True) or {}
+    model_dir = body.get('model_dir')
+    
+    if model_dir and not LoanPredictor.model_exists(model_dir):
+        return jsonify({'success': False, 'error': f'No model found in {model_dir}'}), 400
+    
+    # ?wait=true reloads in this request and reports the outcome
+    if _flag('wait'):
+        outcome = registry.reload(model_dir)
+        status = 200 if outcome['status'] == 'swapped' else 409
+        return jsonify({'success': status == 200, 'reload': outcome}), status
+    
+    registry.reload_in_background(model_dir)
+    return jsonify({
+        'success': True,
+        'message': 'Reload started',
+        'status_url': '/api/health'
+    }), 202
+
+@app.route('/api/admin/rollback', methods=['POST'])
+@requires_admin
+def admin_rollback():
+    """Swap the previously live model back in"""
+    outcome = registry.rollback()
+    status = 200 if outcome['status'] == 'rolled_back' else 409
+    return jsonify({'success': status == 200, 'reload': outcome}), status
+
 @app.route('/api/model-info', methods=['GET'])
+@requires_model
 def model_info():
     """Get model information and metrics"""
     try:
-        if predictor.model is None:
-            return jsonify({'error': 'Model not loaded'}), 404
-        
-        return jsonify({
-            'success': True,
-            'metrics': predictor.model_metrics
-        })
+        payload, status = _model_info_result()
+        return jsonify(payload), status
     
     except Exception as e:
         return jsonify({
@@ -152,17 +722,12 @@ def model_info():
         }), 500
 
 @app.route('/api/feature-info', methods=['GET'])
+@requires_model
 def feature_info():
     """Get feature information"""
     try:
-        if predictor.model is None:
-            return jsonify({'error': 'Model not loaded'}), 404
-        
-        return jsonify({
-            'success': True,
-            'features': predictor.feature_columns,
-            'total_features': len(predictor.feature_columns)
-        })
+        payload, status = _feature_info_result()
+        return jsonify(payload), status
     
     except Exception as e:
         return jsonify({
@@ -170,6 +735,18 @@ def feature_info():
             'error': str(e)
         }), 500
 
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """Prediction cache hit/miss/eviction counters"""
+    if prediction_cache is None:
+        return jsonify({'success': True, 'enabled': False})
+    
+    return jsonify({
+        'success': True,
+        'enabled': True,
+        'stats': prediction_cache.stats()
+    })
+
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
     app.run(debug=False, host='0.0.0.0', port=port)
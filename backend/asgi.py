@@ -0,0 +1,351 @@
+"""
+ASGI entry point: the prediction API served from an event loop.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+
+Serves ``/api/health``, ``/api/predict``, ``/api/predict-batch`` (with
+``?stream=``), ``/api/predict-bulk``, ``/api/model-info``,
+``/api/feature-info`` and ``/metrics``
+with the same responses as the Flask app, sharing its model registry,
+metrics and route logic (``app.py``). Admin, job and cache routes stay on
+the Flask app.
+
+Request bodies are read as they arrive: a multipart upload is decoded
+chunk by chunk into a spooled temporary file, so a slow client costs a
+suspended coroutine rather than a worker thread. Parsing the CSV and
+scoring are CPU-bound and run on a thread pool (``ASGI_SCORING_THREADS``).
+
+Only an ASGI server (uvicorn, hypercorn, ...) is needed on top of the
+backend's requirements.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from werkzeug.datastructures import FileStorage
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+import app as api
+
+# Largest JSON body accepted by /api/predict
+MAX_JSON_BYTES = int(os.getenv('ASGI_MAX_JSON_BYTES', 1024 * 1024))
+# Largest column-oriented body accepted by /api/predict-bulk
+MAX_BULK_BYTES = int(os.getenv('ASGI_MAX_BULK_BYTES', 64 * 1024 * 1024))
+# Uploads are kept in memory up to this size, then spill to disk
+SPOOL_BYTES = 1024 * 1024
+
+executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('ASGI_SCORING_THREADS', 0)) or None,
+    thread_name_prefix='asgi-scoring',
+)
+
+CORS_HEADERS = [(b'access-control-allow-origin', b'*')]
+PREFLIGHT_HEADERS = CORS_HEADERS + [
+    (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+    (b'access-control-allow-headers', b'Content-Type'),
+]
+
+
+class ClientDisconnected(Exception):
+    """The client went away before its request body was complete."""
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class Request:
+    def __init__(self, scope, receive):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = {k: v[-1] for k, v in parse_qs(scope['query_string'].decode('latin-1')).items()}
+        self.headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope['headers']}
+        self._receive = receive
+
+    def flag(self, name):
+        return self.args.get(name, '').lower() in ('1', 'true', 'yes')
+
+    async def chunks(self):
+        """Body chunks as the server receives them."""
+        while True:
+            message = await self._receive()
+            if message['type'] == 'http.disconnect':
+                raise ClientDisconnected()
+            yield message.get('body', b'')
+            if not message.get('more_body', False):
+                return
+
+    async def body(self, limit):
+        parts, size = [], 0
+        async for chunk in self.chunks():
+            size += len(chunk)
+            if size > limit:
+                raise BodyTooLarge()
+            parts.append(chunk)
+        return b''.join(parts)
+
+    async def upload(self, field):
+        """
+        The ``field`` file of a multipart/form-data body as a FileStorage
+        over a spooled temporary file, or None if there is no such part.
+        The caller closes it. Once the body is larger than SPOOL_BYTES the
+        file is on disk, and chunks are written from a thread instead of
+        the event loop.
+        """
+        content_type, options = parse_options_header(self.headers.get('content-type', ''))
+        if content_type != 'multipart/form-data' or not options.get('boundary'):
+            return None
+
+        decoder = MultipartDecoder(options['boundary'].encode('latin-1'))
+        upload, target = None, None
+
+        def drain():
+            nonlocal upload, target
+            event = decoder.next_event()
+            while not isinstance(event, (NeedData, Epilogue)):
+                if isinstance(event, File) and event.name == field and upload is None:
+                    target = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+                    upload = FileStorage(stream=target, filename=event.filename, name=field)
+                elif isinstance(event, (Field, File)):
+                    target = None
+                elif isinstance(event, Data) and target is not None:
+                    target.write(event.data)
+                event = decoder.next_event()
+
+        received = 0
+        try:
+            async for chunk in self.chunks():
+                decoder.receive_data(chunk)
+                received += len(chunk)
+                if received > SPOOL_BYTES:
+                    await asyncio.to_thread(drain)
+                else:
+                    drain()
+            decoder.receive_data(None)
+            drain()
+        except BaseException:
+            if upload is not None:
+                upload.close()
+            raise
+        if upload is not None:
+            upload.stream.seek(0)
+        return upload
+
+
+# ─────────────────────────────────────────────────────────────────────── #
+#  Responses
+# ─────────────────────────────────────────────────────────────────────── #
+async def _run(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+def _header_list(headers):
+    return [(k.lower().encode('latin-1'), str(v).encode('latin-1')) for k, v in (headers or {}).items()]
+
+
+async def send_bytes(send, body, content_type, status=200, headers=None):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type.encode()), (b'content-length', str(len(body)).encode())]
+                   + CORS_HEADERS + _header_list(headers),
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send, payload, status=200, headers=None):
+    await send_bytes(send, json.dumps(payload).encode(), 'application/json', status, headers)
+
+
+async def send_stream(send, chunks, content_type):
+    """Send pieces produced by the (blocking) iterator ``chunks`` as they are ready."""
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', content_type.encode())] + CORS_HEADERS,
+    })
+    try:
+        while True:
+            piece = await _run(next, chunks, None)
+            if piece is None:
+                break
+            await send({'type': 'http.response.body', 'body': piece.encode(), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        chunks.close()
+
+
+# ─────────────────────────────────────────────────────────────────────── #
+#  Routes
+# ─────────────────────────────────────────────────────────────────────── #
+async def health(request, send):
+    await send_json(send, *api._health_result(request.flag('ready')))
+
+
+async def predict(request, send):
+    try:
+        body = await request.body(MAX_JSON_BYTES)
+        start = time.perf_counter()
+        data = json.loads(body) if body else None
+        api.STAGE_LATENCY.observe(time.perf_counter() - start, stage='parse')
+    except BodyTooLarge:
+        return await send_json(send, {'success': False, 'error': 'Request body too large'}, 413)
+    except ValueError as e:
+        return await send_json(send, {'success': False, 'error': str(e)}, 500)
+
+    payload, status = await _run(api._predict_result, data, {} if request.flag('timings') else None,
+                                 request.flag('explain'))
+    await send_json(send, payload, status)
+
+
+async def predict_batch(request, send):
+    file = await request.upload('file')
+    # Closed here on every path; the stream generator closing it too is harmless
+    try:
+        error = api._upload_error(file)
+        if error:
+            return await send_json(send, *error)
+
+        try:
+            stream_format, chunksize = api._stream_options(request.args)
+        except ValueError as e:
+            return await send_json(send, {'error': str(e)}, 400)
+        if stream_format:
+            chunks = api._stream_predictions(api.registry.predictor, file.stream, stream_format, chunksize,
+                                             request.flag('explain'))
+            mimetype = api.STREAM_MIMETYPES[stream_format]
+            if mimetype.startswith('text/'):
+                mimetype += '; charset=utf-8'
+            return await send_stream(send, chunks, mimetype)
+
+        payload, status = await _run(api._batch_result, file, request.flag('explain'))
+    finally:
+        if file is not None:
+            file.close()
+    await send_json(send, payload, status)
+
+
+async def predict_bulk(request, send):
+    try:
+        body = await request.body(MAX_BULK_BYTES)
+    except BodyTooLarge:
+        return await send_json(send, {'success': False, 'error': 'Request body too large'}, 413)
+
+    def score():
+        start = time.perf_counter()
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}, 400, None
+        api.STAGE_LATENCY.observe(time.perf_counter() - start, stage='parse')
+        result = api._bulk_result(data, request.args.get('format', ''), request.headers.get('accept', ''))
+        if result[2] is None:
+            start = time.perf_counter()
+            result = json.dumps(result[0]).encode(), result[1], 'application/json'
+            api.STAGE_LATENCY.observe(time.perf_counter() - start, stage='serialize')
+        return result
+
+    # Parsing and encoding a large body is CPU work too; keep it off the event loop
+    payload, status, content_type = await _run(score)
+    if content_type is None:
+        return await send_json(send, payload, status)
+    await send_bytes(send, payload, content_type, status)
+
+
+async def model_info(request, send):
+    await send_json(send, *api._model_info_result())
+
+
+async def feature_info(request, send):
+    await send_json(send, *api._feature_info_result())
+
+
+async def metrics(request, send):
+    body = api.metrics.render().encode()
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', api.METRICS_CONTENT_TYPE.encode()), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+# path -> (method, handler, needs a ready model)
+ROUTES = {
+    '/api/health':        ('GET', health, False),
+    '/api/predict':       ('POST', predict, True),
+    '/api/predict-batch': ('POST', predict_batch, True),
+    '/api/predict-bulk':  ('POST', predict_bulk, True),
+    '/api/model-info':    ('GET', model_info, True),
+    '/api/feature-info':  ('GET', feature_info, True),
+    '/metrics':           ('GET', metrics, False),
+}
+
+
+async def _handle(request, send):
+    route = ROUTES.get(request.path)
+    if route is None:
+        return await send_json(send, {'error': 'Not found'}, 404)
+    method, handler, needs_model = route
+    if request.method == 'OPTIONS':
+        await send({'type': 'http.response.start', 'status': 200, 'headers': PREFLIGHT_HEADERS})
+        return await send({'type': 'http.response.body', 'body': b''})
+    if request.method != method:
+        return await send_json(send, {'error': 'Method not allowed'}, 405, {'Allow': f'{method}, OPTIONS'})
+
+    if needs_model:
+        unavailable = api._model_unavailable()
+        if unavailable:
+            return await send_json(send, *unavailable)
+    await handler(request, send)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            api._start_background_tasks()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    api._start_background_tasks()
+    request = Request(scope, receive)
+    endpoint = request.path if request.path in ROUTES else 'unmatched'
+    start = time.perf_counter()
+    status = None
+
+    async def record(message):
+        # Same request metrics as the Flask app, taken when the headers go out
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+            api.REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
+            api.REQUESTS.inc(endpoint=endpoint, method=request.method, status=status)
+            if status >= 500:
+                api.REQUEST_ERRORS.inc(endpoint=endpoint)
+        await send(message)
+
+    try:
+        await _handle(request, record)
+    except ClientDisconnected:
+        pass
+    except Exception as e:
+        if status is not None:
+            raise       # headers already sent; let the server drop the connection
+        await send_json(record, {'success': False, 'error': str(e)}, 500)
@@ -0,0 +1,400 @@
+"""
+Inference benchmark for the loan prediction API.
+
+Generates synthetic applications with the schema (and per-column value
+distribution) of the training CSV and measures:
+
+- model load time and RSS per artifact format (fresh interpreters)
+- p50/p90/p99 latency of POST /api/predict through the Flask test client,
+  plain and with ?explain=true
+- rows/sec of batch scoring, in-process (predict_many, plain and with
+  explanations) and through the streaming /api/predict-batch endpoint, at
+  several chunk sizes
+- throughput and latency under N concurrent clients
+- feature computation: rows/sec and bytes allocated per row of the
+  pandas preprocess_data path vs the compiled feature transformer
+- optionally, training time
+- peak RSS of the benchmark process
+
+Results are written as JSON so runs can be compared:
+
+    python benchmark.py --rows 1 1000 100000 --output before.json
+    python benchmark.py --rows 1 1000 100000 --output after.json --compare before.json
+
+Run it from backend/ against a trained model (python model.py). The
+prediction cache is off unless --cache is given, so repeated runs measure
+the model rather than cache hits.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+TRAIN_FILE = 'train_u6lujuX_CVtuZ9i.csv'
+# Numeric columns that get multiplicative jitter so synthetic rows are not exact copies
+JITTER_COLUMNS = ('ApplicantIncome', 'CoapplicantIncome', 'LoanAmount')
+
+
+# ─────────────────────────────────────────────────────────────────────── #
+#  Synthetic data
+# ─────────────────────────────────────────────────────────────────────── #
+def synthetic_applications(n, seed=0, source=TRAIN_FILE):
+    """
+    ``n`` applications with the columns of ``source`` (minus Loan_Status).
+    Every column is resampled from its observed values, missing values
+    included, so category and NaN frequencies match the training data.
+    """
+    rng = np.random.default_rng(seed)
+    train = pd.read_csv(source).drop(columns=['Loan_ID', 'Loan_Status'])
+
+    data = {'Loan_ID': [f'SYN{i:07d}' for i in range(n)]}
+    for col in train.columns:
+        numeric = pd.api.types.is_numeric_dtype(train[col])
+        values = train[col].to_numpy(dtype=float if numeric else object)
+        sample = values[rng.integers(0, len(values), n)]
+        if col in JITTER_COLUMNS:
+            sample = np.round(sample * np.exp(rng.normal(0.0, 0.1, n)))
+        data[col] = sample
+    return pd.DataFrame(data)
+
+
+def _records(df):
+    """JSON-safe dicts for /api/predict: missing values become null, as the form sends them."""
+    rows = df.drop(columns=['Loan_ID']).to_dict('records')
+    return [{k: None if pd.isna(v) else v for k, v in row.items()} for row in rows]
+
+
+def _percentiles(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {
+        'n': int(ms.size),
+        'mean_ms': float(ms.mean()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p90_ms': float(np.percentile(ms, 90)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max()),
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unavailable)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# ─────────────────────────────────────────────────────────────────────── #
+#  Benchmarks
+# ─────────────────────────────────────────────────────────────────────── #
+def bench_single(client, records, warmup=10, query=''):
+    """Sequential POST /api/predict, one distinct application per request."""
+    for record in records[:warmup]:
+        client.post('/api/predict' + query, json=record)
+    latencies = []
+    for record in records:
+        start = time.perf_counter()
+        response = client.post('/api/predict' + query, json=record)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/predict returned {response.status_code}: {response.get_data(as_text=True)}")
+    return _percentiles(latencies)
+
+
+def bench_batch_model(predictor, df, chunksize, explain=False):
+    """Rows/sec of predictor.predict_many over ``df`` in chunks of ``chunksize``."""
+    start = time.perf_counter()
+    for offset in range(0, len(df), chunksize):
+        predictor.predict_many(df.iloc[offset:offset + chunksize], explain=explain)
+    seconds = time.perf_counter() - start
+    return {'rows': len(df), 'chunksize': chunksize, 'seconds': seconds, 'rows_per_sec': len(df) / seconds}
+
+
+def bench_batch_http(client, csv_bytes, rows, chunksize):
+    """Rows/sec of the streaming batch endpoint, upload to last byte."""
+    start = time.perf_counter()
+    response = client.post(
+        f'/api/predict-batch?stream=ndjson&chunksize={chunksize}',
+        data={'file': (io.BytesIO(csv_bytes), 'synthetic.csv')},
+        buffered=False,
+    )
+    lines = sum(chunk.count(b'\n') for chunk in response.response)
+    response.close()
+    seconds = time.perf_counter() - start
+    if response.status_code != 200 or lines != rows:
+        raise RuntimeError(f"Streaming batch returned {response.status_code} with {lines}/{rows} rows")
+    return {'rows': rows, 'chunksize': chunksize, 'seconds': seconds, 'rows_per_sec': rows / seconds}
+
+
+def bench_concurrent(app, records, clients, requests_per_client):
+    """``clients`` threads, each with its own test client, POSTing /api/predict."""
+    latencies = [[] for _ in range(clients)]
+    errors = [0] * clients
+    barrier = threading.Barrier(clients + 1)
+
+    def worker(i):
+        client = app.test_client()
+        mine = records[i::clients][:requests_per_client] or records[:requests_per_client]
+        barrier.wait()
+        for record in mine:
+            start = time.perf_counter()
+            response = client.post('/api/predict', json=record)
+            latencies[i].append(time.perf_counter() - start)
+            errors[i] += response.status_code != 200
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    seconds = time.perf_counter() - start
+
+    flat = [s for per_client in latencies for s in per_client]
+    result = _percentiles(flat)
+    result.update(clients=clients, seconds=seconds, requests_per_sec=len(flat) / seconds, errors=sum(errors))
+    return result
+
+
+def _peak_bytes(fn):
+    """Peak bytes allocated by Python and NumPy while ``fn`` runs."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_features(predictor, df):
+    """Features for ``df`` through preprocess_data + scaler and through the transformer."""
+    paths = {
+        'pandas': lambda: predictor.scaler.transform(
+            predictor.preprocess_data(df, is_training=False).reindex(columns=predictor.feature_columns, fill_value=0)),
+        'transformer': lambda: predictor.feature_pipeline.transform(df),
+    }
+    result = {'rows': len(df)}
+    for name, fn in paths.items():
+        start = time.perf_counter()
+        fn()
+        seconds = time.perf_counter() - start
+        result[name] = {
+            'seconds': seconds,
+            'rows_per_sec': len(df) / seconds,
+            'bytes_per_row': _peak_bytes(fn) / len(df),
+        }
+
+    # Label encoding alone, on already engineered rows
+    from model import engineer_features
+    engineered = engineer_features(df)
+    start = time.perf_counter()
+    predictor.encode_categoricals(engineered, is_training=False)
+    seconds = time.perf_counter() - start
+    result['encode_categoricals'] = {'seconds': seconds, 'rows_per_sec': len(df) / seconds}
+
+    record = _records(df.head(1))[0]
+    transform = predictor.feature_pipeline.transform
+    calls = 1000
+    start = time.perf_counter()
+    for _ in range(calls):
+        transform(record)
+    result['single_record'] = {
+        'transform_ms': (time.perf_counter() - start) * 1000 / calls,
+        'bytes_per_row': _peak_bytes(lambda: transform(record)),
+    }
+    return result
+
+
+def bench_training(train_path):
+    from model import LoanPredictor
+    start = time.perf_counter()
+    LoanPredictor().train(train_path)
+    return {'seconds': time.perf_counter() - start}
+
+
+# ─────────────────────────────────────────────────────────────────────── #
+#  Comparison
+# ─────────────────────────────────────────────────────────────────────── #
+def _flatten(obj, prefix=''):
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            yield from _flatten(value, f'{prefix}{key}.')
+    elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        yield prefix[:-1], obj
+
+
+def compare(old, new):
+    """Print every timing/throughput figure present in both result sets."""
+    before = dict(_flatten(old['results']))
+    print(f"\n{'metric':<52} {'before':>12} {'after':>12} {'change':>8}")
+    for key, value in _flatten(new['results']):
+        if key not in before or not key.endswith(('_ms', 'seconds', '_per_sec', 'rss_mb', 'per_row')):
+            continue
+        change = (value / before[key] - 1) * 100 if before[key] else float('nan')
+        print(f"{key:<52} {before[key]:>12.3f} {value:>12.3f} {change:>+7.1f}%")
+
+
+def _environment():
+    import sklearn
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────── #
+#  Entry point
+# ─────────────────────────────────────────────────────────────────────── #
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-dir', default='models')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1, 1000, 10000],
+                        help='batch sizes to score (1 to 1000000)')
+    parser.add_argument('--chunksizes', type=int, nargs='+', default=[500, 5000])
+    parser.add_argument('--single-requests', type=int, default=200)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--requests-per-client', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backend', default=os.getenv('MODEL_BACKEND', 'sklearn'))
+    parser.add_argument('--cache', action='store_true', help='leave the prediction cache on')
+    parser.add_argument('--scorer-processes', type=int, default=int(os.getenv('SCORER_PROCESSES', 0)),
+                        help='score in this many shared-memory scorer processes (0: in process)')
+    parser.add_argument('--micro-batch-ms', type=float, default=float(os.getenv('MICROBATCH_MAX_WAIT_MS', 0)),
+                        help='coalesce concurrent /api/predict requests, waiting up to this long (0: off)')
+    parser.add_argument('--no-http-batch', action='store_true', help='skip the streaming endpoint')
+    parser.add_argument('--train', action='store_true', help='also time a full training run')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    args = parser.parse_args(argv)
+
+    from model import LoanPredictor, load_report
+
+    if not LoanPredictor.model_exists(args.model_dir):
+        raise SystemExit(f"No trained model in {args.model_dir}; run python model.py first")
+
+    results = {}
+    print("Load time / RSS per artifact format...")
+    results['load'] = load_report(args.model_dir)
+
+    # Configure the app before importing it; the model is loaded explicitly below
+    os.environ['MODEL_LOAD_MODE'] = 'lazy'
+    os.environ['MODEL_BACKEND'] = args.backend
+    os.environ['SCORER_PROCESSES'] = str(args.scorer_processes)
+    os.environ['MICROBATCH_MAX_WAIT_MS'] = str(args.micro_batch_ms)
+    if not args.cache:
+        os.environ['PREDICTION_CACHE_SIZE'] = '0'
+    import app as api
+
+    api.registry.model_dir = args.model_dir
+    if not api.registry.load():
+        raise SystemExit(f"Model not loaded from {args.model_dir}: {api.registry.state} {api.registry.error or ''}")
+    results['load']['in_process_seconds'] = api.registry.load_seconds
+    predictor = api.registry.predictor
+    client = api.app.test_client()
+
+    records = _records(synthetic_applications(max(args.single_requests, 1), seed=args.seed))
+    print(f"Single predictions ({len(records)} requests)...")
+    results['single'] = bench_single(client, records)
+    results['single_explain'] = bench_single(client, records, query='?explain=true')
+
+    # Keyed by configuration so --compare matches like with like
+    results['batch'] = {}
+    for rows in args.rows:
+        df = synthetic_applications(rows, seed=args.seed + rows)
+        csv_bytes = df.to_csv(index=False).encode() if not args.no_http_batch else None
+        for chunksize in args.chunksizes:
+            if chunksize > rows and chunksize != min(args.chunksizes):
+                continue    # identical to a smaller chunk size at this scale
+            print(f"Batch scoring {rows} rows, chunks of {chunksize}...")
+            entry = {'rows': rows, 'chunksize': chunksize, 'model': bench_batch_model(predictor, df, chunksize),
+                     'explain': bench_batch_model(predictor, df, chunksize, explain=True)}
+            if csv_bytes is not None:
+                entry['http'] = bench_batch_http(client, csv_bytes, rows, chunksize)
+            results['batch'][f'{rows}_rows_{chunksize}_chunk'] = entry
+
+    results['features'] = {}
+    for rows in args.rows:
+        print(f"Feature computation, {rows} rows...")
+        results['features'][f'{rows}_rows'] = bench_features(predictor, synthetic_applications(rows, seed=args.seed + rows))
+
+    concurrent_records = _records(synthetic_applications(
+        max(args.clients) * args.requests_per_client, seed=args.seed + 1))
+    results['concurrent'] = {}
+    for clients in args.clients:
+        print(f"{clients} concurrent clients...")
+        batches = api.micro_batcher.stats() if api.micro_batcher is not None else None
+        entry = bench_concurrent(api.app, concurrent_records, clients, args.requests_per_client)
+        if batches is not None:
+            after = api.micro_batcher.stats()
+            entry['mean_micro_batch'] = (after['requests'] - batches['requests']) / max(1, after['batches'] - batches['batches'])
+        results['concurrent'][f'{clients}_clients'] = entry
+
+    if args.train:
+        print("Training...")
+        results['training'] = bench_training(TRAIN_FILE)
+
+    results['memory'] = {'peak_rss_mb': peak_rss_mb()}
+    if api.scorer_pool is not None:
+        results['memory']['scorers'] = api.scorer_pool.status()['scorers']
+        results['memory']['shared_model_mb'] = predictor.load_stats['scorer_pool']['shared_mb']
+
+    report = {'environment': _environment(), 'args': vars(args), 'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    single = results['single']
+    print(f"\n/api/predict      p50 {single['p50_ms']:.2f} ms   p99 {single['p99_ms']:.2f} ms")
+    single = results['single_explain']
+    print(f"  ?explain=true   p50 {single['p50_ms']:.2f} ms   p99 {single['p99_ms']:.2f} ms")
+    for entry in results['batch'].values():
+        line = (f"batch {entry['rows']:>8} rows / {entry['chunksize']:>6}   model {entry['model']['rows_per_sec']:>10.0f} rows/s"
+                f"   explain {entry['explain']['rows_per_sec']:>10.0f} rows/s")
+        if 'http' in entry:
+            line += f"   http {entry['http']['rows_per_sec']:>10.0f} rows/s"
+        print(line)
+    for entry in results['features'].values():
+        print(f"features {entry['rows']:>8} rows   pandas {entry['pandas']['rows_per_sec']:>10.0f} rows/s "
+              f"{entry['pandas']['bytes_per_row']:>7.0f} B/row   transformer {entry['transformer']['rows_per_sec']:>10.0f} rows/s "
+              f"{entry['transformer']['bytes_per_row']:>7.0f} B/row   "
+              f"encode {entry['encode_categoricals']['rows_per_sec']:>10.0f} rows/s")
+    for entry in results['concurrent'].values():
+        line = f"{entry['clients']:>3} clients        {entry['requests_per_sec']:.1f} req/s   p99 {entry['p99_ms']:.2f} ms"
+        if 'mean_micro_batch' in entry:
+            line += f"   mean micro-batch {entry['mean_micro_batch']:.1f}"
+        print(line)
+    print(f"Peak RSS          {results['memory']['peak_rss_mb']:.0f} MB")
+    for scorer in results['memory'].get('scorers', []):
+        print(f"  scorer {scorer['pid']:>7}   RSS {scorer['rss_mb'] or 0:.0f} MB   PSS {scorer['pss_mb'] or 0:.0f} MB")
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,7 +5,7 @@ echo "Installing Python dependencies..."
 pip install -r requirements.txt
 
 echo "Checking for trained model..."
-if [ ! -f "models/loan_model.pkl" ]; then
+if [ ! -f "models/model_bundle.joblib" ] && [ ! -f "models/loan_model.pkl" ]; then
     echo "No trained model found. Training model..."
     python model.py
 else
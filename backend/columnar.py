@@ -0,0 +1,146 @@
+"""
+Column-oriented payloads for ``POST /api/predict-bulk``.
+
+Requests carry one array per application field instead of one object
+per application, either named:
+
+    {"columns": {"Gender": ["Male", "Female"], "ApplicantIncome": [5000, 3200], ...},
+     "loan_ids": ["LP001002", "LP001003"]}
+
+or positional, in ``INPUT_COLUMNS`` order (listed as ``inputs`` by
+``GET /api/feature-info``):
+
+    {"columns": [["Male", "Female"], ["Yes", "No"], ...]}
+
+Results come back as columns too (loan_id, prediction, probability,
+confidence, error), so encoding costs one list per column rather than
+one dict per row. JSON by default; Arrow IPC or msgpack when asked for
+and the optional ``pyarrow`` / ``msgpack`` package is installed.
+"""
+
+import numpy as np
+import pandas as pd
+
+from feature_pipeline import INPUTS
+
+INPUT_COLUMNS = [name for name, _, _ in INPUTS]
+# Inputs a request must send; absent categoricals encode like unseen values
+REQUIRED_COLUMNS = [name for name, kind, _ in INPUTS if kind != 'category']
+
+FORMATS = {
+    'json':    'application/json',
+    'arrow':   'application/vnd.apache.arrow.stream',
+    'msgpack': 'application/msgpack',
+}
+_PACKAGES = {'arrow': 'pyarrow', 'msgpack': 'msgpack'}
+
+
+class UnsupportedFormat(Exception):
+    """The requested response format needs a package that is not installed."""
+
+
+def _module(fmt):
+    try:
+        return __import__(_PACKAGES[fmt])
+    except ImportError:
+        raise UnsupportedFormat(f"{fmt} output needs the {_PACKAGES[fmt]} package, which is not installed")
+
+
+def negotiate(requested, accept=''):
+    """
+    Response format from ``?format=`` or else the Accept header (JSON by
+    default). Raises ValueError for an unknown format and UnsupportedFormat
+    if its package is missing.
+    """
+    if requested:
+        fmt = requested.lower()
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    elif FORMATS['arrow'] in accept:
+        fmt = 'arrow'
+    elif 'msgpack' in accept:
+        fmt = 'msgpack'
+    else:
+        fmt = 'json'
+    if fmt in _PACKAGES:
+        _module(fmt)
+    return fmt
+
+
+def frame_from_columns(payload):
+    """(applications DataFrame, loan ids or None) of a request body; ValueError if malformed."""
+    if not isinstance(payload, dict) or 'columns' not in payload:
+        raise ValueError('Body must be a JSON object with "columns"')
+
+    columns = payload['columns']
+    if isinstance(columns, list):
+        if len(columns) != len(INPUT_COLUMNS):
+            raise ValueError(f"Expected {len(INPUT_COLUMNS)} positional columns "
+                             f"({', '.join(INPUT_COLUMNS)}), got {len(columns)}")
+        columns = dict(zip(INPUT_COLUMNS, columns))
+    elif not isinstance(columns, dict):
+        raise ValueError('"columns" must be an object of arrays or an array of arrays')
+
+    if not all(isinstance(values, list) for values in columns.values()):
+        raise ValueError('Every column must be an array')
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError('All columns must have the same length')
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    rows = lengths.pop() if lengths else 0
+    loan_ids = payload.get('loan_ids', columns.get('Loan_ID'))
+    if loan_ids is not None and (not isinstance(loan_ids, list) or len(loan_ids) != rows):
+        raise ValueError('"loan_ids" must be an array with one id per row')
+    return pd.DataFrame(columns), loan_ids
+
+
+def result_columns(columns, loan_ids=None):
+    """``LoanPredictor.predict_columns`` output with a loan_id column (row numbers if none were sent)."""
+    rows = len(columns['prediction'])
+    return {'loan_id': loan_ids if loan_ids is not None else np.arange(rows), **columns}
+
+
+def to_lists(result):
+    """Result columns as JSON-ready lists (null probability / confidence for failed rows)."""
+    failed = np.isnan(result['probability'])
+
+    def numbers(values):
+        return np.where(failed, None, values).tolist() if failed.any() else values.tolist()
+
+    loan_ids = result['loan_id']
+    return {
+        'loan_id':     loan_ids.tolist() if isinstance(loan_ids, np.ndarray) else list(loan_ids),
+        'prediction':  result['prediction'].tolist(),
+        'probability': numbers(result['probability']),
+        'confidence':  numbers(result['confidence']),
+        'error':       result['error'].tolist(),
+    }
+
+
+def encode(result, fmt):
+    """Result columns as an Arrow IPC stream or a msgpack map."""
+    if fmt == 'msgpack':
+        msgpack = _module('msgpack')
+        return msgpack.packb({'success': True, 'total': len(result['prediction']), 'columns': to_lists(result)})
+
+    pa = _module('arrow')
+    failed = np.isnan(result['probability'])
+    try:
+        loan_ids = pa.array(result['loan_id'])
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed id types
+        loan_ids = pa.array([None if v is None else str(v) for v in result['loan_id']], type=pa.string())
+    table = pa.table({
+        'loan_id':     loan_ids,
+        'prediction':  pa.array(result['prediction'], type=pa.string()),
+        'probability': pa.array(result['probability'], mask=failed),
+        'confidence':  pa.array(result['confidence'], mask=failed),
+        'error':       pa.array(result['error'], type=pa.string()),
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
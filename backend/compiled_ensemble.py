@@ -0,0 +1,323 @@
+"""
+Flattened tree-ensemble inference backend.
+
+The soft-voting ensemble trained by ``LoanPredictor`` is exported into
+contiguous NumPy arrays, one set per forest:
+
+    feature, threshold, value   (one entry per node)
+    children                    (two entries per node: left, right)
+    roots                       (one entry per tree)
+
+Arrays are stored in the dtype the evaluator indexes with, so they can be
+memory-mapped from a model bundle and used without a per-process copy.
+Thresholds and values are float64, or float32 for a compressed model
+(see compression.py).
+Leaves point to themselves, so every tree of a forest can be walked in
+lock-step for ``depth`` steps with a handful of vectorised gathers, without
+calling into each sklearn estimator. ``value`` is kept for internal nodes
+as well as leaves: the class-1 fraction for RF/ExtraTrees, and the
+learning-rate-scaled raw score for GradientBoosting (the sample-weighted
+mean of the leaves below). The same walk yields per-feature attributions,
+see ``CompiledEnsemble.contributions``.
+"""
+
+import time
+import numpy as np
+from scipy.special import expit
+
+FOREST_ARRAYS = ('feature', 'threshold', 'children', 'value', 'roots')
+
+# Upper bound on rows x trees walked at once, keeps temporaries small
+_MAX_CELLS = 1 << 15
+
+
+def _flatten_trees(trees, scale=1.0, classifier=True, dtype=np.float64):
+    """Concatenate sklearn ``Tree`` objects into one node array set."""
+    features, thresholds, children, values, roots = [], [], [], [], []
+    offset, depth = 0, 0
+    for tree in trees:
+        n = tree.node_count
+        ids = np.arange(n)
+        leaf = tree.children_left == -1
+
+        if classifier:
+            counts = tree.value[:, 0, :]
+            totals = counts.sum(axis=1)
+            totals[totals == 0] = 1.0
+            value = counts[:, 1] / totals
+        else:
+            value = _node_means(tree) * scale
+
+        features.append(np.where(leaf, 0, tree.feature))
+        thresholds.append(np.where(leaf, 0.0, tree.threshold))
+        children.append(np.column_stack([
+            np.where(leaf, ids, tree.children_left),
+            np.where(leaf, ids, tree.children_right),
+        ]).ravel() + offset)
+        values.append(value)
+        roots.append(offset)
+        offset += n
+        depth = max(depth, tree.max_depth)
+
+    return {
+        'feature':   np.concatenate(features).astype(np.intp),
+        'threshold': _thresholds(np.concatenate(thresholds), dtype),
+        # children[2 * node] is the left child, children[2 * node + 1] the right one
+        'children':  np.concatenate(children).astype(np.intp),
+        'value':     np.concatenate(values).astype(dtype),
+        'roots':     np.asarray(roots, dtype=np.intp),
+        'depth':     depth,
+    }
+
+
+def _thresholds(threshold, dtype):
+    """
+    Thresholds in ``dtype``. Rounding down to float32 keeps every split
+    decision: no float32 feature value lies between a threshold and the
+    float32 just below it.
+    """
+    narrow = threshold.astype(dtype)
+    if narrow.dtype == threshold.dtype:
+        return narrow
+    return np.where(narrow > threshold, np.nextafter(narrow, narrow.dtype.type(-np.inf)), narrow)
+
+
+def _node_means(tree):
+    """
+    Leaf values of a regression tree, with every internal node set to the
+    sample-weighted mean of its children. GradientBoosting rewrites only
+    the leaves after fitting a stage, so the internal values sklearn keeps
+    do not add up to them.
+    """
+    value = tree.value[:, 0, 0].astype(np.float64)
+    weight = tree.weighted_n_node_samples.astype(np.float64)
+    left, right = tree.children_left, tree.children_right
+    # Children are numbered after their parent: fill bottom-up
+    for node in np.flatnonzero(left != -1)[::-1]:
+        total = weight[left[node]] + weight[right[node]]
+        if total > 0:
+            value[node] = (weight[left[node]] * value[left[node]] + weight[right[node]] * value[right[node]]) / total
+    return value
+
+
+def _to_probability(z0, z, parts):
+    """
+    Map log-odds attributions to probability space: (base, probabilities,
+    contributions). Each row's contributions are scaled by
+    ``(p - p0) / (z - z0)``, so they still add up to ``p - p0``.
+    """
+    p0, p = expit(z0), expit(z)
+    dz = z - z0
+    safe = np.abs(dz) > 1e-12
+    scale = np.where(safe, (p - p0) / np.where(safe, dz, 1.0), p * (1.0 - p))
+    return p0, p, parts * scale[:, None]
+
+
+class CompiledEnsemble:
+    """NumPy evaluator over a flattened soft-voting ensemble."""
+
+    def __init__(self, names, weights, forests, linear):
+        self.names   = list(names)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.forests = forests   # name -> arrays + 'kind' ('mean' | 'boost') + 'init'
+        self.linear  = linear    # name -> (coef, intercept)
+
+    # ------------------------------------------------------------------ #
+    #  Export
+    # ------------------------------------------------------------------ #
+    @property
+    def dtype(self):
+        """Precision of the stored thresholds and values."""
+        return next((forest['value'].dtype for forest in self.forests.values()), np.dtype(np.float64))
+
+    @classmethod
+    def from_voting(cls, model, dtype=np.float64):
+        """Flatten a fitted soft-voting ``VotingClassifier`` (thresholds and values in ``dtype``)."""
+        # Imported here so scorer processes, which only load arrays, skip sklearn
+        from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, ExtraTreesClassifier
+        from sklearn.linear_model import LogisticRegression
+
+        names = [name for name, _ in model.estimators]
+        weights = model.weights if model.weights is not None else [1.0] * len(names)
+        forests, linear = {}, {}
+
+        for name, estimator in zip(names, model.estimators_):
+            if isinstance(estimator, (RandomForestClassifier, ExtraTreesClassifier)):
+                forest = _flatten_trees([e.tree_ for e in estimator.estimators_], dtype=dtype)
+                forest.update(kind='mean', init=0.0)
+            elif isinstance(estimator, GradientBoostingClassifier):
+                trees = [e.tree_ for e in estimator.estimators_[:, 0]]
+                forest = _flatten_trees(trees, scale=estimator.learning_rate, classifier=False, dtype=dtype)
+                # Constant prior: decision function minus what the stages add
+                x0 = np.zeros((1, estimator.n_features_in_))
+                stages = sum(e.predict(x0)[0] for e in estimator.estimators_[:, 0])
+                init = estimator.decision_function(x0)[0] - estimator.learning_rate * stages
+                forest.update(kind='boost', init=float(init))
+            elif isinstance(estimator, LogisticRegression):
+                linear[name] = (estimator.coef_[0].astype(np.float64), float(estimator.intercept_[0]))
+                continue
+            else:
+                raise ValueError(f"Cannot compile sub-model '{name}' ({type(estimator).__name__})")
+            forests[name] = forest
+
+        return cls(names, weights, forests, linear)
+
+    # ------------------------------------------------------------------ #
+    #  Save / Load
+    # ------------------------------------------------------------------ #
+    def to_arrays(self):
+        """Flat ``{key: ndarray}`` view, as written by ``save``."""
+        arrays = {
+            'names':   np.asarray(self.names),
+            'weights': self.weights,
+        }
+        for name, forest in self.forests.items():
+            for key in FOREST_ARRAYS:
+                arrays[f'{name}.{key}'] = forest[key]
+            arrays[f'{name}.meta'] = np.asarray([forest['depth'], forest['init']], dtype=np.float64)
+            arrays[f'{name}.kind'] = np.asarray(forest['kind'])
+        for name, (coef, intercept) in self.linear.items():
+            arrays[f'{name}.coef'] = coef
+            arrays[f'{name}.intercept'] = np.asarray([intercept])
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        names = [str(n) for n in arrays['names']]
+        forests, linear = {}, {}
+        for name in names:
+            if f'{name}.coef' in arrays:
+                linear[name] = (arrays[f'{name}.coef'], float(arrays[f'{name}.intercept'][0]))
+                continue
+            forest = {key: arrays[f'{name}.{key}'] for key in FOREST_ARRAYS}
+            depth, init = arrays[f'{name}.meta']
+            forest.update(depth=int(depth), init=float(init), kind=str(arrays[f'{name}.kind']))
+            forests[name] = forest
+        return cls(names, arrays['weights'], forests, linear)
+
+    def save(self, path):
+        np.savez(path, **self.to_arrays())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls.from_arrays({key: data[key] for key in data.files})
+
+    # ------------------------------------------------------------------ #
+    #  Scoring
+    # ------------------------------------------------------------------ #
+    @staticmethod
+    def leaves(forest, X):
+        """Index of the node each row ends in, for every tree: ``(n_rows, n_trees)``."""
+        return CompiledEnsemble._walk(forest, X)[0]
+
+    @staticmethod
+    def _walk(forest, X, contributions=False):
+        """
+        Walk every tree of a forest: (leaves, path contributions or None).
+
+        With ``contributions``, each split on the way down credits its
+        feature with the change in node value (Saabas attribution), summed
+        over trees: ``(n_rows, n_features)``. Root values plus contributions
+        add up to the summed leaf values.
+        """
+        # sklearn compares float32 features against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        feature, threshold = forest['feature'], forest['threshold']
+        roots, children    = forest['roots'], forest['children']
+        value = forest['value']
+
+        n_trees, n_features = len(roots), X.shape[1]
+        chunk = max(1, _MAX_CELLS // n_trees)
+        out = np.empty((len(X), n_trees), dtype=np.intp)
+        credit = np.zeros((len(X), n_features)) if contributions else None
+        for start in range(0, len(X), chunk):
+            block = X[start:start + chunk]
+            flat = block.ravel()
+            row_offset = (np.arange(len(block)) * n_features)[:, None]
+            idx = np.broadcast_to(roots, (len(block), n_trees)).copy()
+            totals = np.zeros(len(block) * n_features) if contributions else None
+            for _ in range(forest['depth']):
+                split = feature.take(idx)
+                x = flat.take(row_offset + split)
+                go_right = ~(x <= threshold.take(idx))
+                child = children.take(2 * idx + go_right)
+                if contributions:
+                    # Leaves point to themselves, so finished paths add zero
+                    totals += np.bincount((row_offset + split).ravel(),
+                                          weights=(value.take(child) - value.take(idx)).ravel(),
+                                          minlength=len(totals))
+                idx = child
+            out[start:start + chunk] = idx
+            if contributions:
+                credit[start:start + chunk] = totals.reshape(len(block), n_features)
+        return out, credit
+
+    def _forest_proba(self, forest, X):
+        """Class-1 probability of one forest."""
+        value = forest['value'][self.leaves(forest, X)]
+        if forest['kind'] == 'boost':
+            return expit(forest['init'] + value.sum(axis=1))
+        return value.mean(axis=1)
+
+    def predict_proba(self, X, timings=None):
+        """
+        Soft-vote class probabilities, ``(n_rows, 2)``.
+
+        If ``timings`` is a dict, each sub-model's latency in milliseconds is
+        recorded under its name.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        votes = np.zeros(len(X))
+        for name, weight in zip(self.names, self.weights):
+            start = time.perf_counter()
+            if name in self.linear:
+                coef, intercept = self.linear[name]
+                p = expit(X @ coef + intercept)
+            else:
+                p = self._forest_proba(self.forests[name], X)
+            votes += weight * p
+            if timings is not None:
+                timings[name] = (time.perf_counter() - start) * 1000
+        p1 = votes / self.weights.sum()
+        return np.column_stack([1.0 - p1, p1])
+
+    def contributions(self, X):
+        """
+        Per-feature attribution of the soft-vote approval probability,
+        from the same tree walk as scoring:
+        ``(probabilities (n_rows, 2), base value, contributions (n_rows, n_features))``
+        with ``base + contributions.sum(axis=1) == probabilities[:, 1]``.
+
+        RF/ExtraTrees contributions are their path contributions averaged
+        over trees. GradientBoosting (summed path contributions) and the
+        linear model (``coef * x``) attribute log-odds; those are mapped to
+        probability per row, see ``_to_probability``.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        votes, base = np.zeros(len(X)), 0.0
+        credit = np.zeros(X.shape)
+        for name, weight in zip(self.names, self.weights):
+            if name in self.linear:
+                coef, intercept = self.linear[name]
+                p0, p, parts = _to_probability(intercept, X @ coef + intercept, X * coef)
+            else:
+                forest = self.forests[name]
+                leaves, parts = self._walk(forest, X, contributions=True)
+                value, roots = forest['value'], forest['roots']
+                if forest['kind'] == 'boost':
+                    z0 = forest['init'] + value[roots].sum()
+                    p0, p, parts = _to_probability(z0, forest['init'] + value[leaves].sum(axis=1), parts)
+                else:
+                    p0, p, parts = value[roots].mean(), value[leaves].mean(axis=1), parts / len(roots)
+            votes += weight * p
+            base += weight * p0
+            credit += weight * parts
+        total = self.weights.sum()
+        p1 = votes / total
+        return np.column_stack([1.0 - p1, p1]), float(base / total), credit / total
+
+
+def parity_error(model, compiled, X):
+    """Largest absolute gap between ``model.predict_proba`` and the compiled evaluator."""
+    return float(np.max(np.abs(model.predict_proba(X) - compiled.predict_proba(X)))) if len(X) else 0.0
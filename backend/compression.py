@@ -0,0 +1,325 @@
+"""
+Post-training compression of the soft-voting ensemble.
+
+``compress_ensemble`` looks for the smallest ensemble that stays within
+tolerance of the full model on the held-out split: accuracy and ROC-AUC
+at most ``accuracy_tolerance`` / ``auc_tolerance`` lower, and, because a
+small split lets a very different model match those by chance, the
+same decision on at least ``min_agreement`` of the rows and a mean
+probability gap of at most ``proba_tolerance``.
+
+1. RF and ExtraTrees keep a greedily chosen subset of their trees, and
+   GradientBoosting a prefix of its stages (each stage corrects the ones
+   before it). Starting from one tree per forest, every step adds the
+   candidate that brings the soft vote closest to the full ensemble's
+   probabilities per tree added: the best remaining tree of a forest, or
+   the next block of boosting stages. It stops as soon as every tolerance
+   is met.
+2. The search is repeated with RF/ExtraTrees trees cut to each depth in
+   ``depths`` (nodes at that depth become leaves), and the result with
+   the fewest nodes wins.
+
+The compressed model is a regular ``VotingClassifier``. Its flattened
+arrays are stored in float32 (``node_dtype``, see compiled_ensemble.py).
+``compression_report`` compares artifact size, load time and scoring
+latency of the two saved models.
+"""
+
+import copy
+import os
+import time
+
+import numpy as np
+from scipy.special import expit
+from sklearn.metrics import accuracy_score, roc_auc_score
+from sklearn.tree._tree import Tree
+
+from compiled_ensemble import CompiledEnsemble
+from training import FOREST_NAMES
+
+TREE_LEAF = -1
+TREE_UNDEFINED = -2
+
+ACCURACY_TOLERANCE = 0.005
+AUC_TOLERANCE = 0.005
+MIN_AGREEMENT = 0.99
+PROBA_TOLERANCE = 0.01
+DEPTHS = (None, 10, 8, 6)
+NODE_DTYPE = np.float32
+
+# Where save_model writes the compressed model, inside the full model's directory
+COMPRESSED_DIR = 'compressed'
+REPORT_FILE = 'compression_report.json'
+
+
+# ─────────────────────────────────────────────────────────────────────── #
+#  Trees
+# ─────────────────────────────────────────────────────────────────────── #
+def truncate_tree(estimator, depth):
+    """
+    Copy of a fitted decision tree whose nodes at ``depth`` are leaves
+    (their class fractions become the prediction). Unreachable nodes are
+    dropped.
+    """
+    tree = estimator.tree_
+    if depth is None or tree.max_depth <= depth:
+        return estimator
+    left, right = tree.children_left, tree.children_right
+
+    # Reachable nodes in pre-order, as sklearn numbers them
+    order, node_depth, stack = [], {0: 0}, [0]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        if left[node] != TREE_LEAF and node_depth[node] < depth:
+            node_depth[left[node]] = node_depth[right[node]] = node_depth[node] + 1
+            stack.extend((right[node], left[node]))
+    new_id = {node: i for i, node in enumerate(order)}
+
+    state = tree.__getstate__()
+    nodes = state['nodes'][order].copy()
+    for i, node in enumerate(order):
+        if left[node] == TREE_LEAF or node_depth[node] >= depth:
+            nodes[i]['left_child'] = nodes[i]['right_child'] = TREE_LEAF
+            nodes[i]['feature'] = TREE_UNDEFINED
+            nodes[i]['threshold'] = TREE_UNDEFINED
+        else:
+            nodes[i]['left_child'], nodes[i]['right_child'] = new_id[left[node]], new_id[right[node]]
+
+    truncated = Tree(tree.n_features, np.asarray(tree.n_classes, dtype=np.intp), tree.n_outputs)
+    truncated.__setstate__(dict(state, max_depth=depth, node_count=len(order),
+                                nodes=nodes, values=state['values'][order].copy()))
+    estimator = copy.copy(estimator)
+    estimator.tree_ = truncated
+    return estimator
+
+
+def node_count(model):
+    """Total tree nodes of a VotingClassifier (its size and walking cost)."""
+    total = 0
+    for estimator in model.estimators_:
+        if hasattr(estimator, 'estimators_'):
+            total += sum(t.tree_.node_count for t in np.ravel(estimator.estimators_))
+    return int(total)
+
+
+# ─────────────────────────────────────────────────────────────────────── #
+#  Greedy selection
+# ─────────────────────────────────────────────────────────────────────── #
+def _components(model, forests, X):
+    """Held-out outputs of every tree: per-tree probabilities, staged GB scores, fixed LR."""
+    weights = model.weights if model.weights is not None else [1.0] * len(model.estimators)
+    components = {}
+    for (name, estimator), weight in zip(model.named_estimators_.items(), weights):
+        if name in forests:
+            trees = forests[name]
+            components[name] = {'kind': 'mean', 'weight': weight,
+                                'outputs': np.column_stack([t.predict_proba(X)[:, 1] for t in trees])}
+        elif hasattr(estimator, 'staged_decision_function'):
+            components[name] = {'kind': 'boost', 'weight': weight,
+                                'outputs': np.asarray(list(estimator.staged_decision_function(X)))[:, :, 0]}
+        else:
+            components[name] = {'kind': 'fixed', 'weight': weight, 'outputs': estimator.predict_proba(X)[:, 1]}
+    return components
+
+
+def _greedy(components, y, target, tolerances, boost_block):
+    """
+    Grow tree selections until the soft vote is within ``tolerances`` of
+    the full model. Returns ({name: kept tree indices or stage count},
+    probabilities), or None if every tree is needed and it still falls short.
+    """
+    total_weight = sum(c['weight'] for c in components.values())
+    full = target['proba']
+
+    def loss(p):
+        return ((p - full[:, None]) ** 2).mean(axis=0)
+
+    kept, own = {}, {}
+    for name, c in components.items():
+        if c['kind'] == 'mean':
+            # The single tree closest to its whole forest
+            forest = c['outputs'].mean(axis=1, keepdims=True)
+            first = int(np.argmin(((c['outputs'] - forest) ** 2).mean(axis=0)))
+            kept[name] = [first]
+            own[name] = c['outputs'][:, first].copy()
+        elif c['kind'] == 'boost':
+            kept[name] = min(boost_block, len(c['outputs']))
+            own[name] = expit(c['outputs'][kept[name] - 1])
+        else:
+            own[name] = c['outputs']
+
+    def vote():
+        return sum(c['weight'] * (own[name] / len(kept[name]) if c['kind'] == 'mean' else own[name])
+                   for name, c in components.items()) / total_weight
+
+    def within(p):
+        return (np.mean((p > 0.5) == (full > 0.5)) >= tolerances['min_agreement']
+                and np.mean(np.abs(p - full)) <= tolerances['proba_tolerance']
+                and accuracy_score(y, p > 0.5) >= target['accuracy'] - tolerances['accuracy_tolerance']
+                and roc_auc_score(y, p) >= target['roc_auc'] - tolerances['auc_tolerance'])
+
+    p = vote()
+    while not within(p):
+        current = ((p - full) ** 2).mean()
+        best = None     # (gain per tree, name, choice)
+        for name, c in components.items():
+            weight = c['weight'] / total_weight
+            if c['kind'] == 'mean':
+                remaining = np.setdiff1d(np.arange(c['outputs'].shape[1]), kept[name])
+                if len(remaining) == 0:
+                    continue
+                k = len(kept[name])
+                rest = p - weight * own[name] / k
+                candidates = rest[:, None] + weight * (own[name][:, None] + c['outputs'][:, remaining]) / (k + 1)
+                losses = loss(candidates)
+                j = int(np.argmin(losses))
+                option = (current - losses[j], name, int(remaining[j]))
+            elif c['kind'] == 'boost':
+                k = kept[name]
+                if k == len(c['outputs']):
+                    continue
+                step = min(boost_block, len(c['outputs']) - k)
+                candidate = p + weight * (expit(c['outputs'][k + step - 1]) - own[name])
+                option = ((current - ((candidate - full) ** 2).mean()) / step, name, k + step)
+            else:
+                continue
+            if best is None or option[0] > best[0]:
+                best = option
+        if best is None:
+            return None
+
+        _, name, choice = best
+        c = components[name]
+        if c['kind'] == 'mean':
+            kept[name].append(choice)
+            own[name] = own[name] + c['outputs'][:, choice]
+        else:
+            kept[name] = choice
+            own[name] = expit(c['outputs'][choice - 1])
+        p = vote()
+    return kept, p
+
+
+def _assemble(model, forests, kept):
+    """A VotingClassifier with only the kept trees / stages."""
+    compressed = copy.copy(model)
+    members = []
+    for name, estimator in model.named_estimators_.items():
+        if name in forests:
+            estimator = copy.copy(estimator)
+            estimator.estimators_ = [forests[name][i] for i in sorted(kept[name])]
+            estimator.n_estimators = len(estimator.estimators_)
+        elif name in kept:
+            estimator = copy.copy(estimator)
+            estimator.estimators_ = estimator.estimators_[:kept[name]]
+            estimator.train_score_ = estimator.train_score_[:kept[name]]
+            estimator.n_estimators = estimator.n_estimators_ = kept[name]
+        members.append((name, estimator))
+    compressed.estimators_ = [estimator for _, estimator in members]
+    compressed.named_estimators_ = type(model.named_estimators_)(**dict(members))
+    return compressed
+
+
+def compress_ensemble(model, X_test, y_test, accuracy_tolerance=ACCURACY_TOLERANCE, auc_tolerance=AUC_TOLERANCE,
+                      min_agreement=MIN_AGREEMENT, proba_tolerance=PROBA_TOLERANCE, depths=DEPTHS, boost_block=10):
+    """
+    Smallest sub-ensemble of ``model`` within the tolerances on the held-out
+    ``X_test`` / ``y_test``: (compressed VotingClassifier, report).
+    """
+    start = time.perf_counter()
+    tolerances = {
+        'accuracy_tolerance': accuracy_tolerance,
+        'auc_tolerance':      auc_tolerance,
+        'min_agreement':      min_agreement,
+        'proba_tolerance':    proba_tolerance,
+    }
+    y_test = np.asarray(y_test)
+    proba = model.predict_proba(X_test)[:, 1]
+    target = {'proba': proba, 'accuracy': accuracy_score(y_test, proba > 0.5), 'roc_auc': roc_auc_score(y_test, proba)}
+
+    best, tried = None, []
+    for depth in depths:
+        forests = {name: [truncate_tree(t, depth) for t in estimator.estimators_]
+                   for name, estimator in model.named_estimators_.items() if name in FOREST_NAMES}
+        found = _greedy(_components(model, forests, X_test), y_test, target, tolerances, boost_block)
+        if found is None:
+            tried.append({'max_depth': depth, 'within_tolerance': False})
+            continue
+        candidate = _assemble(model, forests, found[0])
+        nodes = node_count(candidate)
+        tried.append({'max_depth': depth, 'within_tolerance': True, 'nodes': nodes,
+                      'n_estimators': _sizes(candidate)})
+        if best is None or nodes < best[1]:
+            best = (candidate, nodes, depth)
+
+    if best is None:
+        # Nothing smaller qualifies; keep the full ensemble
+        best = (model, node_count(model), None)
+    compressed, nodes, depth = best
+    compressed_proba = compressed.predict_proba(X_test)[:, 1]
+
+    report = {
+        **tolerances,
+        'max_depth':          depth,
+        'node_dtype':         np.dtype(NODE_DTYPE).name,
+        'n_estimators':       {'full': _sizes(model), 'compressed': _sizes(compressed)},
+        'nodes':              {'full': node_count(model), 'compressed': nodes},
+        'accuracy':           {'full': float(target['accuracy']),
+                               'compressed': float(accuracy_score(y_test, compressed_proba > 0.5))},
+        'roc_auc':            {'full': float(target['roc_auc']),
+                               'compressed': float(roc_auc_score(y_test, compressed_proba))},
+        'agreement':          float(np.mean((compressed_proba > 0.5) == (proba > 0.5))),
+        'mean_proba_diff':    float(np.mean(np.abs(compressed_proba - proba))),
+        'max_proba_diff':     float(np.max(np.abs(compressed_proba - proba))),
+        'depths_tried':       tried,
+        'seconds':            time.perf_counter() - start,
+    }
+    return compressed, report
+
+
+def _sizes(model):
+    return {name: int(len(np.ravel(e.estimators_)))
+            for name, e in model.named_estimators_.items() if hasattr(e, 'estimators_')}
+
+
+# ─────────────────────────────────────────────────────────────────────── #
+#  Report
+# ─────────────────────────────────────────────────────────────────────── #
+def _scoring_latency(model, dtype, X, repeats=50):
+    """Single-row and batch scoring time, with sklearn and the flattened evaluator."""
+    compiled = CompiledEnsemble.from_voting(model, dtype=dtype)
+    result = {}
+    for backend, score in (('sklearn', model.predict_proba), ('compiled', compiled.predict_proba)):
+        score(X[:1])
+        times = []
+        for i in range(repeats):
+            start = time.perf_counter()
+            score(X[i % len(X):i % len(X) + 1])
+            times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        score(X)
+        result[backend] = {
+            'single_ms':    float(np.median(times) * 1000),
+            'rows_per_sec': len(X) / (time.perf_counter() - start),
+        }
+    return result
+
+
+def compression_report(full, compressed, model_dir, X):
+    """
+    Size, load time and scoring latency of the full model saved in
+    ``model_dir`` against the compressed one saved next to it.
+    """
+    from model import BUNDLE_FILE, load_report
+
+    compressed_dir = os.path.join(model_dir, COMPRESSED_DIR)
+    report = dict(compressed.model_metrics.get('compression', {}))
+    for key, predictor, path in (('full', full, model_dir), ('compressed', compressed, compressed_dir)):
+        load = load_report(path, formats=('bundle_mmap',))['bundle_mmap']
+        report.setdefault('bundle_mb', {})[key] = os.path.getsize(os.path.join(path, BUNDLE_FILE)) / (1024 * 1024)
+        report.setdefault('compiled_mb', {})[key] = \
+            os.path.getsize(os.path.join(path, 'ensemble_compiled.npz')) / (1024 * 1024)
+        report.setdefault('load_seconds', {})[key] = load['seconds']
+        report.setdefault('latency', {})[key] = _scoring_latency(predictor.model, predictor.node_dtype, X)
+    return report
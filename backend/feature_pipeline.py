@@ -0,0 +1,422 @@
+"""
+Declarative feature spec and the transformer compiled from it.
+
+``INPUTS`` lists the raw application fields with their kind and the value
+used when one is missing; ``DERIVED`` lists every engineered feature as an
+operation on earlier columns. The spec is the only definition of the
+features: ``model.engineer_features`` evaluates it over a DataFrame when
+fitting, and ``FeatureTransformer`` compiles it together with the fitted
+label encoders and scaler into one NumPy pass that writes scaled rows
+straight into a preallocated float32 matrix. The transformer is built once
+per fitted model, saved in the model bundle, and used for single requests
+and batches alike.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+# Raw fields: (name, kind, value used when missing). Kinds:
+#   category - string, label-encoded with the fitted encoder
+#   count    - number that may arrive as text, '3+' meaning 3; unparseable -> 0
+#   number   - float
+INPUTS = [
+    ('Gender',            'category', 'Male'),
+    ('Married',           'category', 'Yes'),
+    ('Dependents',        'count',    '0'),
+    ('Education',         'category', 'Graduate'),
+    ('Self_Employed',     'category', 'No'),
+    ('ApplicantIncome',   'number',   5000),
+    ('CoapplicantIncome', 'number',   0),
+    ('LoanAmount',        'number',   120),
+    ('Loan_Amount_Term',  'number',   360),
+    ('Credit_History',    'number',   1.0),
+    ('Property_Area',     'category', 'Semiurban'),
+]
+
+# Engineered features, in column order: (name, op, *arguments), where an
+# argument is an earlier column or a constant. Infinities and NaNs in the
+# finished features become 0.
+DERIVED = [
+    ('TotalIncome',           'add',   'ApplicantIncome', 'CoapplicantIncome'),
+    # Log transforms (stabilise skewed distributions)
+    ('Log_ApplicantIncome',   'log1p', 'ApplicantIncome'),
+    ('Log_CoapplicantIncome', 'log1p', 'CoapplicantIncome'),
+    ('Log_LoanAmount',        'log1p', 'LoanAmount'),
+    ('Log_TotalIncome',       'log1p', 'TotalIncome'),
+    # Ratios & interaction terms
+    ('LoanIncomeRatio',       'ratio', 'LoanAmount', 'TotalIncome'),
+    ('EMI',                   'ratio', 'LoanAmount', 'Loan_Amount_Term'),
+    ('EMI_to_Income',         'ratio', 'EMI', 'TotalIncome'),
+    ('Coapplicant_Ratio',     'ratio', 'CoapplicantIncome', 'TotalIncome'),
+    ('Credit_x_Income',       'mul',   'Credit_History', 'Log_TotalIncome'),
+    ('Credit_x_LoanRatio',    'mul',   'Credit_History', 'LoanIncomeRatio'),
+    ('IncomePerDependent',    'ratio', 'TotalIncome', 'Dependents'),
+    # Term categories
+    ('Short_Term',            'le',    'Loan_Amount_Term', 180),
+    ('Long_Term',             'ge',    'Loan_Amount_Term', 360),
+]
+
+# op -> function(*arguments, out) over columns, and function(*arguments) over
+# Python floats for single records (IEEE results, like NumPy, instead of exceptions)
+OPS = {
+    'add':   lambda a, b, out: np.add(a, b, out=out),
+    'mul':   lambda a, b, out: np.multiply(a, b, out=out),
+    'log1p': lambda a, out: np.log1p(a, out=out),
+    'ratio': lambda a, b, out: np.divide(a, b + 1, out=out),     # a / (b + 1)
+    'le':    lambda a, b, out: np.less_equal(a, b, out=out),
+    'ge':    lambda a, b, out: np.greater_equal(a, b, out=out),
+}
+SCALAR_OPS = {
+    'add':   lambda a, b: a + b,
+    'mul':   lambda a, b: a * b,
+    'log1p': lambda a: _log1p(a),
+    'ratio': lambda a, b: _div(a, b + 1),
+    'le':    lambda a, b: 1.0 if a <= b else 0.0,
+    'ge':    lambda a, b: 1.0 if a >= b else 0.0,
+}
+
+# What a category value the encoder never saw is encoded as:
+#   first   - classes_[0], the historical behaviour
+#   default - the column's missing-value default from INPUTS
+#   error   - raise UnknownCategoryError
+UNKNOWN_POLICIES = ('first', 'default', 'error')
+
+CATEGORICAL_INPUTS = [name for name, kind, _ in INPUTS if kind == 'category']
+NUMERIC_INPUTS = [name for name, kind, _ in INPUTS if kind != 'category']
+
+_MISSING = object()
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _log1p(x):
+    # np.log1p semantics: -inf at -1, nan below
+    if x > -1:
+        return math.log1p(x)
+    return -math.inf if x == -1 else math.nan
+
+
+def _div(a, b):
+    # IEEE division like NumPy, instead of raising ZeroDivisionError
+    if b != 0:
+        return a / b
+    if a == 0 or math.isnan(a):
+        return math.nan
+    return math.copysign(math.inf, a) * math.copysign(1.0, b)
+
+
+def _to_number(value):
+    # Same coercion as parse_counts on one value
+    try:
+        number = float(str(value).replace('3+', '3'))
+    except ValueError:
+        return 0.0
+    return 0.0 if math.isnan(number) else number
+
+
+def parse_counts(series):
+    """A ``count`` column as numbers: '3+' -> 3, anything unparseable -> 0."""
+    return pd.to_numeric(series.astype(str).str.replace('3+', '3', regex=False), errors='coerce').fillna(0)
+
+
+class UnknownCategoryError(ValueError):
+    """A category value the fitted encoder has no code for (policy 'error')."""
+
+
+class CategoryTable:
+    """
+    A fitted LabelEncoder as O(1) lookups: a dict for single values and a
+    hash index for whole columns, instead of scanning ``classes_`` per cell.
+    """
+
+    def __init__(self, column, classes, default):
+        self.column = column
+        self.classes = [str(c) for c in classes]
+        self.codes = {c: float(code) for code, c in enumerate(self.classes)}
+        self.index = pd.Index(self.classes)
+        self.default = default
+        self.default_code = self.codes.get(str(default), 0.0)
+
+    def unknown_code(self, policy, value):
+        """Code for ``value``, which has none, under ``policy``."""
+        if policy == 'error':
+            raise UnknownCategoryError(f"Unknown value for {self.column}: {value!r}")
+        return self.default_code if policy == 'default' else 0.0
+
+    def _count(self, counts, n):
+        if counts is not None:
+            counts[self.column] = counts.get(self.column, 0) + n
+
+    def lookup(self, value, policy='first', counts=None):
+        """Code of one raw value; missing values take the default."""
+        value = str(self.default if _is_missing(value) else value)
+        code = self.codes.get(value)
+        if code is None:
+            self._count(counts, 1)
+            return self.unknown_code(policy, value)
+        return code
+
+    def encode(self, values, policy='first', counts=None):
+        """float64 codes of a column of raw values, in one hash-table pass."""
+        values = pd.Series(values, copy=False)
+        codes = self.index.get_indexer(values.fillna(self.default).astype(str))
+        unknown = codes < 0
+        codes = codes.astype(np.float64)
+        if unknown.any():
+            self._count(counts, int(np.count_nonzero(unknown)))
+            codes[unknown] = self.unknown_code(policy, values.iloc[np.flatnonzero(unknown)[0]])
+        return codes
+
+
+def _compile(derived, index, ops=OPS):
+    """DERIVED as (function, output row, arguments) with columns resolved to work rows."""
+    return [
+        (ops[op], index[name], [index[a] if isinstance(a, str) else float(a) for a in args])
+        for name, op, *args in derived
+    ]
+
+
+def _evaluate(steps, work):
+    """Run compiled steps over ``work``, one row per column, in place."""
+    with np.errstate(all='ignore'):
+        for op, out, args in steps:
+            op(*[work[a] if isinstance(a, int) else a for a in args], out=work[out])
+
+
+def derive_features(numeric, derived=DERIVED):
+    """
+    Engineered features from the (filled, parsed) numeric inputs, a mapping
+    of column -> array-like. Returns column -> float64 array, in
+    ``derived`` order, before infinities are replaced.
+    """
+    names = NUMERIC_INPUTS + [d[0] for d in derived]
+    index = {name: i for i, name in enumerate(names)}
+    work = np.empty((len(names), len(numeric[NUMERIC_INPUTS[0]])))
+    for name in NUMERIC_INPUTS:
+        work[index[name]] = numeric[name]
+    _evaluate(_compile(derived, index), work)
+    return {d[0]: work[index[d[0]]] for d in derived}
+
+
+def fill_values(df, strategies=None):
+    """
+    Value to impute per input column: the spec's default, or the column's
+    ``'mode'`` / ``'median'`` where ``strategies`` says so.
+    """
+    values = {}
+    for name, _, default in INPUTS:
+        strategy = (strategies or {}).get(name, 'default')
+        if strategy == 'mode':
+            values[name] = df[name].mode()[0]
+        elif strategy == 'median':
+            values[name] = df[name].median()
+        elif strategy == 'default':
+            values[name] = default
+        else:
+            values[name] = strategy     # a constant
+    return values
+
+
+class FeatureTransformer:
+    """
+    The feature spec compiled against fitted label encoders and scaler.
+
+    ``transform`` takes one application dict, a list of them, or a
+    DataFrame, and fills a ``(rows, n_features)`` float32 matrix in the
+    training column order. Inputs and engineered features are computed
+    into one float64 work matrix whose first rows are already in that
+    order, then centred and scaled into the output in one step. A single
+    dict is evaluated in plain Python floats instead, which is cheaper
+    than NumPy calls on one-element arrays.
+
+    Category values the encoders never saw are encoded under the
+    ``unknown`` policy (UNKNOWN_POLICIES) and, given a ``counts`` dict,
+    counted per column.
+    """
+
+    # Saved transformers with another version are rebuilt on load
+    VERSION = 2
+
+    def __init__(self, feature_columns, label_encoders, scaler, inputs=INPUTS, derived=DERIVED):
+        self.version = self.VERSION
+        self.feature_columns = list(feature_columns)
+        self.n_features = len(self.feature_columns)
+        self.inputs = list(inputs)
+        self.derived = list(derived)
+
+        # Work rows: the feature columns first, then spec columns the model does not use
+        names = [name for name, _, _ in self.inputs] + [d[0] for d in self.derived]
+        layout = self.feature_columns + [name for name in names if name not in self.feature_columns]
+        self._index = {name: i for i, name in enumerate(layout)}
+        self._n_work = len(layout)
+        # Feature columns the spec does not produce stay 0, as after reindex(fill_value=0)
+        self._zero_rows = [i for i, name in enumerate(self.feature_columns) if name not in names]
+
+        mean = scaler.mean_ if getattr(scaler, 'with_mean', True) else 0.0
+        scale = scaler.scale_ if getattr(scaler, 'scale_', None) is not None else 1.0
+        self._mean = np.broadcast_to(np.asarray(mean, dtype=np.float64), (self.n_features,)).copy()
+        self._scale = np.broadcast_to(np.asarray(scale, dtype=np.float64), (self.n_features,)).copy()
+
+        defaults = {name: default for name, _, default in self.inputs}
+        self._tables = {
+            col: CategoryTable(col, encoder.classes_, defaults.get(col))
+            for col, encoder in label_encoders.items()
+        }
+
+    def __getstate__(self):
+        # Compiled steps hold functions; they are rebuilt after unpickling
+        state = self.__dict__.copy()
+        state.pop('_steps', None)
+        return state
+
+    @property
+    def steps(self):
+        """Column steps, and scalar steps / constants / inputs for single records; compiled on first use."""
+        if '_steps' not in self.__dict__:
+            scalar, constants = [], []
+            for op, target, args in _compile(self.derived, self._index, SCALAR_OPS):
+                # Constants get their own slots after the work rows, so every argument is an index
+                slots = []
+                for a in args:
+                    if not isinstance(a, int):
+                        constants.append(a)
+                        a = self._n_work + len(constants) - 1
+                    slots.append(a)
+                scalar.append((op, target, slots[0], slots[1] if len(slots) > 1 else None))
+            # Inputs of a single record: (name, kind, default, work row, encoding table)
+            record_inputs = [(name, kind, default, self._index[name], self._tables.get(name))
+                             for name, kind, default in self.inputs]
+            self._steps = (_compile(self.derived, self._index), scalar, constants, record_inputs)
+        return self._steps
+
+    # ------------------------------------------------------------------ #
+    #  Inputs
+    # ------------------------------------------------------------------ #
+    @staticmethod
+    def _column(data, name, kind):
+        """Raw values of one input column; None if absent (categoricals only)."""
+        if isinstance(data, pd.DataFrame):
+            if name not in data.columns and kind == 'category':
+                return None
+            return data[name]
+        if kind == 'category':
+            return [record.get(name, _MISSING) for record in data]
+        return [record[name] for record in data]
+
+    def _encode(self, name, values, unknown, counts):
+        table = self._tables.get(name)
+        if values is None or table is None:
+            return 0.0      # absent column: raw 0, as after reindex(fill_value=0)
+        if isinstance(values, pd.Series):
+            return table.encode(values, unknown, counts)
+        return [0.0 if v is _MISSING else table.lookup(v, unknown, counts) for v in values]
+
+    @staticmethod
+    def _counts(values, default):
+        if isinstance(values, pd.Series):
+            # Few distinct values: parse each once, then gather by hash code
+            codes, uniques = pd.factorize(values.fillna(default))
+            return np.array([_to_number(u) for u in uniques], dtype=np.float64)[codes]
+        return [_to_number(default if _is_missing(v) else v) for v in values]
+
+    @staticmethod
+    def _numbers(values, row, default):
+        """Write a ``number`` column into its work ``row``, missing values filled."""
+        if isinstance(values, pd.Series):
+            row[:] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            row[:] = values
+        np.copyto(row, default, where=np.isnan(row))
+
+    # ------------------------------------------------------------------ #
+    #  Transform
+    # ------------------------------------------------------------------ #
+    def transform(self, data, out=None, unknown='first', counts=None):
+        """
+        Scaled float32 feature rows for ``data``, written into ``out`` if
+        given. Unknown category values are added to ``counts`` per column.
+        """
+        if isinstance(data, dict):
+            if out is None:
+                out = np.empty((1, self.n_features), dtype=np.float32)
+            return self._transform_record(data, out, unknown, counts)
+        if not isinstance(data, pd.DataFrame):
+            data = list(data)
+        n = len(data)
+        if out is None:
+            out = np.empty((n, self.n_features), dtype=np.float32)
+
+        work = np.empty((self._n_work, n))
+        work[self._zero_rows] = 0.0
+        for name, kind, default in self.inputs:
+            values = self._column(data, name, kind)
+            i = self._index[name]
+            if kind == 'category':
+                work[i] = self._encode(name, values, unknown, counts)
+            elif kind == 'count':
+                work[i] = self._counts(values, default)
+            else:
+                self._numbers(values, work[i], default)
+
+        _evaluate(self.steps[0], work)
+
+        features = work[:self.n_features]
+        np.nan_to_num(features, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+        features -= self._mean[:, None]
+        np.divide(features, self._scale[:, None], out=out.T)
+        return out
+
+    def _transform_record(self, record, out, unknown, counts):
+        """``transform`` of one dict."""
+        _, steps, constants, inputs = self.steps
+        values = [0.0] * self._n_work + constants
+        for name, kind, default, i, table in inputs:
+            if kind == 'category':
+                if table is not None and name in record:
+                    value = record[name]
+                    value = str(default if _is_missing(value) else value)
+                    code = table.codes.get(value)
+                    values[i] = table.lookup(value, unknown, counts) if code is None else code
+            elif kind == 'count':
+                value = record[name]
+                values[i] = _to_number(default if _is_missing(value) else value)
+            else:
+                value = record[name]
+                value = float(default if _is_missing(value) else value)
+                values[i] = float(default) if value != value else value
+
+        for op, target, a, b in steps:
+            values[target] = op(values[a]) if b is None else op(values[a], values[b])
+
+        row = np.array([v if math.isfinite(v) else 0.0 for v in values[:self.n_features]])
+        row -= self._mean
+        np.divide(row, self._scale, out=out[0])
+        return out
+
+
+def parity_error(predictor, df):
+    """
+    Largest difference, relative to max(1, |value|), between the
+    transformer (on ``df``, on its rows as a list of dicts and on each row
+    as a single dict) and ``preprocess_data`` + ``StandardScaler``, both
+    under the predictor's unknown-category policy. float32 output puts it
+    around 1e-7.
+    """
+    if not len(df):
+        return 0.0
+    frame = predictor.preprocess_data(df, is_training=False).reindex(columns=predictor.feature_columns, fill_value=0)
+    reference = predictor.scaler.transform(frame)
+    tolerance = np.maximum(1.0, np.abs(reference))
+    transformer = predictor.feature_pipeline
+    unknown = predictor.unknown_category
+    records = df.to_dict('records')
+    paths = (
+        transformer.transform(df, unknown=unknown),
+        transformer.transform(records, unknown=unknown),
+        np.vstack([transformer.transform(record, unknown=unknown) for record in records]),
+    )
+    return float(max(np.max(np.abs(reference - X) / tolerance) for X in paths))
@@ -0,0 +1,184 @@
+"""
+On-disk cache of engineered features.
+
+``engineer_features`` (imputation, TotalIncome, log transforms, EMI
+ratios, interaction terms) depends only on the raw rows, so its output
+for a source file can be computed once and reused by every training run,
+incremental update and backfill. Label encoding and scaling depend on the
+fitted model and are still applied by the caller.
+
+Layout under ``root``, one directory per feature-code version (see
+``model.feature_code_version``), so changing the engineering code never
+serves stale features::
+
+    <version>/blocks/<block digest>/c000.npy ... + meta.json
+    <version>/sources/<file sha256>.json     block list of a source file
+
+The file is split into blocks of ``block_rows`` rows, each keyed by a
+digest of its parsed contents. A file seen before is served from its
+manifest without being parsed; a changed file (e.g. new rows appended) is
+parsed again, but only blocks whose contents changed are re-engineered.
+
+Columns are stored one ``.npy`` per column and memory-mapped on read:
+numeric columns of a single-block file are handed to pandas without a
+copy, pages are read in as they are touched. String columns are stored
+as int32 codes plus their categories.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from incremental import file_digest
+
+FEATURE_STORE_DIR = os.getenv('FEATURE_STORE_DIR', 'feature_store')
+
+# Rows per cached block; also the chunk size when a file has to be parsed
+BLOCK_ROWS = 50_000
+
+
+def block_digest(chunk):
+    """Digest of a parsed chunk: column names, dtypes and every value."""
+    digest = hashlib.sha256(json.dumps([[c, str(t)] for c, t in chunk.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(chunk, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class FeatureStore:
+    """Engineered features of source CSVs, cached per block on disk."""
+
+    def __init__(self, root=None, block_rows=BLOCK_ROWS):
+        from model import engineer_features, feature_code_version
+
+        self.engineer = engineer_features
+        self.version = feature_code_version()
+        self.block_rows = block_rows
+        self.root = os.path.join(root or FEATURE_STORE_DIR, self.version)
+        self.blocks_dir = os.path.join(self.root, 'blocks')
+        self.sources_dir = os.path.join(self.root, 'sources')
+        # What the last engineered() call did
+        self.last_stats = {}
+
+    # ------------------------------------------------------------------ #
+    #  Reading
+    # ------------------------------------------------------------------ #
+    def engineered(self, path):
+        """Engineered (unencoded, unscaled) features of the CSV at ``path``."""
+        start = time.perf_counter()
+        sha256 = file_digest(path)
+        manifest_path = os.path.join(self.sources_dir, f'{sha256}.json')
+
+        blocks = None
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                blocks = json.load(f)['blocks']
+            if not all(os.path.exists(self._block_path(b, 'meta.json')) for b in blocks):
+                blocks = None
+
+        manifest_hit, computed = blocks is not None, 0
+        if blocks is None:
+            blocks = []
+            for chunk in pd.read_csv(path, chunksize=self.block_rows):
+                key = block_digest(chunk)
+                if not os.path.exists(self._block_path(key, 'meta.json')):
+                    self._write_block(key, self.engineer(chunk))
+                    computed += 1
+                blocks.append(key)
+            self._write_json(manifest_path, {'source': os.path.basename(path), 'blocks': blocks})
+
+        df = self._read_blocks(blocks)
+        self.last_stats = {
+            'source':          os.path.basename(path),
+            'rows':            len(df),
+            'blocks':          len(blocks),
+            'blocks_computed': computed,
+            'manifest_hit':    manifest_hit,
+            'seconds':         time.perf_counter() - start,
+        }
+        return df
+
+    def _read_blocks(self, blocks):
+        frames = [self._read_block(key) for key in blocks]
+        if not frames:
+            return pd.DataFrame()
+        if len(frames) == 1:
+            return pd.DataFrame(frames[0], copy=False)
+        columns = frames[0].keys()
+        return pd.DataFrame({col: _concat([frame[col] for frame in frames]) for col in columns}, copy=False)
+
+    def _read_block(self, key):
+        with open(self._block_path(key, 'meta.json')) as f:
+            meta = json.load(f)
+        columns = {}
+        for col in meta['columns']:
+            values = np.load(self._block_path(key, f"{col['file']}.npy"), mmap_mode='r')
+            if 'categories' in col:
+                values = pd.Categorical.from_codes(values, col['categories']).astype(col['dtype'])
+            columns[col['name']] = values
+        return columns
+
+    # ------------------------------------------------------------------ #
+    #  Writing
+    # ------------------------------------------------------------------ #
+    def _block_path(self, key, name):
+        return os.path.join(self.blocks_dir, key, name)
+
+    def _write_block(self, key, df):
+        """Write one block into a temporary directory and rename it into place."""
+        os.makedirs(self.blocks_dir, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=f'.{key[:8]}-', dir=self.blocks_dir)
+        try:
+            columns = []
+            for i, (name, series) in enumerate(df.items()):
+                entry = {'name': name, 'file': f'c{i:03d}', 'dtype': str(series.dtype)}
+                if pd.api.types.is_numeric_dtype(series.dtype):
+                    values = series.to_numpy()
+                else:
+                    categorical = pd.Categorical(series)
+                    values = categorical.codes.astype(np.int32)
+                    entry['categories'] = [str(c) for c in categorical.categories]
+                np.save(os.path.join(tmp, f"{entry['file']}.npy"), values)
+                columns.append(entry)
+            with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+                json.dump({'rows': len(df), 'columns': columns}, f)
+            os.replace(tmp, os.path.join(self.blocks_dir, key))
+        except OSError:
+            # Another process wrote the same block first
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not os.path.exists(self._block_path(key, 'meta.json')):
+                raise
+
+    @staticmethod
+    def _write_json(path, payload):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.tmp{os.getpid()}'
+        with open(tmp, 'w') as f:
+            json.dump(payload, f)
+        os.replace(tmp, path)
+
+
+def _concat(parts):
+    if isinstance(parts[0], np.ndarray):
+        return np.concatenate(parts)
+    return pd.concat([pd.Series(p) for p in parts], ignore_index=True)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Precompute engineered features of CSV files")
+    parser.add_argument('csv', nargs='+')
+    parser.add_argument('--root', default=None, help=f"store directory (default $FEATURE_STORE_DIR or {FEATURE_STORE_DIR})")
+    parser.add_argument('--block-rows', type=int, default=BLOCK_ROWS)
+    args = parser.parse_args()
+
+    store = FeatureStore(args.root, block_rows=args.block_rows)
+    for csv_path in args.csv:
+        store.engineered(csv_path)
+        print(json.dumps(store.last_stats))
@@ -0,0 +1,239 @@
+"""
+Incremental (warm-start) retraining on newly labelled applications.
+
+Instead of rebuilding everything from the full history, an update:
+
+1. ``partial_fit``s the scaler on the new rows, then rewrites every tree
+   threshold and the logistic-regression coefficients so the existing
+   members make the same decisions in the updated scaled space (exactly
+   for LR, up to float32 rounding for trees; see ``remap_tree``);
+2. grows ``extra_trees`` more trees on the new rows in RF and ExtraTrees
+   (``warm_start``);
+3. continues boosting GB for ``boost_stages`` more stages on the new rows.
+
+Label encoders are kept as they are: category values never seen before
+are encoded by the predictor's ``unknown_category`` policy, as at
+prediction time. A new category, or a
+drift large enough to need different hyperparameters, still calls for a
+full ``python model.py`` retrain.
+
+``compare_with_full_retrain`` (also ``python incremental.py new.csv
+--compare-with train.csv``) scores an incremental update against a full
+retrain on the same data, on a held-out slice of the new rows.
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from training import FOREST_NAMES
+
+TREE_LEAF = -1
+
+
+def file_digest(path):
+    """sha256 of a data file, recorded in the model lineage."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def lineage_entry(kind, path, rows, **extra):
+    entry = {
+        'kind':       kind,
+        'source':     os.path.basename(path),
+        'sha256':     file_digest(path),
+        'rows':       int(rows),
+        'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+    entry.update(extra)
+    return entry
+
+
+# ─────────────────────────────────────────────────────────────────────── #
+#  Moving fitted members into a new scaled space
+# ─────────────────────────────────────────────────────────────────────── #
+def remap_tree(tree, old_mean, old_scale, new_mean, new_scale):
+    """
+    Rewrite split thresholds of a fitted sklearn Tree in place.
+
+    Trees compare float32 inputs, ``float32(x) <= threshold``, and sklearn
+    often puts thresholds within one float32 step of a training value. So
+    rather than the threshold itself, the rounding boundary above the last
+    float32 value that went left is carried into the new space and rounded
+    up onto the float32 grid: inputs that went left still do. An input can
+    still change side if it lies within one float32 step above a split;
+    ``remap_max_diff`` in the update report shows the effect.
+    """
+    split = (tree.children_left != TREE_LEAF) & np.isfinite(tree.threshold)
+    feature = tree.feature[split]
+    threshold = tree.threshold[split]
+
+    last_left = threshold.astype(np.float32)
+    last_left = np.where(last_left > threshold, np.nextafter(last_left, np.float32(-np.inf)), last_left)
+    boundary = (last_left.astype(np.float64) + np.nextafter(last_left, np.float32(np.inf))) / 2
+
+    raw = boundary * old_scale[feature] + old_mean[feature]
+    remapped = (raw - new_mean[feature]) / new_scale[feature]
+    snapped = remapped.astype(np.float32)
+    snapped = np.where(snapped < remapped, np.nextafter(snapped, np.float32(np.inf)), snapped)
+    tree.threshold[split] = snapped
+
+
+def remap_linear(model, old_mean, old_scale, new_mean, new_scale):
+    """Adjust a linear model's coef_/intercept_ for the new scaling (exact)."""
+    coef = model.coef_ * (new_scale / old_scale)
+    intercept = model.intercept_ + model.coef_ @ ((new_mean - old_mean) / old_scale)
+    # Fresh arrays: the loaded ones may be read-only memory maps
+    model.coef_, model.intercept_ = coef, intercept
+
+
+def _trees(estimator):
+    if hasattr(estimator, 'estimators_') and isinstance(estimator.estimators_, np.ndarray):
+        return [t.tree_ for t in estimator.estimators_.ravel()]   # gradient boosting
+    return [t.tree_ for t in estimator.estimators_]
+
+
+def remap_estimator(estimator, old_mean, old_scale, new_mean, new_scale):
+    if hasattr(estimator, 'coef_'):
+        remap_linear(estimator, old_mean, old_scale, new_mean, new_scale)
+    else:
+        for tree in _trees(estimator):
+            remap_tree(tree, old_mean, old_scale, new_mean, new_scale)
+
+
+# ─────────────────────────────────────────────────────────────────────── #
+#  Update
+# ─────────────────────────────────────────────────────────────────────── #
+def incremental_update(predictor, X, y, extra_trees=50, boost_stages=50):
+    """
+    Warm-start ``predictor``'s model on engineered, unscaled features ``X``
+    with labels ``y``. Returns a report of what changed.
+    """
+    scaler = predictor.scaler
+    old_mean, old_scale = scaler.mean_.copy(), scaler.scale_.copy()
+    proba_before = predictor.model.predict_proba(scaler.transform(X))[:, 1]
+
+    # 1. Scaler statistics, and every member moved into the new space
+    scaler.partial_fit(X)
+    new_mean, new_scale = scaler.mean_, scaler.scale_
+    members = list(predictor.model.named_estimators_.items())
+    for _, estimator in members:
+        remap_estimator(estimator, old_mean, old_scale, new_mean, new_scale)
+
+    X_s = scaler.transform(X)
+    remap_error = float(np.max(np.abs(predictor.model.predict_proba(X_s)[:, 1] - proba_before)))
+
+    # 2./3. More trees on the new rows
+    sizes = {}
+    for name, estimator in members:
+        if name in FOREST_NAMES:
+            added = extra_trees
+        elif name == 'gb':
+            added = boost_stages
+        else:
+            continue
+        if added <= 0:
+            continue
+        estimator.set_params(warm_start=True, n_estimators=estimator.n_estimators + added)
+        estimator.fit(X_s, y)
+        estimator.set_params(warm_start=False)
+        sizes[name] = int(estimator.n_estimators)
+
+    proba_after = predictor.model.predict_proba(X_s)[:, 1]
+    return {
+        'rows':            int(len(X)),
+        'extra_trees':     int(extra_trees),
+        'boost_stages':    int(boost_stages),
+        'n_estimators':    sizes,
+        'remap_max_diff':  remap_error,
+        'new_rows_accuracy_before': float(accuracy_score(y, proba_before > 0.5)),
+        'new_rows_accuracy_after':  float(accuracy_score(y, proba_after > 0.5)),
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────── #
+#  Comparison with a full retrain
+# ─────────────────────────────────────────────────────────────────────── #
+def _evaluate(predictor, df):
+    """Accuracy / ROC-AUC on labelled ``df`` and single-row latency."""
+    y = df['Loan_Status'].map({'Y': 1, 'N': 0}).to_numpy()
+    features = df.drop(columns=['Loan_Status'])
+    proba = predictor._predict_proba(predictor._transform(features))[:, 1]
+
+    rows = features.head(50)
+    start = time.perf_counter()
+    for i in range(len(rows)):
+        predictor.predict(rows.iloc[[i]])
+    latency = (time.perf_counter() - start) / max(len(rows), 1)
+
+    return {
+        'accuracy':   float(accuracy_score(y, proba > 0.5)),
+        'roc_auc':    float(roc_auc_score(y, proba)) if len(set(y)) > 1 else None,
+        'latency_ms': latency * 1000,
+    }
+
+
+def compare_with_full_retrain(model_dir, new_path, base_path, holdout=0.3, **update_args):
+    """
+    Hold out part of ``new_path``; update the model in ``model_dir`` with
+    the rest, retrain from scratch on ``base_path`` + the rest, and score
+    the original, incremental and full models on the held-out rows.
+    """
+    from model import LoanPredictor
+
+    new = pd.read_csv(new_path)
+    fresh, held = train_test_split(new, test_size=holdout, random_state=42, stratify=new['Loan_Status'])
+
+    report = {'holdout_rows': len(held), 'update_rows': len(fresh)}
+    with tempfile.TemporaryDirectory() as tmp:
+        fresh_path = os.path.join(tmp, 'update.csv')
+        fresh.to_csv(fresh_path, index=False)
+        full_path = os.path.join(tmp, 'full.csv')
+        pd.concat([pd.read_csv(base_path), fresh]).to_csv(full_path, index=False)
+
+        predictor = LoanPredictor()
+        predictor.load_model(model_dir, mmap=False)
+        report['original'] = _evaluate(predictor, held)
+
+        start = time.perf_counter()
+        predictor.update(fresh_path, **update_args)
+        report['incremental'] = dict(_evaluate(predictor, held), train_seconds=time.perf_counter() - start)
+
+        full = LoanPredictor()
+        start = time.perf_counter()
+        full.train(full_path, cascade=False)
+        report['full'] = dict(_evaluate(full, held), train_seconds=time.perf_counter() - start)
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    from model import LoanPredictor
+
+    parser = argparse.ArgumentParser(description="Warm-start the saved model on newly labelled rows")
+    parser.add_argument('new_csv', help="labelled rows (training CSV schema, with Loan_Status)")
+    parser.add_argument('--model-dir', default='models')
+    parser.add_argument('--extra-trees', type=int, default=50)
+    parser.add_argument('--boost-stages', type=int, default=50)
+    parser.add_argument('--compare-with', metavar='BASE_CSV',
+                        help="only compare against a full retrain on BASE_CSV + new rows; nothing is saved")
+    args = parser.parse_args()
+    options = {'extra_trees': args.extra_trees, 'boost_stages': args.boost_stages}
+
+    if args.compare_with:
+        print(json.dumps(compare_with_full_retrain(args.model_dir, args.new_csv, args.compare_with, **options), indent=2))
+    else:
+        predictor = LoanPredictor()
+        predictor.load_model(args.model_dir, mmap=False)
+        print(json.dumps(predictor.update(args.new_csv, **options), indent=2))
+        predictor.save_model(args.model_dir)
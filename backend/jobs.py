@@ -0,0 +1,225 @@
+"""
+Background batch-scoring jobs.
+
+Uploaded CSVs are scored on a small thread pool that shares the process's
+loaded ``LoanPredictor``. Job state and results live on disk under
+``jobs_dir`` so that any gunicorn worker can answer status and result
+requests, whichever worker accepted the upload.
+
+Each unfinished job records the pid of the worker that owns it, and that
+worker rewrites its state every ``heartbeat_seconds``. A job whose owner
+has exited, or has not written for ``stale_seconds``, is marked failed
+when its status is read and when a JobManager starts, instead of staying
+queued / running forever.
+
+Queue limits are per process: with N gunicorn workers up to N times
+``workers + max_queued`` jobs can be accepted.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is at its depth limit."""
+
+
+class JobManager:
+    def __init__(self, score_chunk, jobs_dir, workers=2, max_queued=8,
+                 chunksize=5000, keep_finished=100, heartbeat_seconds=10.0, stale_seconds=60.0):
+        """
+        ``score_chunk(df, offset)`` turns one CSV chunk into result records.
+        At most ``workers`` jobs run at once and ``max_queued`` wait behind
+        them in this process; further submissions raise ``JobQueueFull``.
+        """
+        self.score_chunk = score_chunk
+        self.jobs_dir = jobs_dir
+        self.workers = workers
+        self.max_queued = max_queued
+        self.chunksize = chunksize
+        self.keep_finished = keep_finished
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = stale_seconds
+        os.makedirs(jobs_dir, exist_ok=True)
+
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-job')
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._active = 0        # queued + running in this process
+        self._jobs = {}         # job id -> state, for the jobs counted in _active
+        self._finished = []     # job ids, oldest first
+        self._heartbeat_pid = None
+        self.recover()
+
+    # ------------------------------------------------------------------ #
+    #  Paths & state files
+    # ------------------------------------------------------------------ #
+    def _path(self, job_id, suffix):
+        return os.path.join(self.jobs_dir, f'{job_id}{suffix}')
+
+    def _write_state(self, state):
+        # Job threads and the heartbeat thread write the same files
+        with self._write_lock:
+            state['heartbeat_at'] = time.time()
+            tmp = self._path(state['id'], '.json.tmp')
+            with open(tmp, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp, self._path(state['id'], '.json'))
+
+    def _read_state(self, job_id):
+        try:
+            with open(self._path(job_id, '.json')) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _orphaned(self, state):
+        """True if an unfinished job's owning worker is gone or has stopped writing."""
+        if state['status'] not in ('queued', 'running'):
+            return False
+        if time.time() - state.get('heartbeat_at', 0) > self.stale_seconds:
+            return True
+        try:
+            os.kill(state['pid'], 0)
+        except ProcessLookupError:
+            return True
+        except (OSError, KeyError):
+            pass        # someone else's process, or a state without a pid
+        return False
+
+    def _fail_orphan(self, state):
+        state.update(status='failed', finished_at=time.time(),
+                     error=f"Worker {state.get('pid')} stopped before the job finished; resubmit it")
+        self._write_state(state)
+        if os.path.exists(self._path(state['id'], '.csv')):
+            os.remove(self._path(state['id'], '.csv'))
+        return state
+
+    def status(self, job_id):
+        """Job state dict, or None for an unknown id. Orphaned jobs are marked failed."""
+        state = self._read_state(job_id)
+        if state is not None and self._orphaned(state):
+            state = self._fail_orphan(state)
+        return state
+
+    def recover(self):
+        """Mark every orphaned job in ``jobs_dir`` failed; returns their ids."""
+        failed = []
+        for name in os.listdir(self.jobs_dir):
+            if name.endswith('.json'):
+                state = self._read_state(name[:-len('.json')])
+                if state is not None and self._orphaned(state):
+                    failed.append(self._fail_orphan(state)['id'])
+        return failed
+
+    def _start_heartbeat(self):
+        # Threads do not survive a fork: one heartbeat per process, started on first use
+        if self._heartbeat_pid == os.getpid():
+            return
+        self._heartbeat_pid = os.getpid()
+
+        def beat():
+            while True:
+                time.sleep(self.heartbeat_seconds)
+                with self._lock:
+                    states = list(self._jobs.values())
+                for state in states:
+                    self._write_state(state)
+
+        threading.Thread(target=beat, name='batch-job-heartbeat', daemon=True).start()
+
+    def result_path(self, job_id):
+        """Path of the NDJSON results of a finished job, else None."""
+        state = self.status(job_id)
+        if state is None or state['status'] != 'done':
+            return None
+        return self._path(job_id, '.ndjson')
+
+    # ------------------------------------------------------------------ #
+    #  Submission
+    # ------------------------------------------------------------------ #
+    @property
+    def queue_depth(self):
+        with self._lock:
+            return self._active
+
+    def submit(self, stream):
+        """Queue a CSV upload (file-like) for scoring and return the job id."""
+        with self._lock:
+            if self._active >= self.workers + self.max_queued:
+                raise JobQueueFull(f"{self._active} jobs already queued or running in this worker")
+            self._active += 1
+        self._start_heartbeat()
+
+        job_id = uuid.uuid4().hex
+        try:
+            with open(self._path(job_id, '.csv'), 'wb') as f:
+                shutil.copyfileobj(stream, f)
+            state = {
+                'id': job_id,
+                'status': 'queued',
+                'rows_done': 0,
+                'rows_total': None,
+                'progress': 0.0,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'error': None,
+                'pid': os.getpid(),
+                'heartbeat_at': None,
+            }
+            self._write_state(state)
+            with self._lock:
+                self._jobs[job_id] = state
+            self._pool.submit(self._run, state)
+        except Exception:
+            with self._lock:
+                self._active -= 1
+                self._jobs.pop(job_id, None)
+            raise
+        return job_id
+
+    # ------------------------------------------------------------------ #
+    #  Worker
+    # ------------------------------------------------------------------ #
+    def _run(self, state):
+        source = self._path(state['id'], '.csv')
+        try:
+            state.update(status='running', started_at=time.time())
+            with open(source, 'rb') as f:
+                state['rows_total'] = max(sum(1 for _ in f) - 1, 0)
+            self._write_state(state)
+
+            with open(self._path(state['id'], '.ndjson'), 'w') as out:
+                for chunk in pd.read_csv(source, chunksize=self.chunksize):
+                    for record in self.score_chunk(chunk, state['rows_done']):
+                        out.write(json.dumps(record) + '\n')
+                    state['rows_done'] += len(chunk)
+                    state['progress'] = min(state['rows_done'] / max(state['rows_total'], 1), 1.0)
+                    self._write_state(state)
+
+            state.update(status='done', progress=1.0)
+        except Exception as e:
+            state.update(status='failed', error=str(e))
+        finally:
+            state['finished_at'] = time.time()
+            self._write_state(state)
+            if os.path.exists(source):
+                os.remove(source)
+            with self._lock:
+                self._active -= 1
+                self._jobs.pop(state['id'], None)
+                self._finished.append(state['id'])
+                expired = self._finished[:-self.keep_finished] if self.keep_finished else []
+                self._finished = self._finished[len(expired):]
+            for job_id in expired:
+                for suffix in ('.json', '.ndjson'):
+                    if os.path.exists(self._path(job_id, suffix)):
+                        os.remove(self._path(job_id, suffix))
@@ -0,0 +1,109 @@
+"""
+Request coalescing for single predictions.
+
+Scoring the ensemble has a large fixed cost per call (every sub-model,
+every tree), so 64 applications cost little more as one batch than one
+application does alone. ``MicroBatcher`` holds concurrent requests for
+up to ``max_wait_ms`` after the first of them arrived (or until
+``max_batch`` are waiting), scores them with one vectorised call and
+hands each caller its own result. While a batch is being scored the next
+one keeps filling, so batches grow with load and a lone request never
+waits more than ``max_wait_ms``.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class _Pending:
+    __slots__ = ('item', 'future', 'queued_at')
+
+    def __init__(self, item):
+        self.item = item
+        self.future = Future()
+        self.queued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    def __init__(self, score, max_batch=64, max_wait_ms=2.0, workers=1, observe=None):
+        """
+        ``score(items)`` returns one result, or the exception to raise, per
+        item. ``workers`` batches can be scored at once (more than one only
+        helps when ``score`` releases the GIL, e.g. with a ScorerPool).
+        ``observe(batch_size, waits)`` is called for every batch with how
+        long each request waited before its batch started scoring.
+        """
+        self.score = score
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max_wait_ms / 1000
+        self.workers = max(1, int(workers))
+        self.observe = observe
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = queue.Queue()
+        self.batches = 0
+        self.requests = 0
+
+    def submit(self, item, timeout=None):
+        """Score ``item`` together with whatever arrives meanwhile; returns its result."""
+        self._start()
+        pending = _Pending(item)
+        self._queue.put(pending)
+        return pending.future.result(timeout)
+
+    def _start(self):
+        """Start the batching threads once per process (again after a fork)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            for i in range(self.workers):
+                threading.Thread(target=self._run, name=f'micro-batcher-{i}', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = batch[0].queued_at + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            try:
+                results = self.score([pending.item for pending in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+
+            for pending, result in zip(batch, results):
+                if isinstance(result, BaseException):
+                    pending.future.set_exception(result)
+                else:
+                    pending.future.set_result(result)
+            with self._lock:
+                self.batches += 1
+                self.requests += len(batch)
+            if self.observe is not None:
+                self.observe(len(batch), [started - pending.queued_at for pending in batch])
+
+    def stats(self):
+        return {
+            'max_batch':   self.max_batch,
+            'max_wait_ms': self.max_wait * 1000,
+            'workers':     self.workers,
+            'queued':      self._queue.qsize(),
+            'batches':     self.batches,
+            'requests':    self.requests,
+            'mean_batch':  self.requests / self.batches if self.batches else None,
+        }
@@ -1,28 +1,128 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split, StratifiedKFold, cross_val_score, GridSearchCV
+from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.ensemble import (
-    RandomForestClassifier,
-    GradientBoostingClassifier,
-    VotingClassifier,
-    ExtraTreesClassifier,
-)
-from sklearn.linear_model import LogisticRegression
+from sklearn.ensemble import GradientBoostingClassifier
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix, roc_auc_score
+import hashlib
+import inspect
+import itertools
 import joblib
+import json
 import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
 import warnings
+import feature_pipeline
+from feature_pipeline import (
+    CategoryTable, FeatureTransformer, INPUTS, DERIVED, NUMERIC_INPUTS, UNKNOWN_POLICIES,
+    derive_features, parse_counts, parity_error,
+)
+from compiled_ensemble import CompiledEnsemble
+import compiled_ensemble
+from compression import compress_ensemble, compression_report, COMPRESSED_DIR, NODE_DTYPE, REPORT_FILE
+from training import train_ensemble
+from incremental import incremental_update, lineage_entry
+from out_of_core import budget_rows, build_training_matrix
 warnings.filterwarnings('ignore')
 
+# Values used for missing inputs (from the feature spec)
+DEFAULTS = {name: default for name, _, default in INPUTS}
+
+# Single-file model artifact written by save_model
+BUNDLE_FILE = 'model_bundle.joblib'
+BUNDLE_VERSION = 1
+
+# Above this many rows sklearn's C tree walk beats the compiled NumPy evaluator
+COMPILED_MAX_ROWS = 512
+
+# Largest probability gap accepted from float32 flattened arrays
+FLOAT32_PARITY = 1e-6
+
+# Model generations in this process; part of every prediction cache key
+_GENERATIONS = itertools.count(1)
+
+# Raw input fields that must parse as numbers
+NUMERIC_COLUMNS = ['ApplicantIncome', 'CoapplicantIncome', 'LoanAmount', 'Loan_Amount_Term', 'Credit_History']
+
+
+def engineer_features(df):
+    """
+    Imputation and the engineered features of the spec in feature_pipeline.py.
+    Depends only on the raw rows (no fitted state), so results can be cached
+    per source file; see feature_store.py.
+    """
+    df = df.drop(columns='Loan_ID', errors='ignore')
+
+    # ── Fill missing values ──────────────────────────────────────── #
+    for col, val in DEFAULTS.items():
+        if col in df.columns:
+            df[col] = df[col].fillna(val)
+
+    # ── Numeric cleaning ─────────────────────────────────────────── #
+    df['Dependents'] = parse_counts(df['Dependents'])
+
+    # ── Feature Engineering ──────────────────────────────────────── #
+    df = df.assign(**derive_features({col: df[col] for col in NUMERIC_INPUTS}))
+
+    # Replace infinities
+    df.replace([np.inf, -np.inf], 0, inplace=True)
+
+    return df
+
+
+def feature_code_version():
+    """Digest of the feature spec and engineering code; keys cached features."""
+    digest = hashlib.sha256(inspect.getsource(engineer_features).encode())
+    digest.update(json.dumps([INPUTS, DERIVED]).encode())
+    digest.update(inspect.getsource(feature_pipeline.derive_features).encode())
+    return digest.hexdigest()[:16]
+
 
 class LoanPredictor:
-    def __init__(self):
+    def __init__(self, cascade_margin=None, cache=None, unknown_category='first'):
+        if unknown_category not in UNKNOWN_POLICIES:
+            raise ValueError(f"Unknown category policy {unknown_category!r}; expected one of {UNKNOWN_POLICIES}")
         self.model = None
         self.label_encoders = {}
         self.scaler = StandardScaler()
         self.feature_columns = None
         self.model_metrics = {}
+        self.feature_pipeline = None
+        # Distilled fast model; it answers alone when its confidence is at
+        # least cascade_margin (None disables the cascade at predict time)
+        self.fast_model = None
+        self.cascade_margin = cascade_margin
+        # Flattened-tree evaluator, used instead of self.model when set
+        self.compiled = None
+        # Parity of the last flattened ensemble built against self.model
+        # (parity_error, tolerance, passed); a failed check means sklearn scores
+        self.compiled_check = None
+        # Precision of its thresholds and values (float32 for a compressed model)
+        self.node_dtype = np.dtype(np.float64)
+        # Compressed copy of this model (see compress); saved next to it
+        self.compressed = None
+        # Optional callable(X) -> probabilities scoring the ensemble in other
+        # processes (see ScorerPool.bind); preferred over both when set
+        self.remote_proba = None
+        # Flattened ensemble walked for explain=True, built on first use
+        self.explainer = None
+        # Optional PredictionCache for dict predictions, possibly shared with
+        # other predictors; keys carry model_generation, which changes with
+        # every model fitted, loaded or updated into this predictor
+        self.cache = cache
+        self.model_generation = 0
+        self.load_stats = {}
+        self.model_dir = None
+        # Optional callable(stage, seconds) fed by predict / predict_many
+        self.stage_hook = None
+        # How category values the encoders never saw are encoded (see
+        # UNKNOWN_POLICIES), and optional callable(column, count) told about them
+        self.unknown_category = unknown_category
+        self.unknown_hook = None
 
     # ------------------------------------------------------------------ #
     #  Data loading
@@ -32,67 +132,27 @@ class LoanPredictor:
         df = pd.read_csv(train_path)
         return df
 
+    @staticmethod
+    def engineered_data(path, feature_store=None):
+        """Engineered features of a CSV, from ``feature_store`` when given."""
+        if feature_store is None:
+            return engineer_features(pd.read_csv(path))
+        df = feature_store.engineered(path)
+        stats = feature_store.last_stats
+        print(f"Feature store: {stats['blocks'] - stats['blocks_computed']}/{stats['blocks']} blocks cached "
+              f"({stats['seconds']:.2f}s)")
+        return df
+
     # ------------------------------------------------------------------ #
     #  Preprocessing & Feature Engineering
     # ------------------------------------------------------------------ #
     def preprocess_data(self, df, is_training=True):
         """Preprocess the data with rich feature engineering."""
-        df = df.copy()
-
-        # Drop Loan_ID
-        if 'Loan_ID' in df.columns:
-            df = df.drop('Loan_ID', axis=1)
-
-        # ── Fill missing values ──────────────────────────────────────── #
-        defaults = {
-            'Gender': 'Male',
-            'Married': 'Yes',
-            'Dependents': '0',
-            'Self_Employed': 'No',
-            'Education': 'Graduate',
-            'Property_Area': 'Semiurban',
-            'ApplicantIncome': 5000,
-            'CoapplicantIncome': 0,
-            'LoanAmount': 120,
-            'Loan_Amount_Term': 360,
-            'Credit_History': 1.0,
-        }
-        for col, val in defaults.items():
-            if col in df.columns:
-                df[col] = df[col].fillna(val)
-
-        # ── Numeric cleaning ─────────────────────────────────────────── #
-        df['Dependents'] = df['Dependents'].astype(str).str.replace('3+', '3', regex=False)
-        df['Dependents'] = pd.to_numeric(df['Dependents'], errors='coerce').fillna(0)
-
-        # ── Feature Engineering ──────────────────────────────────────── #
-        df['TotalIncome'] = df['ApplicantIncome'] + df['CoapplicantIncome']
-
-        # Log transforms (stabilise skewed distributions)
-        df['Log_ApplicantIncome']    = np.log1p(df['ApplicantIncome'])
-        df['Log_CoapplicantIncome']  = np.log1p(df['CoapplicantIncome'])
-        df['Log_LoanAmount']         = np.log1p(df['LoanAmount'])
-        df['Log_TotalIncome']        = np.log1p(df['TotalIncome'])
-
-        # Ratios & interaction terms
-        df['LoanIncomeRatio']        = df['LoanAmount'] / (df['TotalIncome'] + 1)
-        df['EMI']                    = df['LoanAmount'] / (df['Loan_Amount_Term'] + 1)
-        df['EMI_to_Income']          = df['EMI'] / (df['TotalIncome'] + 1)
-        df['Coapplicant_Ratio']      = df['CoapplicantIncome'] / (df['TotalIncome'] + 1)
+        return self.encode_categoricals(engineer_features(df), is_training=is_training)
 
-        # Credit history interaction
-        df['Credit_x_Income']        = df['Credit_History'] * df['Log_TotalIncome']
-        df['Credit_x_LoanRatio']     = df['Credit_History'] * df['LoanIncomeRatio']
-
-        # Income per dependent
-        df['IncomePerDependent']     = df['TotalIncome'] / (df['Dependents'] + 1)
-
-        # Term categories
-        df['Short_Term']             = (df['Loan_Amount_Term'] <= 180).astype(int)
-        df['Long_Term']              = (df['Loan_Amount_Term'] >= 360).astype(int)
-
-        # Replace infinities
-        df.replace([np.inf, -np.inf], 0, inplace=True)
+    def encode_categoricals(self, df, is_training=True):
+        """Label-encode the categorical columns of engineered features."""
+        df = df.copy()
 
         # ── Encode categorical columns ───────────────────────────────── #
         categorical_features = ['Gender', 'Married', 'Education', 'Self_Employed', 'Property_Area']
@@ -104,12 +164,9 @@ class LoanPredictor:
                     df[col] = self.label_encoders[col].fit_transform(df[col].astype(str))
                 else:
                     if col in self.label_encoders:
-                        df[col] = df[col].astype(str)
-                        df[col] = df[col].apply(
-                            lambda x: x if x in self.label_encoders[col].classes_
-                            else self.label_encoders[col].classes_[0]
-                        )
-                        df[col] = self.label_encoders[col].transform(df[col])
+                        # Hash lookup of the whole column in the fitted classes
+                        table = CategoryTable(col, self.label_encoders[col].classes_, DEFAULTS.get(col))
+                        df[col] = table.encode(df[col], self.unknown_category).astype(np.int64)
 
         # Final NaN sweep
         df = df.fillna(0)
@@ -118,13 +175,30 @@ class LoanPredictor:
     # ------------------------------------------------------------------ #
     #  Training
     # ------------------------------------------------------------------ #
-    def train(self, train_path):
-        """Train an ensemble model targeting ~89% accuracy."""
+    def train(self, train_path, cascade=True, workers=None, search=False, feature_store=None, compress=False):
+        """
+        Train an ensemble model targeting ~89% accuracy.
+
+        With a ``feature_store`` (feature_store.FeatureStore) the engineered
+        features are read from its cache, and only computed for new data.
+
+        ``workers`` caps the processes used for fitting (default
+        $TRAIN_WORKERS or every CPU); ``search`` runs a successive-halving
+        hyperparameter search first. See training.py.
+
+        With ``cascade`` a cheap distilled model is fitted as well and its
+        agreement / fallback rate / speed-up are stored under
+        ``model_metrics['cascade']``.
+
+        With ``compress`` (True, or a dict of compression.compress_ensemble
+        options) a compressed copy is selected on the held-out split too;
+        see ``compress``.
+        """
         print("Loading data...")
-        df = self.load_data(train_path)
+        df = self.engineered_data(train_path, feature_store)
 
         print("Preprocessing data...")
-        df = self.preprocess_data(df, is_training=True)
+        df = self.encode_categoricals(df, is_training=True)
 
         # Separate features and target
         X = df.drop('Loan_Status', axis=1)
@@ -143,65 +217,68 @@ class LoanPredictor:
         X_train_s = self.scaler.fit_transform(X_train)
         X_test_s  = self.scaler.transform(X_test)
 
-        # ── Build individual classifiers ─────────────────────────────── #
-        rf = RandomForestClassifier(
-            n_estimators=300,
-            max_depth=12,
-            min_samples_split=3,
-            min_samples_leaf=1,
-            max_features='sqrt',
-            class_weight='balanced',
-            random_state=42,
-            n_jobs=-1,
-        )
+        lineage = lineage_entry('full', train_path, len(df), version=1)
+        return self._fit_and_evaluate(X_train_s, X_test_s, y_train, y_test, lineage,
+                                      cascade=cascade, workers=workers, search=search, compress=compress)
 
-        gb = GradientBoostingClassifier(
-            n_estimators=300,
-            learning_rate=0.05,
-            max_depth=4,
-            min_samples_split=4,
-            min_samples_leaf=2,
-            subsample=0.85,
-            max_features='sqrt',
-            random_state=42,
-        )
+    def train_out_of_core(self, train_path, mode='reservoir', memory_budget_mb=512, chunksize=100_000,
+                          cascade=True, workers=None, search=False, compress=False):
+        """
+        Train from a CSV too large for ``train``: it is streamed in chunks,
+        encoders and scaler come from one streaming pass, and the model is
+        fitted on a stratified sample that fits ``memory_budget_mb``
+        (``mode='reservoir'``) or on every row through a memory-mapped
+        feature matrix (``mode='memmap'``, no cross-validation). In memmap
+        mode the trees read the float32 matrix without copying it, and the
+        logistic-regression member, which may copy it to float64, is fitted
+        on a random sample sized to the budget. See out_of_core.py.
+        """
+        print(f"Streaming {train_path} ({mode}, budget {memory_budget_mb} MB)...")
+        with tempfile.TemporaryDirectory(prefix='loan-train-') as memmap_dir:
+            X, y, info = build_training_matrix(self, train_path, mode=mode, memory_budget_mb=memory_budget_mb,
+                                               chunksize=chunksize, memmap_dir=memmap_dir)
+            print(f"Samples:  {info['rows_used']} of {info['rows_total']}  ({info['matrix_mb']:.1f} MB)")
 
-        et = ExtraTreesClassifier(
-            n_estimators=300,
-            max_depth=12,
-            min_samples_split=3,
-            min_samples_leaf=1,
-            class_weight='balanced',
-            random_state=42,
-            n_jobs=-1,
-        )
+            if mode == 'reservoir':
+                X_train_s, X_test_s, y_train, y_test = train_test_split(
+                    X, y, test_size=0.2, random_state=42, stratify=y
+                )
+                cv_folds = 5
+                linear_rows = None
+            else:
+                # Rows were written in random order: slices are random splits and stay on disk
+                n_test = max(1, len(y) // 5)
+                X_train_s, X_test_s, y_train, y_test = X[n_test:], X[:n_test], y[n_test:], y[:n_test]
+                cv_folds = 0
+                # ...and the leading training rows a random sample for the linear member
+                linear_rows = budget_rows(memory_budget_mb, X.shape[1])
 
-        lr = LogisticRegression(
-            C=1.0,
-            max_iter=1000,
-            class_weight='balanced',
-            random_state=42,
-        )
+            lineage = lineage_entry('full', train_path, info['rows_used'], version=1, out_of_core=info)
+            self._fit_and_evaluate(X_train_s, X_test_s, y_train, y_test, lineage,
+                                   cascade=cascade, workers=workers, search=search, cv_folds=cv_folds,
+                                   compress=compress, linear_rows=linear_rows)
+        self.model_metrics['out_of_core'] = info
+        return self.model_metrics
 
-        # ── Soft-voting ensemble ─────────────────────────────────────── #
+    def _fit_and_evaluate(self, X_train_s, X_test_s, y_train, y_test, lineage,
+                          cascade=True, workers=None, search=False, cv_folds=5, compress=False,
+                          linear_rows=None):
+        """
+        Fit the ensemble on scaled matrices, then evaluate and record
+        metrics. ``linear_rows`` caps the rows the linear member is fitted
+        on (see train_ensemble).
+        """
+        # ── Ensemble + cross-validation on one worker pool ───────────── #
         print("\nTraining Ensemble (RF + GB + ExtraTrees + LR)...")
-        self.model = VotingClassifier(
-            estimators=[('rf', rf), ('gb', gb), ('et', et), ('lr', lr)],
-            voting='soft',
-            weights=[3, 4, 2, 1],   # Give GB the most weight
-            n_jobs=-1,
-        )
-
-        self.model.fit(X_train_s, y_train)
-
-        # ── Cross-validation ─────────────────────────────────────────── #
-        cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
-        cv_scores = cross_val_score(self.model, X_train_s, y_train, cv=cv, scoring='accuracy', n_jobs=-1)
-        print(f"CV Accuracy: {cv_scores.mean():.4f} ± {cv_scores.std():.4f}")
+        self.model, training = train_ensemble(X_train_s, y_train, workers=workers, search=search,
+                                              n_splits=cv_folds, max_linear_rows=linear_rows)
+        if cv_folds:
+            print(f"CV Accuracy: {training['cv_accuracy_mean']:.4f} ± {training['cv_accuracy_std']:.4f}")
 
         # ── Test evaluation ──────────────────────────────────────────── #
-        y_pred      = self.model.predict(X_test_s)
-        y_pred_prob = self.model.predict_proba(X_test_s)[:, 1]
+        test_proba  = self._predict_proba(X_test_s)
+        y_pred      = self._labels(test_proba)
+        y_pred_prob = test_proba[:, 1]
 
         accuracy = accuracy_score(y_test, y_pred)
         roc_auc  = roc_auc_score(y_test, y_pred_prob)
@@ -216,8 +293,9 @@ class LoanPredictor:
             'model_name': 'Ensemble (RF + GB + ExtraTrees + LR)',
             'accuracy':   float(accuracy),
             'roc_auc':    float(roc_auc),
-            'cv_accuracy_mean': float(cv_scores.mean()),
-            'cv_accuracy_std':  float(cv_scores.std()),
+            'cv_accuracy_mean': training.get('cv_accuracy_mean'),
+            'cv_accuracy_std':  training.get('cv_accuracy_std'),
+            'training': training,
             'classification_report': classification_report(y_test, y_pred, output_dict=True),
             'confusion_matrix':      confusion_matrix(y_test, y_pred).tolist(),
         }
@@ -234,73 +312,727 @@ class LoanPredictor:
 
         self.model_metrics['feature_importance'] = feature_importance.to_dict('records')
 
+        if cascade:
+            self.model_metrics['cascade'] = self._train_cascade(X_train_s, X_test_s, y_test, test_proba)
+
+        # Which data went into which model version (see update())
+        self.model_metrics['lineage'] = [lineage]
+
+        self._compile_features()
+        if compress:
+            self.compress(X_test_s, y_test, **(compress if isinstance(compress, dict) else {}))
         return self.model_metrics
 
+    def compress(self, X_test_s, y_test, **options):
+        """
+        Select the smallest sub-ensemble (fewer trees, maybe shallower) that
+        stays within tolerance of this model on scaled held-out rows, see
+        compression.py. It is kept as ``self.compressed``, a predictor with
+        the same preprocessing, and written to ``compressed/`` by
+        ``save_model``. The report is stored under
+        ``model_metrics['compression']`` and returned.
+        """
+        print("\nCompressing ensemble...")
+        model, report = compress_ensemble(self.model, X_test_s, y_test, **options)
+
+        compressed = LoanPredictor(cascade_margin=self.cascade_margin, unknown_category=self.unknown_category)
+        compressed.model           = model
+        compressed.scaler          = self.scaler
+        compressed.label_encoders  = self.label_encoders
+        compressed.feature_columns = self.feature_columns
+        compressed.fast_model      = self.fast_model
+        compressed.node_dtype      = np.dtype(NODE_DTYPE)
+
+        y_pred = compressed._labels(model.predict_proba(X_test_s))
+        compressed.model_metrics = dict(
+            self.model_metrics,
+            model_name=f"{self.model_metrics.get('model_name', 'Ensemble')} (compressed)",
+            accuracy=report['accuracy']['compressed'],
+            roc_auc=report['roc_auc']['compressed'],
+            classification_report=classification_report(y_test, y_pred, output_dict=True),
+            confusion_matrix=confusion_matrix(y_test, y_pred).tolist(),
+            compression=report,
+        )
+        compressed._compile_features(self.feature_pipeline)
+
+        self.compressed = compressed
+        self.model_metrics['compression'] = report
+        sizes = report['n_estimators']['compressed']
+        print(f"Compressed to {sum(sizes.values())} trees ({', '.join(f'{k} {v}' for k, v in sizes.items())}), "
+              f"max depth {report['max_depth'] or 'unchanged'}, {report['nodes']['compressed']} of "
+              f"{report['nodes']['full']} nodes: accuracy {report['accuracy']['compressed']:.4f}, "
+              f"ROC-AUC {report['roc_auc']['compressed']:.4f}")
+        return report
+
+    def update(self, new_path, extra_trees=50, boost_stages=50, feature_store=None):
+        """
+        Warm-start the trained model on newly labelled rows only: update the
+        scaler, add ``extra_trees`` trees to RF/ET and ``boost_stages`` GB
+        stages. The compressed copy and the distilled fast model (cascade)
+        are dropped; retrain to get them back. The step is appended to
+        ``model_metrics['lineage']`` and its report returned. See incremental.py.
+        """
+        print(f"Updating model with {new_path}...")
+        start = time.perf_counter()
+        df = self.encode_categoricals(self.engineered_data(new_path, feature_store), is_training=False)
+        X = df.drop('Loan_Status', axis=1).reindex(columns=self.feature_columns, fill_value=0)
+        y = df['Loan_Status'].map({'Y': 1, 'N': 0})
+
+        report = incremental_update(self, X, y, extra_trees=extra_trees, boost_stages=boost_stages)
+        report['seconds'] = time.perf_counter() - start
+        # Selected from the previous trees; no longer a copy of this model
+        self.compressed = None
+        self.model_metrics.pop('compression', None)
+        # Distilled from the previous ensemble, and the new rows alone are too few
+        # to distil again: drop it so every prediction comes from the updated model
+        self.fast_model = None
+        self.model_metrics.pop('cascade', None)
+
+        lineage = self.model_metrics.setdefault('lineage', [])
+        parent = lineage[-1]['version'] if lineage else 1
+        lineage.append(lineage_entry('incremental', new_path, len(df), version=parent + 1, parent=parent,
+                                     n_estimators=report['n_estimators']))
+        self.model_metrics['incremental'] = report
+
+        if self.compiled is not None:
+            self.compiled = self._load_compiled(None)
+            if self.compiled is None:
+                self.load_stats.update(backend='sklearn', compiled_check=self.compiled_check)
+        self._compile_features()
+        print(f"Model updated to version {parent + 1} in {report['seconds']:.1f}s "
+              f"(new-row accuracy {report['new_rows_accuracy_before']:.2%} -> {report['new_rows_accuracy_after']:.2%})")
+        return report
+
+    def _train_cascade(self, X_train_s, X_test_s, y_test, full_proba, margin=0.8):
+        """
+        Distil the ensemble into a shallow GB and report, on the held-out
+        split, how the confidence-gated cascade compares to the full model.
+        """
+        print("\nDistilling fast-path model...")
+        self.fast_model = GradientBoostingClassifier(
+            n_estimators=60,
+            learning_rate=0.1,
+            max_depth=3,
+            random_state=42,
+        )
+        # Learn the ensemble's decisions, not the raw labels
+        self.fast_model.fit(X_train_s, self._labels(self.model.predict_proba(X_train_s)))
+
+        margin = self.cascade_margin if self.cascade_margin is not None else margin
+        fast_proba = self.fast_model.predict_proba(X_test_s)
+        fallback = fast_proba.max(axis=1) < margin
+        cascade_proba = np.where(fallback[:, None], full_proba, fast_proba)
+
+        full_labels    = self._labels(full_proba)
+        cascade_labels = self._labels(cascade_proba)
+
+        # Per-request latency, scoring the held-out rows one at a time
+        rows = X_test_s[:200]
+        start = time.perf_counter()
+        for i in range(len(rows)):
+            self.model.predict_proba(rows[i:i + 1])
+        full_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(len(rows)):
+            if self.fast_model.predict_proba(rows[i:i + 1]).max() < margin:
+                self.model.predict_proba(rows[i:i + 1])
+        cascade_time = time.perf_counter() - start
+
+        report = {
+            'fast_model':     'GradientBoosting (60 trees, depth 3), distilled',
+            'margin':         float(margin),
+            'agreement_rate': float(np.mean(cascade_labels == full_labels)),
+            'fast_agreement_rate': float(np.mean(self._labels(fast_proba) == full_labels)),
+            'fallback_rate':  float(np.mean(fallback)),
+            'accuracy':       float(accuracy_score(y_test, cascade_labels)),
+            'speedup':        float(full_time / cascade_time) if cascade_time else None,
+        }
+        print(f"Cascade @ {margin:.2f}: agreement {report['agreement_rate']:.2%}, "
+              f"fallback {report['fallback_rate']:.2%}, speed-up {report['speedup']:.1f}x")
+        return report
+
     # ------------------------------------------------------------------ #
     #  Prediction
     # ------------------------------------------------------------------ #
-    def predict(self, data):
-        """Make predictions on new data."""
+    def _load_compiled(self, arrays, tolerance=1e-9):
+        """
+        Rebuild (or build) the flattened ensemble and verify it against the
+        model. Returns None if it disagrees; the outcome is kept in
+        ``self.compiled_check`` either way.
+        """
+        if arrays is not None:
+            compiled = CompiledEnsemble.from_arrays(arrays)
+        else:
+            compiled = CompiledEnsemble.from_voting(self.model, dtype=self.node_dtype)
+        if compiled.dtype == np.float32:
+            tolerance = max(tolerance, FLOAT32_PARITY)
+
+        # Probe rows spread around the scaled feature space
+        probe = np.random.default_rng(0).normal(size=(256, len(self.feature_columns)))
+        error = compiled_ensemble.parity_error(self.model, compiled, probe)
+        self.compiled_check = {'parity_error': error, 'tolerance': tolerance, 'passed': error <= tolerance}
+        return compiled if error <= tolerance else None
+
+    def _compile_features(self, transformer=None):
+        """Compile the feature spec against the fitted encoders and scaler (or use ``transformer``)."""
+        if getattr(transformer, 'version', None) != FeatureTransformer.VERSION:
+            transformer = None      # saved by an older release
+        self.feature_pipeline = transformer or FeatureTransformer(
+            self.feature_columns, self.label_encoders, self.scaler
+        )
+        # Cached results and the explainer belong to the previous model
+        self.model_generation = next(_GENERATIONS)
+        self.explainer = None
+
+    def _observe(self, stage, start):
+        """Report the time since ``start`` for one prediction stage to stage_hook."""
+        if self.stage_hook is not None:
+            self.stage_hook(stage, time.perf_counter() - start)
+
+    def _transform(self, data, unknown_counts=None):
+        """
+        Scaled float32 feature rows of raw applications (dict, list of dicts
+        or DataFrame). Unknown category values are added to ``unknown_counts``.
+        """
+        start = time.perf_counter()
+        X = self.feature_pipeline.transform(data, unknown=self.unknown_category, counts=unknown_counts)
+        self._observe('features', start)
+        return X
+
+    def _report_unknown(self, counts):
+        """Pass per-column unknown category counts to unknown_hook."""
+        if self.unknown_hook is not None:
+            for column, count in counts.items():
+                self.unknown_hook(column, count)
+
+    def _predict_proba(self, X, timings=None):
+        """
+        Score X, through the distilled fast model first when the cascade is
+        enabled. Rows it is not confident about fall back to the ensemble.
+        """
+        if self.fast_model is None or self.cascade_margin is None:
+            return self._ensemble_proba(X, timings)
+
+        start = time.perf_counter()
+        proba = self.fast_model.predict_proba(X)
+        if timings is not None:
+            timings['fast'] = (time.perf_counter() - start) * 1000
+
+        fallback = proba.max(axis=1) < self.cascade_margin
+        if fallback.any():
+            proba[fallback] = self._ensemble_proba(X[fallback], timings)
+        return proba
+
+    def _ensemble_proba(self, X, timings=None):
+        """
+        Score X with the ensemble once.
+
+        If ``timings`` is a dict, each sub-model is scored on its own and its
+        latency in milliseconds is recorded under its name (rf/gb/et/lr); the
+        soft vote is then averaged here exactly as VotingClassifier does.
+        """
+        if self.remote_proba is not None and timings is None:
+            return self.remote_proba(X)
+
+        if self.compiled is not None and len(X) <= COMPILED_MAX_ROWS:
+            return self.compiled.predict_proba(X, timings)
+
+        if timings is None:
+            return self.model.predict_proba(X)
+
+        names = [name for name, _ in self.model.estimators]
+        probas = []
+        for name, estimator in zip(names, self.model.estimators_):
+            start = time.perf_counter()
+            probas.append(estimator.predict_proba(X))
+            timings[name] = (time.perf_counter() - start) * 1000
+        return np.average(probas, axis=0, weights=self.model.weights)
+
+    def _explain_proba(self, X, timings=None):
+        """
+        Ensemble probabilities of X with per-feature contributions, from one
+        walk of the flattened trees (the cascade is not used):
+        (probabilities, base value, contributions). See
+        ``CompiledEnsemble.contributions``.
+        """
+        start = time.perf_counter()
+        explainer = self.explainer
+        if explainer is None:
+            explainer = self.explainer = CompiledEnsemble.from_voting(self.model)
+        result = explainer.contributions(X)
+        self._observe('explain', start)
+        if timings is not None:
+            timings['explain'] = (time.perf_counter() - start) * 1000
+        return result
+
+    def _explanation(self, base, contributions):
+        """One row's attribution: base value and feature contributions, largest first."""
+        order = np.argsort(-np.abs(contributions), kind='stable')
+        return {
+            'base_value':    float(base),
+            # A list, so the order survives JSON encoders that sort keys
+            'contributions': [
+                {'feature': self.feature_columns[j], 'contribution': float(contributions[j])} for j in order
+            ],
+        }
+
+    def _labels(self, probabilities):
+        """Class labels from probabilities, as soft-voting predict() would pick them."""
+        return self.model.classes_[np.argmax(probabilities, axis=1)]
+
+    @staticmethod
+    def _format_result(prediction, probability):
+        return {
+            'prediction':  'Approved' if prediction == 1 else 'Rejected',
+            'probability': float(probability[1]),
+            'confidence':  float(max(probability)),
+        }
+
+    def predict(self, data, timings=None, explain=False):
+        """
+        Make predictions on new data.
+
+        Pass a dict as ``timings`` to get per-sub-model latencies filled in
+        (such calls bypass the cache so the timings are real).
+
+        With ``explain`` the result also has an ``explanation``: how much each
+        feature moved the approval probability away from the model's base
+        value (they add up to ``probability``).
+
+        ``data`` is one application: a dict, or a one-row DataFrame / list.
+        Score several with ``predict_records`` or ``predict_many``.
+        """
+        if self.model is None:
+            raise ValueError("Model not trained yet!")
+        if not isinstance(data, dict) and len(data) != 1:
+            raise ValueError(f"predict scores one application, got {len(data)}; "
+                             "use predict_records or predict_many")
+
+        key = None
+        unknown = {}
+        try:
+            df_s = self._transform(data, unknown)
+        finally:
+            # Also counts the value that made the 'error' policy reject the row
+            self._report_unknown(unknown)
+        if explain:
+            probability, base, contributions = self._explain_proba(df_s, timings)
+            result = self._format_result(self._labels(probability)[0], probability[0])
+            result['explanation'] = self._explanation(base, contributions[0])
+            return result
+
+        if isinstance(data, dict):
+            if self.cache is not None and timings is None:
+                key = self.cache.key(df_s, self.model_generation)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    return cached
+
+        start = time.perf_counter()
+        probability = self._predict_proba(df_s, timings)
+        prediction  = self._labels(probability)
+        self._observe('ensemble', start)
+
+        result = self._format_result(prediction[0], probability[0])
+        if key is not None:
+            self.cache.put(key, result)
+        return result
+
+    def predict_records(self, records):
+        """
+        Score a list of application dicts in one vectorised pass, with the
+        same cache and results as ``predict``. Returns one result per
+        record, or the exception scoring that record raised.
+        """
+        if self.model is None:
+            raise ValueError("Model not trained yet!")
+
+        unknown = {}
+        try:
+            X = self._transform(records, unknown)
+        except Exception:
+            # One bad record breaks the vectorised path; isolate it
+            results = []
+            for record in records:
+                try:
+                    results.append(self.predict(record))
+                except Exception as e:
+                    results.append(e)
+            return results
+        self._report_unknown(unknown)
+
+        results = [None] * len(records)
+        keys = [None] * len(records)
+        if self.cache is not None:
+            for i in range(len(records)):
+                keys[i] = self.cache.key(X[i:i + 1], self.model_generation)
+                results[i] = self.cache.get(keys[i])
+        todo = [i for i, result in enumerate(results) if result is None]
+        if todo:
+            start = time.perf_counter()
+            probabilities = self._predict_proba(X[todo])
+            predictions   = self._labels(probabilities)
+            self._observe('ensemble', start)
+            for i, prediction, probability in zip(todo, predictions, probabilities):
+                results[i] = self._format_result(prediction, probability)
+                if keys[i] is not None:
+                    self.cache.put(keys[i], results[i])
+        return results
+
+    def _score_rows(self, X, rows, probabilities, contributions):
+        """Fill ``rows`` of the _score_frame outputs from feature rows X."""
+        if contributions is None:
+            probabilities[rows] = self._predict_proba(X)
+            return
+        probabilities[rows], base, credit = self._explain_proba(X)
+        contributions[rows, :-1] = credit
+        contributions[rows, -1] = base
+
+    def _score_frame(self, df, explain=False):
+        """
+        Class probabilities for every row of a DataFrame in one vectorised
+        pass: (probabilities, errors, contributions), with NaN rows where
+        scoring failed and the reason in ``errors`` ({row: message}).
+        With ``explain``, contributions holds each row's feature
+        contributions followed by the base value; otherwise it is None.
+        """
         if self.model is None:
             raise ValueError("Model not trained yet!")
 
-        df = pd.DataFrame([data]) if isinstance(data, dict) else data.copy()
+        df = df.drop(columns='Loan_ID', errors='ignore').reset_index(drop=True)
+        probabilities = np.full((len(df), len(self.model.classes_)), np.nan)
+        contributions = np.full((len(df), len(self.feature_columns) + 1), np.nan) if explain else None
+        errors = {}
+        valid = np.ones(len(df), dtype=bool)
 
-        if 'Loan_ID' in df.columns:
-            df = df.drop('Loan_ID', axis=1)
+        # Rows with non-numeric values in numeric fields are reported, not scored
+        for col in NUMERIC_COLUMNS:
+            if col in df.columns:
+                values = pd.to_numeric(df[col], errors='coerce')
+                bad = (values.isna() & df[col].notna()).to_numpy()
+                for i in np.flatnonzero(bad):
+                    errors.setdefault(i, f"Invalid value for {col}: {df[col].iat[i]!r}")
+                valid &= ~bad
+                df[col] = values
 
-        df = self.preprocess_data(df, is_training=False)
+        rows = np.flatnonzero(valid)
+        if len(rows) == 0:
+            return probabilities, errors, contributions
 
-        for col in self.feature_columns:
-            if col not in df.columns:
-                df[col] = 0
+        unknown = {}
+        try:
+            df_s = self._transform(df.iloc[rows], unknown)
+            start = time.perf_counter()
+            self._score_rows(df_s, rows, probabilities, contributions)
+            if not explain:
+                self._observe('ensemble', start)
+        except Exception:
+            # Something in the frame breaks the vectorised path; isolate it row by row
+            for i in rows:
+                unknown = {}
+                try:
+                    self._score_rows(self._transform(df.iloc[[i]], unknown), [i], probabilities, contributions)
+                except Exception as e:
+                    errors[i] = str(e)
+                finally:
+                    self._report_unknown(unknown)
+            return probabilities, errors, contributions
 
-        df = df[self.feature_columns]
-        df_s = self.scaler.transform(df)
+        self._report_unknown(unknown)
+        return probabilities, errors, contributions
 
-        prediction   = self.model.predict(df_s)
-        probability  = self.model.predict_proba(df_s)
+    def predict_many(self, df, explain=False):
+        """
+        Score every row of a DataFrame in a single vectorised pass.
 
+        Returns one dict per input row, in order. Rows that cannot be scored
+        get ``{'error': ...}`` instead of a prediction, so one bad row does
+        not fail the whole batch. With ``explain`` scored rows carry an
+        ``explanation`` as in ``predict``.
+        """
+        probabilities, errors, contributions = self._score_frame(df, explain)
+        # Failed rows are NaN; their label is never used
+        predictions = self._labels(np.nan_to_num(probabilities))
+        results = [
+            {'error': errors[i]} if i in errors else self._format_result(prediction, probability)
+            for i, (prediction, probability) in enumerate(zip(predictions, probabilities))
+        ]
+        if explain:
+            for i, result in enumerate(results):
+                if i not in errors:
+                    result['explanation'] = self._explanation(contributions[i, -1], contributions[i, :-1])
+        return results
+
+    def predict_columns(self, df):
+        """
+        ``predict_many`` as column arrays instead of one dict per row:
+        prediction ('Approved' / 'Rejected' / 'Error'), probability and
+        confidence (NaN where scoring failed) and error (None or message).
+        """
+        probabilities, errors, _ = self._score_frame(df)
+        failed = np.zeros(len(probabilities), dtype=bool)
+        failed[list(errors)] = True
+
+        approved = np.zeros(len(probabilities), dtype=bool)
+        approved[~failed] = self._labels(probabilities[~failed]) == 1
+        prediction = np.where(approved, 'Approved', 'Rejected').astype(object)
+        prediction[failed] = 'Error'
+        error = np.full(len(probabilities), None, dtype=object)
+        for i, message in errors.items():
+            error[i] = message
         return {
-            'prediction':  'Approved' if prediction[0] == 1 else 'Rejected',
-            'probability': float(probability[0][1]),
-            'confidence':  float(max(probability[0])),
+            'prediction':  prediction,
+            'probability': probabilities[:, 1],
+            'confidence':  probabilities.max(axis=1),
+            'error':       error,
         }
 
     # ------------------------------------------------------------------ #
     #  Save / Load
     # ------------------------------------------------------------------ #
     def save_model(self, model_dir='models'):
-        """Save the trained model and preprocessors."""
+        """
+        Save the trained model and preprocessors.
+
+        Everything goes into one versioned bundle (``model_bundle.joblib``),
+        written uncompressed so its NumPy arrays can be memory-mapped on
+        load. The individual .pkl files are still written for older readers.
+
+        A compressed copy (see ``compress``) is saved as a complete model in
+        ``compressed/``, and its size, load time and scoring latency are
+        compared with this one in ``compression_report.json``. Without one
+        (e.g. after ``update``), any copy and report left in ``model_dir``
+        by an earlier save are removed, since they no longer match.
+        """
         os.makedirs(model_dir, exist_ok=True)
+        # Written (or removed) first, so a server watching model_dir never sees a stale copy next to a new model
+        compressed_dir = os.path.join(model_dir, COMPRESSED_DIR)
+        if self.compressed is not None:
+            self.compressed.save_model(compressed_dir)
+        else:
+            if os.path.isdir(compressed_dir):
+                shutil.rmtree(compressed_dir)
+                print(f"Removed {compressed_dir}/: it was compressed from an earlier model")
+            if os.path.exists(os.path.join(model_dir, REPORT_FILE)):
+                os.remove(os.path.join(model_dir, REPORT_FILE))
+        compiled = CompiledEnsemble.from_voting(self.model, dtype=self.node_dtype)
+        bundle = {
+            'format_version':  BUNDLE_VERSION,
+            'model':           self.model,
+            'scaler':          self.scaler,
+            'label_encoders':  self.label_encoders,
+            'feature_columns': self.feature_columns,
+            'model_metrics':   self.model_metrics,
+            'fast_model':      self.fast_model,
+            'compiled':        compiled.to_arrays(),
+            'features':        self.feature_pipeline,
+            'node_dtype':      self.node_dtype.name,
+        }
+        # Write-then-rename so a watching server never reads a half-written bundle
+        bundle_path = os.path.join(model_dir, BUNDLE_FILE)
+        joblib.dump(bundle, bundle_path + '.tmp')
+        os.replace(bundle_path + '.tmp', bundle_path)
+
+        # Legacy layout
         joblib.dump(self.model,           os.path.join(model_dir, 'loan_model.pkl'))
         joblib.dump(self.scaler,          os.path.join(model_dir, 'scaler.pkl'))
         joblib.dump(self.label_encoders,  os.path.join(model_dir, 'label_encoders.pkl'))
         joblib.dump(self.feature_columns, os.path.join(model_dir, 'feature_columns.pkl'))
         joblib.dump(self.model_metrics,   os.path.join(model_dir, 'model_metrics.pkl'))
+        if self.fast_model is not None:
+            joblib.dump(self.fast_model,  os.path.join(model_dir, 'fast_model.pkl'))
+        elif os.path.exists(os.path.join(model_dir, 'fast_model.pkl')):
+            os.remove(os.path.join(model_dir, 'fast_model.pkl'))     # distilled from an earlier model
+        compiled.save(os.path.join(model_dir, 'ensemble_compiled.npz'))
         print(f"\nModel saved to {model_dir}/")
 
-    def load_model(self, model_dir='models'):
-        """Load a trained model and preprocessors."""
-        self.model           = joblib.load(os.path.join(model_dir, 'loan_model.pkl'))
-        self.scaler          = joblib.load(os.path.join(model_dir, 'scaler.pkl'))
-        self.label_encoders  = joblib.load(os.path.join(model_dir, 'label_encoders.pkl'))
-        self.feature_columns = joblib.load(os.path.join(model_dir, 'feature_columns.pkl'))
-        self.model_metrics   = joblib.load(os.path.join(model_dir, 'model_metrics.pkl'))
+        if self.compressed is not None:
+            probe = np.random.default_rng(0).normal(size=(512, len(self.feature_columns)))
+            report = compression_report(self, self.compressed, model_dir, probe)
+            with open(os.path.join(model_dir, REPORT_FILE), 'w') as f:
+                json.dump(report, f, indent=2)
+            self._print_compression(report)
+
+    @staticmethod
+    def _print_compression(report):
+        print(f"\nCompressed model ({COMPRESSED_DIR}/)        full   compressed")
+        print(f"  bundle MB            {report['bundle_mb']['full']:>10.1f} {report['bundle_mb']['compressed']:>12.1f}")
+        print(f"  compiled arrays MB   {report['compiled_mb']['full']:>10.1f} {report['compiled_mb']['compressed']:>12.1f}")
+        print(f"  load s               {report['load_seconds']['full']:>10.2f} {report['load_seconds']['compressed']:>12.2f}")
+        for backend in ('sklearn', 'compiled'):
+            full, small = report['latency']['full'][backend], report['latency']['compressed'][backend]
+            print(f"  {backend + ' 1 row ms':<20} {full['single_ms']:>10.2f} {small['single_ms']:>12.2f}")
+            print(f"  {backend + ' rows/s':<20} {full['rows_per_sec']:>10.0f} {small['rows_per_sec']:>12.0f}")
+
+    @staticmethod
+    def model_exists(model_dir='models'):
+        """True if model_dir holds a bundle or a legacy model."""
+        return (os.path.exists(os.path.join(model_dir, BUNDLE_FILE))
+                or os.path.exists(os.path.join(model_dir, 'loan_model.pkl')))
+
+    @staticmethod
+    def _read_legacy(model_dir):
+        """The five-file layout, shaped like a bundle."""
+        def optional(name, read):
+            path = os.path.join(model_dir, name)
+            return read(path) if os.path.exists(path) else None
+
+        compiled = optional('ensemble_compiled.npz', np.load)
+        if compiled is not None:
+            compiled = {key: compiled[key] for key in compiled.files}
+        return {
+            'model':           joblib.load(os.path.join(model_dir, 'loan_model.pkl')),
+            'scaler':          joblib.load(os.path.join(model_dir, 'scaler.pkl')),
+            'label_encoders':  joblib.load(os.path.join(model_dir, 'label_encoders.pkl')),
+            'feature_columns': joblib.load(os.path.join(model_dir, 'feature_columns.pkl')),
+            'model_metrics':   joblib.load(os.path.join(model_dir, 'model_metrics.pkl')),
+            'fast_model':      optional('fast_model.pkl', joblib.load),
+            'compiled':        compiled,
+        }
+
+    def load_model(self, model_dir='models', backend='sklearn', mmap=True, bundle=True):
+        """
+        Load a trained model and preprocessors.
+
+        The bundle is preferred when present (``bundle=False`` forces the
+        legacy files); with ``mmap`` its large arrays are memory-mapped
+        read-only, so pre-forked workers share them copy-on-write.
+
+        ``backend='compiled'`` scores with the flattened-tree evaluator
+        instead of the sklearn estimators. It is checked for probability
+        parity on load and dropped if it disagrees; ``load_stats`` then
+        shows ``backend`` 'sklearn' against ``backend_requested``.
+
+        Load time and resident memory are recorded in ``self.load_stats``.
+        """
+        if backend not in ('sklearn', 'compiled'):
+            raise ValueError(f"Unknown backend: {backend}")
+        start = time.perf_counter()
+
+        bundle_path = os.path.join(model_dir, BUNDLE_FILE)
+        if bundle and os.path.exists(bundle_path):
+            data = joblib.load(bundle_path, mmap_mode='r' if mmap else None)
+            if data.get('format_version') != BUNDLE_VERSION:
+                raise ValueError(f"Unsupported model bundle version: {data.get('format_version')}")
+            source = 'bundle'
+        else:
+            data = self._read_legacy(model_dir)
+            source = 'legacy'
+
+        self.model           = data['model']
+        self.scaler          = data['scaler']
+        self.label_encoders  = data['label_encoders']
+        self.feature_columns = data['feature_columns']
+        self.model_metrics   = data['model_metrics']
+        self.fast_model      = data['fast_model']
+        self.node_dtype      = np.dtype(data.get('node_dtype', 'float64'))
+        self.compressed      = None
+        self.compiled_check  = None
+        self.compiled        = self._load_compiled(data['compiled']) if backend == 'compiled' else None
+        self._compile_features(data.get('features'))
+
+        self.model_dir  = model_dir
+        self.load_stats = {
+            'format':  source,
+            'mmap':    bool(mmap and source == 'bundle'),
+            'backend': backend if self.compiled is not None else 'sklearn',
+            'backend_requested': backend,
+            'compiled_check': self.compiled_check,
+            'seconds': time.perf_counter() - start,
+            'rss_mb':  current_rss_mb(),
+        }
         print("Model loaded successfully!")
 
 
+def current_rss_mb():
+    """Resident set size of this process in MB (None where it cannot be read)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        return None
+
+
+def load_report(model_dir='models', formats=('legacy', 'bundle', 'bundle_mmap')):
+    """
+    Load the model in fresh interpreters, once per artifact format, and
+    return their load time and resident memory for comparison.
+    """
+    probe = (
+        "import json, sys; from model import LoanPredictor; p = LoanPredictor(); "
+        "p.load_model(sys.argv[1], mmap=sys.argv[2] == '1', bundle=sys.argv[3] == '1'); "
+        "print(json.dumps(p.load_stats))"
+    )
+    here = os.path.dirname(os.path.abspath(__file__))
+    report = {}
+    for name, mmap, bundle in (('legacy', '0', '0'), ('bundle', '0', '1'), ('bundle_mmap', '1', '1')):
+        if name not in formats:
+            continue
+        out = subprocess.run(
+            [sys.executable, '-c', probe, os.path.abspath(model_dir), mmap, bundle],
+            cwd=here, capture_output=True, text=True, check=True,
+        )
+        report[name] = json.loads(out.stdout.strip().splitlines()[-1])
+    return report
+
+
 # ─────────────────────────────────────────────────────────────────────── #
 #  Entry point
 # ─────────────────────────────────────────────────────────────────────── #
 if __name__ == "__main__":
+    import argparse
+    from compression import ACCURACY_TOLERANCE, AUC_TOLERANCE
+    parser = argparse.ArgumentParser(description="Train and save the loan model")
+    parser.add_argument('--workers', type=int, help="processes for fitting (default: $TRAIN_WORKERS or all CPUs)")
+    parser.add_argument('--search', action='store_true', help="successive-halving hyperparameter search first")
+    parser.add_argument('--data', default='train_u6lujuX_CVtuZ9i.csv', help="labelled training CSV")
+    parser.add_argument('--out-of-core', choices=['reservoir', 'memmap'],
+                        help="stream the CSV: train on a sample that fits the budget, or on all rows via a memmap")
+    parser.add_argument('--memory-budget-mb', type=int, default=512)
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--feature-store', metavar='DIR', nargs='?', const='',
+                        help="cache engineered features (default dir: $FEATURE_STORE_DIR or feature_store)")
+    parser.add_argument('--compress', action='store_true',
+                        help="also save a compressed model (fewer / shallower trees, float32) in models/compressed")
+    parser.add_argument('--accuracy-tolerance', type=float, default=ACCURACY_TOLERANCE,
+                        help="held-out accuracy the compressed model may lose")
+    parser.add_argument('--auc-tolerance', type=float, default=AUC_TOLERANCE,
+                        help="held-out ROC-AUC the compressed model may lose")
+    args = parser.parse_args()
+    compress = args.compress and {'accuracy_tolerance': args.accuracy_tolerance, 'auc_tolerance': args.auc_tolerance}
+
     predictor = LoanPredictor()
 
-    train_path = 'train_u6lujuX_CVtuZ9i.csv'
-    metrics = predictor.train(train_path)
+    train_path = args.data
+    if args.out_of_core:
+        metrics = predictor.train_out_of_core(
+            train_path, mode=args.out_of_core, memory_budget_mb=args.memory_budget_mb,
+            chunksize=args.chunksize, workers=args.workers, search=args.search, compress=compress,
+        )
+    else:
+        store = None
+        if args.feature_store is not None:
+            from feature_store import FeatureStore
+            store = FeatureStore(args.feature_store or None)
+        metrics = predictor.train(train_path, workers=args.workers, search=args.search, feature_store=store,
+                                  compress=compress)
 
     predictor.save_model()
 
+    print("\nLoad time / RSS per artifact format:")
+    for name, stats in load_report().items():
+        print(f"  {name:<12} {stats['seconds']:.2f}s  {stats['rss_mb']:.0f} MB")
+
     print("\n" + "=" * 50)
     print(f"Final Accuracy : {metrics['accuracy']*100:.2f}%")
     print(f"ROC-AUC        : {metrics['roc_auc']:.4f}")
@@ -318,3 +1050,8 @@ if __name__ == "__main__":
     print(f"\nSample Prediction : {result['prediction']}")
     print(f"Probability       : {result['probability']:.2%}")
     print(f"Confidence        : {result['confidence']:.2%}")
+
+    # The serving transformer must match preprocess_data + scaler up to float32 rounding
+    max_diff = parity_error(predictor, pd.read_csv(train_path, nrows=5000))
+    print(f"Feature parity    : max rel |diff| = {max_diff:.2e}")
+    assert max_diff < 1e-6, "Feature transformer diverges from preprocess_data"
@@ -0,0 +1,238 @@
+"""
+Out-of-core training data pipeline.
+
+``pd.read_csv`` of the whole history plus ``preprocess_data``'s float64
+feature columns grows memory linearly with the number of labelled rows.
+Here the CSV is streamed in chunks with compact dtypes, twice:
+
+1. one pass collects everything that needs the full data: category
+   counts (-> label encoders), streaming mean/variance of every feature
+   (-> scaler), class counts, and a per-class reservoir of row numbers;
+2. a second pass engineers, scales and stores the training rows as
+   float32, either
+   - ``reservoir``: a stratified uniform sample sized to fit the memory
+     budget, held in memory, or
+   - ``memmap``: every row, shuffled, in a memory-mapped ``.npy`` file, so
+     only the pages being read are resident.
+
+The budget bounds the feature matrix, not everything that grows with the
+row count. In memmap mode the tree members fit the float32 C-contiguous
+matrix without copying it, but they still allocate per-row vectors
+(sample weights, indices, GB predictions; tens of bytes per row), and
+the logistic-regression member, which may copy its input to float64, is
+fitted on a random sample of ``budget_rows`` rows only.
+
+Chunks go through ``LoanPredictor.preprocess_data`` with the finished
+encoders, so features match the in-memory path exactly; only the scaler
+differs in being fitted on all rows rather than the training split.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+# Compact dtypes for the training CSV; missing values stay representable
+TRAIN_DTYPES = {
+    'Gender':            'category',
+    'Married':           'category',
+    'Dependents':        'category',
+    'Education':         'category',
+    'Self_Employed':     'category',
+    'Property_Area':     'category',
+    'Loan_Status':       'category',
+    'ApplicantIncome':   'float32',
+    'CoapplicantIncome': 'float32',
+    'LoanAmount':        'float32',
+    'Loan_Amount_Term':  'float32',
+    'Credit_History':    'float32',
+}
+CATEGORICAL_FEATURES = ['Gender', 'Married', 'Education', 'Self_Employed', 'Property_Area']
+
+# Peak bytes per sampled feature value while training: the stored float32
+# matrix, the train/test split, per-fold copies and sklearn's own buffers.
+BYTES_PER_VALUE = 4 * 8
+
+
+def read_chunks(path, chunksize):
+    return pd.read_csv(path, usecols=list(TRAIN_DTYPES), dtype=TRAIN_DTYPES, chunksize=chunksize)
+
+
+def _engineer(predictor, chunk):
+    """
+    preprocess_data on one chunk (categoricals encoded only if encoders
+    exist). Only the chunk is widened: features are engineered in float64,
+    exactly as at serving time.
+    """
+    df = chunk.astype({col: object if chunk[col].dtype == 'category' else np.float64 for col in chunk.columns})
+    return predictor.preprocess_data(df, is_training=False)
+
+
+class StreamingStats:
+    """Everything the first pass learns about the training file."""
+
+    def __init__(self, predictor, memory_budget_mb, seed=42):
+        self.predictor = predictor
+        self.memory_budget_mb = memory_budget_mb
+        self.reservoir_size = None
+        self.rng = np.random.default_rng(seed)
+        self.rows = 0
+        self.feature_columns = None
+        self.numeric = StandardScaler()
+        self.category_counts = {col: {} for col in CATEGORICAL_FEATURES}
+        self.class_rows = {0: 0, 1: 0}
+        self.reservoirs = {0: np.empty(0, dtype=np.int64), 1: np.empty(0, dtype=np.int64)}
+
+    def update(self, chunk):
+        df = _engineer(self.predictor, chunk)
+        if self.feature_columns is None:
+            self.feature_columns = df.columns.drop('Loan_Status').tolist()
+            # Each class may turn out to be (almost) all of the sample
+            self.reservoir_size = budget_rows(self.memory_budget_mb, len(self.feature_columns))
+
+        for col in CATEGORICAL_FEATURES:
+            counts = self.category_counts[col]
+            for value, n in df[col].astype(str).value_counts().items():
+                counts[value] = counts.get(value, 0) + int(n)
+        self.numeric.partial_fit(df[self._numeric_columns])
+
+        y = df['Loan_Status'].map({'Y': 1, 'N': 0}).to_numpy()
+        row_ids = np.arange(self.rows, self.rows + len(df))
+        for label in (0, 1):
+            self._sample(label, row_ids[y == label])
+        self.rows += len(df)
+
+    @property
+    def _numeric_columns(self):
+        return [c for c in self.feature_columns if c not in CATEGORICAL_FEATURES]
+
+    def _sample(self, label, row_ids):
+        """Algorithm R over this class's rows, one chunk at a time."""
+        seen = self.class_rows[label]
+        reservoir = self.reservoirs[label]
+        room = self.reservoir_size - len(reservoir)
+        if room > 0:
+            reservoir = np.concatenate([reservoir, row_ids[:room]])
+            seen += min(room, len(row_ids))
+            row_ids = row_ids[room:]
+        if len(row_ids):
+            # Row number seen+k replaces slot j ~ U[0, seen+k] if j < size;
+            # later rows overwrite earlier ones, as in the sequential algorithm.
+            slots = self.rng.integers(0, seen + np.arange(1, len(row_ids) + 1))
+            keep = slots < self.reservoir_size
+            reservoir[slots[keep]] = row_ids[keep]
+            seen += len(row_ids)
+        self.class_rows[label] = seen
+        self.reservoirs[label] = reservoir
+
+    def finish(self):
+        """Fitted (label_encoders, scaler) equal to fitting on all rows at once."""
+        encoders, means, variances = {}, {}, {}
+        for col in CATEGORICAL_FEATURES:
+            encoder = LabelEncoder().fit(sorted(self.category_counts[col]))
+            codes = np.arange(len(encoder.classes_))
+            counts = np.array([self.category_counts[col][v] for v in encoder.classes_], dtype=float)
+            means[col] = counts @ codes / counts.sum()
+            variances[col] = counts @ (codes - means[col]) ** 2 / counts.sum()
+            encoders[col] = encoder
+
+        numeric = self._numeric_columns
+        for i, col in enumerate(numeric):
+            means[col] = self.numeric.mean_[i]
+            variances[col] = self.numeric.var_[i]
+
+        scaler = StandardScaler()
+        scaler.mean_ = np.array([means[c] for c in self.feature_columns])
+        scaler.var_ = np.array([variances[c] for c in self.feature_columns])
+        scaler.scale_ = np.where(scaler.var_ > 0, np.sqrt(scaler.var_), 1.0)
+        scaler.n_samples_seen_ = self.rows
+        scaler.n_features_in_ = len(self.feature_columns)
+        scaler.feature_names_in_ = np.array(self.feature_columns, dtype=object)
+        return encoders, scaler
+
+    def sample(self, size):
+        """Sorted row numbers of a stratified sample of ``size`` rows."""
+        size = min(size, self.rows)
+        picked = []
+        for label in (0, 1):
+            take = round(size * self.class_rows[label] / self.rows)
+            reservoir = self.reservoirs[label]
+            picked.append(self.rng.choice(reservoir, min(take, len(reservoir)), replace=False))
+        return np.sort(np.concatenate(picked))
+
+
+def budget_rows(memory_budget_mb, n_features):
+    return max(1, int(memory_budget_mb * 1024 * 1024 // (n_features * BYTES_PER_VALUE)))
+
+
+def build_training_matrix(predictor, path, mode='reservoir', memory_budget_mb=512,
+                          chunksize=100_000, memmap_dir=None, seed=42):
+    """
+    Stream ``path`` and return (X, y, info): scaled float32 features and
+    int8 labels. Fits ``predictor``'s label encoders, scaler and
+    feature_columns on the way. ``memmap`` mode writes X.npy / y.npy into
+    ``memmap_dir``, which the caller owns.
+    """
+    if mode not in ('reservoir', 'memmap'):
+        raise ValueError(f"Unknown out-of-core mode: {mode}")
+    if mode == 'memmap' and memmap_dir is None:
+        raise ValueError("memmap mode needs a memmap_dir")
+
+    predictor.label_encoders = {}
+    stats = StreamingStats(predictor, memory_budget_mb, seed=seed)
+    for chunk in read_chunks(path, chunksize):
+        stats.update(chunk)
+    if not stats.rows:
+        raise ValueError(f"No rows in {path}")
+
+    predictor.label_encoders, predictor.scaler = stats.finish()
+    predictor.feature_columns = stats.feature_columns
+    n_features = len(stats.feature_columns)
+
+    if mode == 'reservoir':
+        wanted = stats.sample(budget_rows(memory_budget_mb, n_features))
+        n = len(wanted)
+        X = np.empty((n, n_features), dtype=np.float32)
+        y = np.empty(n, dtype=np.int8)
+        positions = None
+    else:
+        n = stats.rows
+        X = np.lib.format.open_memmap(os.path.join(memmap_dir, 'X.npy'), mode='w+',
+                                      dtype=np.float32, shape=(n, n_features))
+        y = np.lib.format.open_memmap(os.path.join(memmap_dir, 'y.npy'), mode='w+', dtype=np.int8, shape=(n,))
+        # Rows land at random positions, so any contiguous slice is a random sample
+        positions = np.random.default_rng(seed).permutation(n)
+
+    offset, filled = 0, 0
+    for chunk in read_chunks(path, chunksize):
+        row_ids = np.arange(offset, offset + len(chunk))
+        offset += len(chunk)
+        if positions is None:
+            selected = np.isin(row_ids, wanted, assume_unique=True)
+            if not selected.any():
+                continue
+            chunk = chunk[selected]
+            target = np.arange(filled, filled + len(chunk))
+            filled += len(chunk)
+        else:
+            target = positions[row_ids]
+
+        df = _engineer(predictor, chunk)
+        X[target] = predictor.scaler.transform(df[predictor.feature_columns]).astype(np.float32)
+        y[target] = df['Loan_Status'].map({'Y': 1, 'N': 0}).to_numpy(dtype=np.int8)
+
+    if positions is not None:
+        X.flush()
+        y.flush()
+
+    info = {
+        'mode':             mode,
+        'rows_total':       int(stats.rows),
+        'rows_used':        int(n),
+        'class_rows':       {str(k): int(v) for k, v in stats.class_rows.items()},
+        'memory_budget_mb': memory_budget_mb,
+        'chunksize':        chunksize,
+        'matrix_mb':        X.nbytes / (1024 * 1024),
+    }
+    return X, y, info
@@ -0,0 +1,74 @@
+"""
+In-process LRU/TTL cache for single predictions.
+
+Keys are hashes of the *normalised* feature row (defaults filled, '3+'
+parsed, categories encoded and scaled), so applications that differ only
+in spelling of the same inputs share one entry. They also carry the
+generation of the model that scored the row, so one cache can be shared
+by the predictors a hot swap replaces: a result the old model stores
+after the swap is never served by the new one.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize=10000, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (expires_at, result)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def key(row, generation=0):
+        """Canonical key for a normalised feature row (NumPy array) scored by model ``generation``."""
+        return generation, hashlib.blake2b(row.tobytes(), digest_size=16).digest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, key, result):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size':        len(self._entries),
+                'maxsize':     self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits':        self.hits,
+                'misses':      self.misses,
+                'evictions':   self.evictions,
+                'expirations': self.expirations,
+                'hit_rate':    self.hits / lookups if lookups else 0.0,
+            }
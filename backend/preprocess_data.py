@@ -8,6 +8,20 @@ import numpy as np
 import os
 from datetime import datetime
 
+from feature_pipeline import fill_values
+
+# How each input column of the feature spec is imputed here; others get
+# the model's default for a missing value
+IMPUTATION = {
+    'Gender':           'mode',
+    'Married':          'mode',
+    'Dependents':       'mode',
+    'Self_Employed':    'mode',
+    'LoanAmount':       'median',
+    'Loan_Amount_Term': 'mode',     # 360 is most common
+    'Credit_History':   1.0,        # safer assumption for loan approval
+}
+
 def analyze_data(df):
     """Analyze the dataset for missing values and basic statistics"""
     print("="*60)
@@ -52,10 +66,11 @@ def preprocess_data(df, verbose=True):
     """
     Preprocess the loan dataset by handling missing values
     
-    Strategy:
+    Strategy (IMPUTATION; see fill_values in feature_pipeline.py):
     - Categorical variables: Fill with mode (most frequent value)
-    - Numerical variables: Fill with median
+    - Numerical variables: Fill with median / mode
     - Credit_History: Fill with 1.0 (most common and safer assumption)
+    - Other input columns: the model's default for a missing value
     """
     df = df.copy()
     
@@ -67,53 +82,14 @@ def preprocess_data(df, verbose=True):
     # Store original missing counts
     original_missing = df.isnull().sum()
     
-    # 1. Handle Gender - Fill with mode
-    if df['Gender'].isnull().sum() > 0:
-        mode_gender = df['Gender'].mode()[0]
-        df['Gender'] = df['Gender'].fillna(mode_gender)
-        if verbose:
-            print(f"\n✓ Gender: Filled {original_missing['Gender']} missing values with '{mode_gender}'")
-    
-    # 2. Handle Married - Fill with mode
-    if df['Married'].isnull().sum() > 0:
-        mode_married = df['Married'].mode()[0]
-        df['Married'] = df['Married'].fillna(mode_married)
-        if verbose:
-            print(f"✓ Married: Filled {original_missing['Married']} missing values with '{mode_married}'")
-    
-    # 3. Handle Dependents - Fill with mode
-    if df['Dependents'].isnull().sum() > 0:
-        mode_dependents = df['Dependents'].mode()[0]
-        df['Dependents'] = df['Dependents'].fillna(mode_dependents)
-        if verbose:
-            print(f"✓ Dependents: Filled {original_missing['Dependents']} missing values with '{mode_dependents}'")
-    
-    # 4. Handle Self_Employed - Fill with mode
-    if df['Self_Employed'].isnull().sum() > 0:
-        mode_self_employed = df['Self_Employed'].mode()[0]
-        df['Self_Employed'] = df['Self_Employed'].fillna(mode_self_employed)
-        if verbose:
-            print(f"✓ Self_Employed: Filled {original_missing['Self_Employed']} missing values with '{mode_self_employed}'")
-    
-    # 5. Handle LoanAmount - Fill with median
-    if df['LoanAmount'].isnull().sum() > 0:
-        median_loan = df['LoanAmount'].median()
-        df['LoanAmount'] = df['LoanAmount'].fillna(median_loan)
-        if verbose:
-            print(f"✓ LoanAmount: Filled {original_missing['LoanAmount']} missing values with median {median_loan}")
-    
-    # 6. Handle Loan_Amount_Term - Fill with mode (360 is most common)
-    if df['Loan_Amount_Term'].isnull().sum() > 0:
-        mode_term = df['Loan_Amount_Term'].mode()[0]
-        df['Loan_Amount_Term'] = df['Loan_Amount_Term'].fillna(mode_term)
-        if verbose:
-            print(f"✓ Loan_Amount_Term: Filled {original_missing['Loan_Amount_Term']} missing values with mode {mode_term}")
-    
-    # 7. Handle Credit_History - Fill with 1.0 (safer assumption for loan approval)
-    if df['Credit_History'].isnull().sum() > 0:
-        df['Credit_History'] = df['Credit_History'].fillna(1.0)
-        if verbose:
-            print(f"✓ Credit_History: Filled {original_missing['Credit_History']} missing values with 1.0")
+    for col, value in fill_values(df, IMPUTATION).items():
+        if col in df.columns and original_missing[col] > 0:
+            df[col] = df[col].fillna(value)
+            if verbose:
+                strategy = IMPUTATION.get(col, 'default')
+                shown = f"'{value}'" if isinstance(value, str) else value
+                how = f"{strategy} {shown}" if isinstance(strategy, str) else shown
+                print(f"✓ {col}: Filled {original_missing[col]} missing values with {how}")
     
     # Verify no missing values remain
     remaining_missing = df.isnull().sum().sum()
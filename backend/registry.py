@@ -0,0 +1,248 @@
+"""
+Model registry for the API.
+
+Owns the live ``LoanPredictor`` and its lifecycle state so routes can tell
+"still loading" apart from "never trained" or "failed to load":
+
+    idle -> loading -> ready
+                    -> failed -> loading   (retried after retry_seconds)
+    idle -> not_trained          (no artifact in model_dir)
+
+The model is either loaded eagerly at import (under ``gunicorn --preload``
+that happens once in the master, and workers fork with it in memory) or
+lazily on a background thread in each process.
+
+A trained model can later be swapped in without a restart: ``reload``
+loads it next to the live one, smoke-tests it, and only then replaces the
+``predictor`` reference. Requests already running keep the predictor they
+started with. ``rollback`` restores the previous one.
+"""
+
+import os
+import threading
+import time
+
+from model import LoanPredictor, BUNDLE_FILE
+
+IDLE = 'idle'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+NOT_TRAINED = 'not_trained'
+
+# Known-good application every candidate model must score before going live
+SMOKE_APPLICATION = {
+    'Gender': 'Male', 'Married': 'Yes', 'Dependents': '0',
+    'Education': 'Graduate', 'Self_Employed': 'No',
+    'ApplicantIncome': 5000, 'CoapplicantIncome': 2000,
+    'LoanAmount': 150, 'Loan_Amount_Term': 360,
+    'Credit_History': 1.0, 'Property_Area': 'Urban',
+}
+
+
+def smoke_test(predictor):
+    """Raise if ``predictor`` cannot produce a sane prediction."""
+    result = predictor.predict(dict(SMOKE_APPLICATION))
+    if result['prediction'] not in ('Approved', 'Rejected') or not 0.0 <= result['probability'] <= 1.0:
+        raise ValueError(f"Smoke prediction looks wrong: {result}")
+
+
+def artifact_fingerprint(model_dir):
+    """(file name, mtime, size) of the model artifact in model_dir, or None."""
+    for name in (BUNDLE_FILE, 'loan_model.pkl'):
+        path = os.path.join(model_dir, name)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            return (name, stat.st_mtime_ns, stat.st_size)
+    return None
+
+
+class ModelRegistry:
+    def __init__(self, factory=LoanPredictor, model_dir='models', backend='sklearn', prepare=None,
+                 retry_seconds=30.0):
+        """
+        ``factory()`` returns an empty, configured LoanPredictor to load into;
+        ``prepare(predictor)``, if given, runs on every loaded model before
+        it goes live (e.g. ``ScorerPool.bind``). A failed load may be
+        started again once ``retry_seconds`` have passed.
+        """
+        self._factory = factory
+        self._prepare = prepare
+        self.model_dir = model_dir
+        self.backend = backend
+        self.predictor = None
+        self.state = IDLE
+        self.error = None
+        self.load_seconds = None
+        self.retry_seconds = retry_seconds
+        self.failed_at = None       # time.monotonic() of the last failed load
+        self.version = 0
+        self.previous = None        # predictor replaced by the last swap
+        self.last_reload = None     # outcome of the last reload / rollback
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._watch_pid = None
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    def retry_in(self):
+        """Seconds until a failed load may be retried (0 if it may now), or None unless failed."""
+        if self.state != FAILED:
+            return None
+        return max(0.0, self.failed_at + self.retry_seconds - time.monotonic())
+
+    def _claim(self):
+        """
+        Move idle -> loading, or failed -> loading once the retry delay has
+        passed; False if someone else is already on it or it is too soon.
+        """
+        with self._lock:
+            if self.state == FAILED and self.retry_in() > 0:
+                return False
+            if self.state not in (IDLE, FAILED):
+                return False
+            self.state = LOADING
+            return True
+
+    def _load(self):
+        if not LoanPredictor.model_exists(self.model_dir):
+            self.state = NOT_TRAINED
+            print("No trained model found. Please train the model first.")
+            return
+
+        start = time.perf_counter()
+        try:
+            predictor = self._factory()
+            predictor.load_model(self.model_dir, backend=self.backend)
+            if self._prepare is not None:
+                self._prepare(predictor)
+        except Exception as e:
+            self.error = str(e)
+            self.failed_at = time.monotonic()
+            self.state = FAILED
+            print(f"Model failed to load: {e} (retrying in {self.retry_seconds:g}s)")
+            return
+
+        self.predictor = predictor
+        self.load_seconds = time.perf_counter() - start
+        self.error = None
+        self.version = 1
+        self.state = READY
+
+    def load(self):
+        """Load in the calling thread; returns True once the model is ready."""
+        if self._claim():
+            self._load()
+        return self.ready
+
+    def load_in_background(self):
+        """Start loading on a daemon thread (no-op if already started, or failed too recently)."""
+        if self._claim():
+            threading.Thread(target=self._load, name='model-loader', daemon=True).start()
+
+    # ------------------------------------------------------------------ #
+    #  Hot reload
+    # ------------------------------------------------------------------ #
+    def reload(self, model_dir=None):
+        """
+        Load ``model_dir`` (default: the current one) beside the live model,
+        smoke-test it and swap it in. The live model is left untouched if
+        either step fails. Returns the outcome, also kept in ``last_reload``.
+        """
+        model_dir = model_dir or self.model_dir
+        if not self._reload_lock.acquire(blocking=False):
+            return {'status': 'busy', 'error': 'A reload is already in progress'}
+
+        start = time.perf_counter()
+        try:
+            candidate = self._factory()
+            candidate.load_model(model_dir, backend=self.backend)
+            if self._prepare is not None:
+                self._prepare(candidate)
+            smoke_test(candidate)
+        except Exception as e:
+            self.last_reload = {
+                'status': 'failed', 'model_dir': model_dir, 'error': str(e),
+                'at': time.time(), 'version': self.version,
+            }
+            print(f"Model reload from {model_dir} rejected: {e}")
+            return self.last_reload
+        else:
+            self._swap(candidate, model_dir)
+            self.last_reload = {
+                'status': 'swapped', 'model_dir': model_dir, 'error': None,
+                'at': time.time(), 'version': self.version,
+                'seconds': time.perf_counter() - start,
+            }
+            return self.last_reload
+        finally:
+            self._reload_lock.release()
+
+    def reload_in_background(self, model_dir=None):
+        threading.Thread(target=self.reload, args=(model_dir,), name='model-reload', daemon=True).start()
+
+    def rollback(self):
+        """Swap the previously live predictor back in."""
+        with self._reload_lock:
+            if self.previous is None:
+                return {'status': 'failed', 'error': 'No previous model to roll back to'}
+            self._swap(self.previous, self.previous.model_dir)
+            self.last_reload = {
+                'status': 'rolled_back', 'model_dir': self.model_dir, 'error': None,
+                'at': time.time(), 'version': self.version,
+            }
+            return self.last_reload
+
+    def _swap(self, predictor, model_dir):
+        with self._lock:
+            self.previous, self.predictor = self.predictor, predictor
+            self.model_dir = model_dir
+            self.version += 1
+            self.error = None
+            self.state = READY
+        # Entries of the old model can no longer be hit (keys carry the model
+        # generation); drop them rather than wait for LRU / TTL
+        if predictor.cache is not None:
+            predictor.cache.clear()
+
+    def watch(self, interval):
+        """
+        Poll the artifact in ``model_dir`` every ``interval`` seconds and
+        reload when it changes (and has stopped changing). Starts at most
+        one watcher per process, so it is safe to call after a fork.
+        """
+        if self._watch_pid == os.getpid():
+            return
+        self._watch_pid = os.getpid()
+
+        def poll():
+            seen = artifact_fingerprint(self.model_dir)
+            last = seen
+            while True:
+                time.sleep(interval)
+                current = artifact_fingerprint(self.model_dir)
+                # Reload once the file is new and unchanged since the last poll
+                if current is not None and current != seen and current == last:
+                    self.reload()
+                    seen = current
+                last = current
+
+        threading.Thread(target=poll, name='model-watcher', daemon=True).start()
+
+    def status(self):
+        status = {
+            'state':        self.state,
+            'ready':        self.ready,
+            'load_seconds': self.load_seconds,
+            'retry_in_seconds': self.retry_in(),
+            'backend':      self.backend,
+            'error':        self.error,
+            'version':      self.version,
+            'model_dir':    self.model_dir,
+            'last_reload':  self.last_reload,
+        }
+        if self.predictor is not None:
+            status['load_stats'] = self.predictor.load_stats
+        return status
@@ -0,0 +1,401 @@
+"""
+Multi-process scoring with one shared copy of the model.
+
+sklearn's forests hold the GIL while they predict, so extra threads in a
+worker add no throughput, and every gunicorn worker deserialises its own
+copy of the trees. With a ``ScorerPool`` the web process keeps parsing
+requests, computing features and formatting results, and hands the
+ensemble itself to ``processes`` scorer processes:
+
+- the flattened ensemble (``compiled_ensemble``) is copied once into a
+  POSIX shared-memory segment (``SharedEnsemble``) that every scorer maps
+  read-only, so the node arrays exist once however many scorers run;
+- requests put their feature rows on a local queue. A dispatcher thread
+  waits for a free scorer and gives it everything queued by then (up to
+  ``max_batch`` rows, waiting at most ``max_wait_ms`` for more) as one
+  batch, so near-simultaneous single predictions are scored together and
+  batches grow with load;
+- each scorer is a plain ``python scorer_pool.py --fd N`` subprocess on a
+  socket pair: it imports NumPy and the evaluator, never the Flask app.
+
+Scorers start on first use in each process, so a pool configured before
+``gunicorn --preload`` forks gives every worker its own scorers, all
+mapping the segment the master created. A scorer that dies is restarted;
+the batch it was scoring fails.
+"""
+
+import atexit
+import json
+import os
+import queue
+import socket
+import subprocess
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from compiled_ensemble import CompiledEnsemble
+
+# Array offsets inside a segment are aligned to this many bytes
+_ALIGN = 64
+
+# Models a scorer keeps mapped (the live one and the one before a swap)
+_KEEP_MODELS = 2
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def _attach_segment(name):
+    try:
+        return SharedMemory(name=name, track=False)     # Python 3.13+
+    except TypeError:
+        shm = SharedMemory(name=name)
+        # Older versions would remove the segment when this process exits
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def _release(shm, owner_pid):
+    try:
+        shm.close()
+    except BufferError:
+        pass    # views still exported; the mapping goes with the process
+    # Only the creating process removes the segment, not workers forked from it
+    if os.getpid() == owner_pid:
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedEnsemble:
+    """
+    A ``CompiledEnsemble``'s arrays in one shared-memory segment.
+
+    The segment starts with an 8-byte header length and a JSON layout of
+    ``(key, dtype, shape, offset)`` entries, so a name is all a scorer
+    needs to map it.
+    """
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.name = shm.name
+        self.nbytes = shm.size
+        self.arrays = None
+        if owner:
+            self._finalizer = weakref.finalize(self, _release, shm, os.getpid())
+
+    @classmethod
+    def create(cls, compiled):
+        arrays = {key: np.asarray(value, order='C') for key, value in compiled.to_arrays().items()}
+        layout, size = [], 0
+        for key, value in arrays.items():
+            size = _aligned(size)
+            layout.append((key, value.dtype.str, value.shape, size))
+            size += value.nbytes
+        header = json.dumps(layout).encode()
+        start = _aligned(8 + len(header))
+
+        shm = SharedMemory(create=True, size=start + size)
+        shm.buf[:8] = len(header).to_bytes(8, 'little')
+        shm.buf[8:8 + len(header)] = header
+        for key, dtype, shape, offset in layout:
+            view = np.ndarray(shape, dtype, buffer=shm.buf, offset=start + offset)
+            view[...] = arrays[key]
+            del view
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """Map an existing segment read-only; ``arrays`` holds the views."""
+        shared = cls(_attach_segment(name), owner=False)
+        length = int.from_bytes(shared.shm.buf[:8], 'little')
+        layout = json.loads(bytes(shared.shm.buf[8:8 + length]))
+        start = _aligned(8 + length)
+        shared.arrays = {}
+        for key, dtype, shape, offset in layout:
+            view = np.ndarray(tuple(shape), dtype, buffer=shared.shm.buf, offset=start + offset)
+            view.flags.writeable = False
+            shared.arrays[key] = view
+        return shared
+
+    def close(self):
+        self.arrays = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass
+
+
+# ─────────────────────────────────────────────────────────────────────── #
+#  Scorer process
+# ─────────────────────────────────────────────────────────────────────── #
+def serve(fd):
+    """Scorer loop: receive (segment name, rows), answer probabilities."""
+    conn = Connection(fd)
+    models = OrderedDict()      # segment name -> (SharedEnsemble, CompiledEnsemble)
+    conn.send(('ready', os.getpid()))
+    while True:
+        try:
+            name, X = conn.recv()
+        except EOFError:
+            return
+        try:
+            if name not in models:
+                shared = SharedEnsemble.attach(name)
+                models[name] = (shared, CompiledEnsemble.from_arrays(shared.arrays))
+                while len(models) > _KEEP_MODELS:
+                    old, _ = models.popitem(last=False)[1]
+                    old.close()
+            models.move_to_end(name)
+            reply = ('ok', models[name][1].predict_proba(X))
+        except Exception as e:
+            reply = ('error', f'{type(e).__name__}: {e}')
+        conn.send(reply)
+
+
+# ─────────────────────────────────────────────────────────────────────── #
+#  Front end
+# ─────────────────────────────────────────────────────────────────────── #
+class ScorerDied(RuntimeError):
+    """The scorer process handling a batch exited before answering."""
+
+
+class _Request:
+    __slots__ = ('name', 'X', 'future')
+
+    def __init__(self, name, X):
+        self.name = name
+        self.X = X
+        self.future = Future()
+
+
+def _fail(requests, error):
+    for request in requests:
+        try:
+            request.future.set_exception(error)
+        except InvalidStateError:
+            pass
+
+
+class _Scorer:
+    def __init__(self, slot, process, conn):
+        self.slot = slot
+        self.process = process
+        self.conn = conn
+        self.pid = process.pid
+        self.alive = True
+        self.batch = None       # requests being scored
+
+
+class ScorerPool:
+    def __init__(self, processes=2, max_batch=64, max_wait_ms=1.0, timeout=30.0):
+        """
+        ``processes`` scorers; batches of at most ``max_batch`` rows (larger
+        requests are split across scorers instead), gathered for at most
+        ``max_wait_ms`` once a scorer is free. Requests not answered within
+        ``timeout`` seconds raise ``TimeoutError``.
+        """
+        self.processes = max(1, int(processes))
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        self._pending = queue.Queue()
+        self._idle = queue.Queue()
+        self._scorers = {}
+        self._carry = None
+        self._closing = False
+        self.batches = 0
+        self.rows = 0
+        self.restarts = 0
+
+    # ------------------------------------------------------------------ #
+    #  Binding models
+    # ------------------------------------------------------------------ #
+    def bind(self, predictor):
+        """
+        Score ``predictor``'s ensemble in this pool from now on. The
+        shared segment lives as long as the predictor does.
+        """
+        compiled = predictor.compiled or predictor._load_compiled(None)
+        if compiled is None:
+            raise ValueError("The ensemble cannot be compiled, so it cannot be served by the scorer pool")
+        shared = SharedEnsemble.create(compiled)
+        predictor.remote_proba = lambda X: self.predict_proba(shared, X)
+        predictor.load_stats['scorer_pool'] = {'segment': shared.name, 'shared_mb': shared.nbytes / (1024 * 1024)}
+
+    def predict_proba(self, shared, X):
+        """Class probabilities of feature rows ``X`` under the ensemble in ``shared``."""
+        self._start()
+        X = np.ascontiguousarray(X)
+        if len(X) > self.max_batch:
+            parts = np.array_split(X, min(self.processes, -(-len(X) // self.max_batch)))
+        else:
+            parts = [X]
+        requests = [_Request(shared.name, part) for part in parts]
+        for request in requests:
+            self._pending.put(request)
+        deadline = time.monotonic() + self.timeout
+        return np.concatenate([r.future.result(timeout=max(0.0, deadline - time.monotonic())) for r in requests])
+
+    # ------------------------------------------------------------------ #
+    #  Processes
+    # ------------------------------------------------------------------ #
+    def _start(self):
+        """Start the scorers and dispatcher once per process (again after a fork)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._reset()
+            for slot in range(self.processes):
+                self._spawn(slot)
+            threading.Thread(target=self._dispatch, name='scorer-dispatch', daemon=True).start()
+            self._pid = os.getpid()
+            atexit.register(self.close)
+
+    def _spawn(self, slot):
+        ours, theirs = socket.socketpair()
+        env = dict(os.environ, OMP_NUM_THREADS='1', OPENBLAS_NUM_THREADS='1', MKL_NUM_THREADS='1')
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--fd', str(theirs.fileno())],
+            pass_fds=(theirs.fileno(),), cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        )
+        theirs.close()
+        scorer = _Scorer(slot, process, Connection(ours.detach()))
+        self._scorers[slot] = scorer
+        threading.Thread(target=self._read, args=(scorer,), name=f'scorer-{slot}', daemon=True).start()
+
+    def _read(self, scorer):
+        """Collect one scorer's answers; restart it if it goes away."""
+        try:
+            scorer.conn.recv()      # ready
+            self._idle.put(scorer)
+            while True:
+                status, payload = scorer.conn.recv()
+                batch, scorer.batch = scorer.batch, None
+                if status == 'ok':
+                    sizes = np.cumsum([len(r.X) for r in batch])[:-1]
+                    for request, proba in zip(batch, np.split(payload, sizes)):
+                        request.future.set_result(proba)
+                else:
+                    _fail(batch, RuntimeError(f"Scorer failed: {payload}"))
+                self._idle.put(scorer)
+        except (EOFError, OSError):
+            scorer.alive = False
+            if scorer.batch:
+                _fail(scorer.batch, ScorerDied(f"Scorer process {scorer.pid} exited"))
+            scorer.conn.close()
+            scorer.process.wait()
+            if not self._closing:
+                self.restarts += 1
+                self._spawn(scorer.slot)
+
+    def _next_request(self, timeout=None):
+        if self._carry is not None:
+            request, self._carry = self._carry, None
+            return request
+        return self._pending.get(timeout=timeout)
+
+    def _dispatch(self):
+        while True:
+            first = self._next_request()
+            if first is None:
+                return
+            # Requests keep queueing while every scorer is busy
+            scorer = self._idle.get()
+            while not scorer.alive:
+                scorer = self._idle.get()
+
+            batch, rows = [first], len(first.X)
+            deadline = time.perf_counter() + self.max_wait
+            while rows < self.max_batch:
+                try:
+                    request = self._next_request(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if request is None or request.name != first.name or rows + len(request.X) > self.max_batch:
+                    self._carry = request
+                    break
+                batch.append(request)
+                rows += len(request.X)
+
+            X = batch[0].X if len(batch) == 1 else np.concatenate([r.X for r in batch])
+            scorer.batch = batch
+            try:
+                scorer.conn.send((first.name, X))
+            except OSError:
+                scorer.batch = None
+                _fail(batch, ScorerDied(f"Scorer process {scorer.pid} exited"))
+                continue
+            self.batches += 1
+            self.rows += rows
+
+    def close(self):
+        """Stop the dispatcher and every scorer of this process."""
+        if self._pid != os.getpid():
+            return
+        self._closing = True
+        self._pending.put(None)
+        for scorer in list(self._scorers.values()):
+            scorer.conn.close()
+            try:
+                scorer.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                scorer.process.kill()
+        self._pid = None
+
+    def status(self):
+        scorers = [
+            {'pid': s.pid, 'alive': s.process.poll() is None, 'rss_mb': _proc_mb(s.pid, 'status', 'VmRSS'),
+             'pss_mb': _proc_mb(s.pid, 'smaps_rollup', 'Pss')}
+            for s in self._scorers.values()
+        ] if self._pid == os.getpid() else []
+        return {
+            'processes':  self.processes,
+            'alive':      sum(s['alive'] for s in scorers),
+            'max_batch':  self.max_batch,
+            'max_wait_ms': self.max_wait * 1000,
+            'queued':     self._pending.qsize(),
+            'batches':    self.batches,
+            'rows':       self.rows,
+            'mean_batch': self.rows / self.batches if self.batches else None,
+            'restarts':   self.restarts,
+            'scorers':    scorers,
+        }
+
+
+def _proc_mb(pid, name, field):
+    """A kB figure from /proc/<pid>/<name> in MB (None where unavailable)."""
+    try:
+        with open(f'/proc/{pid}/{name}') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Scorer process (started by ScorerPool)")
+    parser.add_argument('--fd', type=int, required=True, help="inherited socket to the front end")
+    serve(parser.parse_args().fd)
@@ -0,0 +1,56 @@
+import asyncio
+import tempfile
+
+import pytest
+
+import asgi
+
+
+def multipart(filename, content):
+    return (b'--x\r\nContent-Disposition: form-data; name="file"; filename="' + filename.encode()
+            + b'"\r\nContent-Type: text/csv\r\n\r\n' + content + b'\r\n--x--\r\n')
+
+
+def call(query, body, piece=64 * 1024):
+    scope = {'type': 'http', 'method': 'POST', 'path': '/api/predict-batch', 'query_string': query.encode(),
+             'headers': [(b'content-type', b'multipart/form-data; boundary=x')]}
+    pieces = [body[i:i + piece] for i in range(0, len(body), piece)]
+
+    async def receive():
+        return {'type': 'http.request', 'body': pieces.pop(0), 'more_body': bool(pieces)}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi.predict_batch(asgi.Request(scope, receive), send))
+    return sent[0]['status']
+
+
+@pytest.fixture
+def spooled(monkeypatch):
+    files = []
+
+    class Tracked(tempfile.SpooledTemporaryFile):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            files.append(self)
+
+    monkeypatch.setattr(asgi.tempfile, 'SpooledTemporaryFile', Tracked)
+    return files
+
+
+# Larger than SPOOL_BYTES, so the upload is on disk
+BIG_CSV = b'Loan_ID,Gender\n' + b'LP001002,Male\n' * (asgi.SPOOL_BYTES // 10)
+
+
+@pytest.mark.parametrize('query, filename', [
+    ('stream=ndjson&chunksize=0', 'big.csv'),   # rejected stream options
+    ('stream=bogus', 'big.csv'),
+    ('', 'big.txt'),                            # rejected upload
+])
+def test_rejected_upload_is_closed(spooled, query, filename):
+    assert call(query, multipart(filename, BIG_CSV)) == 400
+    assert len(spooled) == 1
+    assert spooled[0]._rolled and spooled[0].closed
@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.base import clone
+
+import compiled_ensemble
+from compiled_ensemble import CompiledEnsemble
+from model import FLOAT32_PARITY, LoanPredictor
+from training import ENSEMBLE_WEIGHTS, assemble_voting, build_estimators
+
+TRAIN_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'train_u6lujuX_CVtuZ9i.csv')
+
+
+@pytest.fixture(scope='module')
+def data():
+    """Scaled feature rows and labels of the shipped CSV."""
+    predictor = LoanPredictor()
+    df = predictor.preprocess_data(pd.read_csv(TRAIN_CSV), is_training=True)
+    X = df.drop(columns='Loan_Status')
+    y = df['Loan_Status'].map({'Y': 1, 'N': 0}).to_numpy()
+    return predictor.scaler.fit_transform(X), y
+
+
+@pytest.fixture(scope='module')
+def model(data):
+    """The ensemble's sub-estimators with fewer trees, as a soft-voting classifier."""
+    X, y = data
+    named = []
+    for name, estimator in build_estimators():
+        if 'n_estimators' in estimator.get_params():
+            estimator.set_params(n_estimators=20)
+        named.append((name, clone(estimator).fit(X, y)))
+    return assemble_voting(named, ENSEMBLE_WEIGHTS, y)
+
+
+@pytest.fixture(scope='module')
+def probe(data):
+    # Training rows plus rows spread around (and beyond) the scaled feature space
+    X, _ = data
+    return np.vstack([X, np.random.default_rng(1).normal(scale=2.0, size=(500, X.shape[1]))])
+
+
+def test_float64_parity(model, probe):
+    assert compiled_ensemble.parity_error(model, CompiledEnsemble.from_voting(model), probe) < 1e-9
+
+
+def test_float32_parity(model, probe):
+    compiled = CompiledEnsemble.from_voting(model, dtype=np.float32)
+    assert compiled.dtype == np.float32
+    assert compiled_ensemble.parity_error(model, compiled, probe) < FLOAT32_PARITY
+
+
+def test_arrays_round_trip(model, probe):
+    compiled = CompiledEnsemble.from_voting(model)
+    restored = CompiledEnsemble.from_arrays(compiled.to_arrays())
+    np.testing.assert_array_equal(compiled.predict_proba(probe), restored.predict_proba(probe))
+
+
+def test_failed_check_falls_back(model, data):
+    predictor = LoanPredictor()
+    predictor.model = model
+    predictor.feature_columns = list(range(data[0].shape[1]))
+    assert predictor._load_compiled(None) is not None
+    assert predictor.compiled_check['passed']
+
+    # Flip every random-forest leaf: the flattened copy no longer matches the model
+    arrays = CompiledEnsemble.from_voting(model).to_arrays()
+    arrays['rf.value'] = 1.0 - arrays['rf.value']
+    assert predictor._load_compiled(arrays) is None
+    assert not predictor.compiled_check['passed']
+    assert predictor.compiled_check['parity_error'] > predictor.compiled_check['tolerance']
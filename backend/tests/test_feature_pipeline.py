@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from feature_pipeline import UNKNOWN_POLICIES, UnknownCategoryError, parity_error
+from model import LoanPredictor
+
+TRAIN_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'train_u6lujuX_CVtuZ9i.csv')
+
+# float32 output against the float64 reference
+TOLERANCE = 1e-6
+
+
+@pytest.fixture(scope='module')
+def raw():
+    return pd.read_csv(TRAIN_CSV)
+
+
+def fitted(raw, policy='first'):
+    """A predictor with encoders, scaler and transformer fitted on ``raw`` (no model)."""
+    predictor = LoanPredictor(unknown_category=policy)
+    X = predictor.preprocess_data(raw, is_training=True).drop(columns='Loan_Status')
+    predictor.feature_columns = X.columns.tolist()
+    predictor.scaler.fit(X)
+    predictor._compile_features()
+    return predictor
+
+
+@pytest.fixture(scope='module', params=UNKNOWN_POLICIES)
+def predictor(request, raw):
+    return fitted(raw, request.param)
+
+
+def applications(raw):
+    return raw.drop(columns='Loan_Status').head(200).copy()
+
+
+def test_shipped_csv(predictor, raw):
+    assert parity_error(predictor, applications(raw)) < TOLERANCE
+
+
+def test_missing_categorical_columns(predictor, raw):
+    df = applications(raw).drop(columns=['Gender', 'Self_Employed'])
+    assert parity_error(predictor, df) < TOLERANCE
+
+
+def test_missing_values(predictor, raw):
+    df = applications(raw)
+    for col in ['Gender', 'Married', 'Dependents', 'Education', 'Property_Area']:
+        df.loc[df.index[::3], col] = None
+    for col in ['ApplicantIncome', 'CoapplicantIncome', 'LoanAmount', 'Loan_Amount_Term', 'Credit_History']:
+        df[col] = df[col].astype(object)
+        df.loc[df.index[1::4], col] = None
+    assert parity_error(predictor, df) < TOLERANCE
+
+
+def test_dependents(predictor, raw):
+    df = applications(raw)
+    df['Dependents'] = (['3+', '0', 2, None, 'many'] * len(df))[:len(df)]
+    assert parity_error(predictor, df) < TOLERANCE
+
+
+def test_missing_key_matches_absent_column(predictor, raw):
+    records = applications(raw).head(5).to_dict('records')
+    del records[2]['Property_Area']
+    batch = predictor.feature_pipeline.transform(records, unknown=predictor.unknown_category)
+    single = predictor.feature_pipeline.transform(records[2], unknown=predictor.unknown_category)
+    absent = predictor.feature_pipeline.transform(pd.DataFrame(records[2:3]), unknown=predictor.unknown_category)
+    np.testing.assert_array_equal(batch[2:3], single)
+    np.testing.assert_array_equal(single, absent)
+
+
+def test_unknown_categories(predictor, raw):
+    df = applications(raw)
+    df.loc[df.index[::5], 'Property_Area'] = 'Offshore'
+    df.loc[df.index[1::7], 'Education'] = 'PhD'
+    if predictor.unknown_category == 'error':
+        with pytest.raises(UnknownCategoryError):
+            parity_error(predictor, df)
+        transformer = predictor.feature_pipeline
+        for data in (df, df.to_dict('records'), df.to_dict('records')[0]):
+            with pytest.raises(UnknownCategoryError):
+                transformer.transform(data, unknown='error')
+    else:
+        assert parity_error(predictor, df) < TOLERANCE
+
+
+def test_unknown_counts(predictor, raw):
+    if predictor.unknown_category == 'error':
+        pytest.skip('error policy raises instead of counting')
+    df = applications(raw).head(10)
+    df['Property_Area'] = 'Offshore'
+    counts = {}
+    predictor.feature_pipeline.transform(df, unknown=predictor.unknown_category, counts=counts)
+    assert counts == {'Property_Area': 10}
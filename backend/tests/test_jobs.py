@@ -0,0 +1,69 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+from jobs import JobManager
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def write_job(jobs_dir, job_id, **fields):
+    state = {'id': job_id, 'status': 'running', 'rows_done': 10, 'rows_total': 100, 'progress': 0.1,
+             'created_at': time.time(), 'started_at': time.time(), 'finished_at': None, 'error': None,
+             'pid': os.getpid(), 'heartbeat_at': time.time(), **fields}
+    with open(os.path.join(jobs_dir, f'{job_id}.json'), 'w') as f:
+        json.dump(state, f)
+    with open(os.path.join(jobs_dir, f'{job_id}.csv'), 'w') as f:
+        f.write('Loan_ID\n')
+
+
+def manager(jobs_dir):
+    return JobManager(lambda chunk, offset: [], str(jobs_dir), stale_seconds=30)
+
+
+def test_job_of_dead_worker_fails_when_polled(tmp_path):
+    jobs = manager(tmp_path)
+    write_job(str(tmp_path), 'gone', pid=dead_pid())
+    state = jobs.status('gone')
+    assert state['status'] == 'failed' and 'resubmit' in state['error']
+    assert state['finished_at'] is not None
+    assert not os.path.exists(tmp_path / 'gone.csv')
+    assert json.loads((tmp_path / 'gone.json').read_text())['status'] == 'failed'
+
+
+def test_stale_heartbeat_fails(tmp_path):
+    jobs = manager(tmp_path)
+    write_job(str(tmp_path), 'stuck', heartbeat_at=time.time() - 120)
+    assert jobs.status('stuck')['status'] == 'failed'
+
+
+def test_live_job_is_left_alone(tmp_path):
+    jobs = manager(tmp_path)
+    write_job(str(tmp_path), 'live')
+    assert jobs.status('live')['status'] == 'running'
+
+
+def test_orphans_fail_at_startup(tmp_path):
+    write_job(str(tmp_path), 'gone', pid=dead_pid(), status='queued')
+    write_job(str(tmp_path), 'live')
+    manager(tmp_path)
+    assert json.loads((tmp_path / 'gone.json').read_text())['status'] == 'failed'
+    assert json.loads((tmp_path / 'live.json').read_text())['status'] == 'running'
+
+
+def test_submitted_job_records_owner(tmp_path):
+    jobs = JobManager(lambda chunk, offset: [{'n': len(chunk)}], str(tmp_path))
+    job_id = jobs.submit(io.BytesIO(b'a\n1\n2\n'))
+    for _ in range(100):
+        if jobs.status(job_id)['status'] == 'done':
+            break
+        time.sleep(0.01)
+    state = jobs.status(job_id)
+    assert state['status'] == 'done' and state['pid'] == os.getpid()
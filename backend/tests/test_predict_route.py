@@ -0,0 +1,7 @@
+import app
+
+
+def test_list_body_is_rejected():
+    payload, status = app._predict_result([{'ApplicantIncome': 5000}, {'ApplicantIncome': 3000}])
+    assert status == 400
+    assert '/api/predict-bulk' in payload['error']
@@ -0,0 +1,18 @@
+import numpy as np
+
+from prediction_cache import PredictionCache
+
+
+def test_generations_do_not_share_entries():
+    cache = PredictionCache(maxsize=10, ttl=60)
+    row = np.arange(5, dtype=np.float32).reshape(1, -1)
+    # A request still running on the old model stores its result after the swap
+    cache.put(cache.key(row, 1), {'prediction': 'Rejected'})
+    assert cache.get(cache.key(row, 2)) is None
+    assert cache.get(cache.key(row, 1)) == {'prediction': 'Rejected'}
+
+
+def test_same_row_same_key():
+    row = np.linspace(-1, 1, 8, dtype=np.float32).reshape(1, -1)
+    assert PredictionCache.key(row, 3) == PredictionCache.key(row.copy(), 3)
+    assert PredictionCache.key(row, 3) != PredictionCache.key(row * 2, 3)
@@ -0,0 +1,35 @@
+import time
+
+from model import BUNDLE_FILE
+from registry import FAILED, READY, ModelRegistry
+
+
+class FlakyPredictor:
+    """Fails to load the first ``failures`` times (across instances)."""
+    attempts = 0
+    failures = 1
+
+    def load_model(self, model_dir, backend='sklearn'):
+        FlakyPredictor.attempts += 1
+        if FlakyPredictor.attempts <= self.failures:
+            raise OSError('bundle is still being written')
+
+
+def test_failed_load_is_retried_after_backoff(tmp_path):
+    (tmp_path / BUNDLE_FILE).write_bytes(b'')
+    FlakyPredictor.attempts = 0
+    registry = ModelRegistry(factory=FlakyPredictor, model_dir=str(tmp_path), retry_seconds=0.05)
+
+    assert not registry.load()
+    assert registry.state == FAILED
+    assert 0 < registry.retry_in() <= 0.05
+
+    # Too soon: no new attempt
+    registry.load_in_background()
+    assert registry.state == FAILED and FlakyPredictor.attempts == 1
+
+    time.sleep(0.06)
+    assert registry.retry_in() == 0
+    assert registry.load()
+    assert registry.state == READY and registry.error is None
+    assert registry.retry_in() is None
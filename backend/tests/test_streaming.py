@@ -0,0 +1,33 @@
+import csv
+import io
+import json
+
+import app
+
+
+class FailingPredictor:
+    def predict_many(self, df, explain=False):
+        raise ValueError('bad value "3,5" in column "LoanAmount"')
+
+
+def stream(predictor, body, stream_format):
+    return ''.join(app._stream_predictions(predictor, io.BytesIO(body.encode()), stream_format, 2))
+
+
+def test_csv_error_row_is_csv():
+    rows = list(csv.reader(io.StringIO(stream(FailingPredictor(), 'Loan_ID,Gender\nLP1,Male\n', 'csv'))))
+    assert rows[0] == app.STREAM_CSV_COLUMNS
+    assert rows[1] == ['0', 'Error', '', '', 'bad value "3,5" in column "LoanAmount"']
+
+
+def test_malformed_upload_csv():
+    # Too many fields on the third line: pandas fails part-way through the stream
+    rows = list(csv.reader(io.StringIO(stream(None, 'a,b\n1,2\n3,4,5,6\n', 'csv'))))
+    assert all(len(row) == len(app.STREAM_CSV_COLUMNS) for row in rows)
+    assert rows[-1][1] == 'Error' and rows[-1][4]
+
+
+def test_ndjson_error_line():
+    lines = stream(FailingPredictor(), 'Loan_ID,Gender\nLP1,Male\n', 'ndjson').splitlines()
+    assert json.loads(lines[-1]) == {'loan_id': 0, 'prediction': 'Error',
+                                     'error': 'bad value "3,5" in column "LoanAmount"'}
@@ -0,0 +1,266 @@
+"""
+Training engine for the soft-voting ensemble.
+
+``cross_val_score(n_jobs=-1)`` over a ``VotingClassifier(n_jobs=-1)`` of
+``n_jobs=-1`` forests nests three levels of parallelism, each sized to
+every core. Here the unit of work is one sub-estimator on one fold (plus
+one per sub-estimator for the final model), all scheduled on a single
+pool of ``workers`` processes with single-threaded estimators inside, so
+the machine is never oversubscribed.
+
+Fold splits and their matrices are computed once (``FoldCache``) and
+shared by the optional hyperparameter search, the cross-validation and
+the out-of-fold metrics. The final ``VotingClassifier`` is assembled from
+the already fitted sub-estimators instead of being refitted.
+"""
+
+import os
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.ensemble import (
+    RandomForestClassifier,
+    GradientBoostingClassifier,
+    VotingClassifier,
+    ExtraTreesClassifier,
+)
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, roc_auc_score
+from sklearn.model_selection import HalvingGridSearchCV, StratifiedKFold
+from sklearn.preprocessing import LabelEncoder
+from sklearn.utils import Bunch
+
+# Soft-voting weights, in estimator order (GB gets the most weight)
+ENSEMBLE_WEIGHTS = [3, 4, 2, 1]
+
+# Sub-estimators that take n_jobs
+FOREST_NAMES = ('rf', 'et')
+
+# Sub-estimators that may copy X to float64 when fitting (lbfgs logistic regression)
+LINEAR_NAMES = ('lr',)
+
+# Grids for the optional successive-halving search, per sub-estimator.
+# The defaults in build_estimators() are always among the candidates.
+SEARCH_SPACE = {
+    'rf': {'max_depth': [8, 12, None], 'min_samples_leaf': [1, 2, 4]},
+    'gb': {'learning_rate': [0.03, 0.05, 0.1], 'max_depth': [3, 4, 5]},
+    'et': {'max_depth': [8, 12, None], 'min_samples_leaf': [1, 2, 4]},
+    'lr': {'C': [0.1, 0.3, 1.0, 3.0]},
+}
+
+
+def build_estimators(params=None, n_jobs=1):
+    """
+    The ensemble's sub-estimators as (name, estimator) pairs.
+    ``params`` maps a name to hyperparameter overrides (e.g. search results).
+    """
+    estimators = [
+        ('rf', RandomForestClassifier(
+            n_estimators=300,
+            max_depth=12,
+            min_samples_split=3,
+            min_samples_leaf=1,
+            max_features='sqrt',
+            class_weight='balanced',
+            random_state=42,
+            n_jobs=n_jobs,
+        )),
+        ('gb', GradientBoostingClassifier(
+            n_estimators=300,
+            learning_rate=0.05,
+            max_depth=4,
+            min_samples_split=4,
+            min_samples_leaf=2,
+            subsample=0.85,
+            max_features='sqrt',
+            random_state=42,
+        )),
+        ('et', ExtraTreesClassifier(
+            n_estimators=300,
+            max_depth=12,
+            min_samples_split=3,
+            min_samples_leaf=1,
+            class_weight='balanced',
+            random_state=42,
+            n_jobs=n_jobs,
+        )),
+        ('lr', LogisticRegression(
+            C=1.0,
+            max_iter=1000,
+            class_weight='balanced',
+            random_state=42,
+        )),
+    ]
+    for name, estimator in estimators:
+        estimator.set_params(**(params or {}).get(name, {}))
+    return estimators
+
+
+def resolve_workers(workers=None):
+    """Worker budget: ``workers``, else $TRAIN_WORKERS, else every CPU."""
+    if workers is None:
+        workers = int(os.getenv('TRAIN_WORKERS', 0)) or os.cpu_count() or 1
+    return max(1, int(workers))
+
+
+class FoldCache:
+    """Stratified fold indices and per-fold matrices, computed once."""
+
+    def __init__(self, X, y, n_splits=5, random_state=42):
+        self.X = np.ascontiguousarray(X)
+        self.y = np.asarray(y)
+        # n_splits < 2: no cross-validation, only the final fit
+        cv = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state) if n_splits >= 2 else None
+        self.splits = list(cv.split(self.X, self.y)) if cv else []
+        self._folds = {}
+
+    def __len__(self):
+        return len(self.splits)
+
+    def fold(self, i):
+        """(X_train, y_train, X_val, y_val) of fold ``i``."""
+        if i not in self._folds:
+            train, val = self.splits[i]
+            self._folds[i] = (self.X[train], self.y[train], self.X[val], self.y[val])
+        return self._folds[i]
+
+
+def _fit(estimator, X, y):
+    return estimator.fit(X, y)
+
+
+def assemble_voting(named_models, weights, y):
+    """A fitted VotingClassifier built from already fitted sub-estimators."""
+    voting = VotingClassifier(
+        estimators=[(name, clone(model)) for name, model in named_models],
+        voting='soft',
+        weights=weights,
+    )
+    voting.le_ = LabelEncoder().fit(y)
+    voting.classes_ = voting.le_.classes_
+    voting.estimators_ = [model for _, model in named_models]
+    voting.named_estimators_ = Bunch(**dict(named_models))
+    return voting
+
+
+def search_hyperparameters(estimators, folds, workers, space=SEARCH_SPACE):
+    """
+    Successive-halving grid search per sub-estimator over the cached folds.
+    Returns (best params per name, search report).
+    """
+    best, report = {}, {}
+    for name, estimator in estimators:
+        grid = space.get(name)
+        if not grid:
+            continue
+        start = time.perf_counter()
+        search = HalvingGridSearchCV(
+            estimator, grid, cv=folds.splits, factor=3, scoring='accuracy',
+            random_state=42, n_jobs=workers, refit=False,
+        )
+        search.fit(folds.X, folds.y)
+        best[name] = search.best_params_
+        report[name] = {
+            'best_params': search.best_params_,
+            'best_score': float(search.best_score_),
+            'candidates': int(search.n_candidates_[0]),
+            'iterations': int(search.n_iterations_),
+            'seconds': time.perf_counter() - start,
+        }
+        print(f"  {name}: {search.best_params_}  (cv {search.best_score_:.4f})")
+    return best, report
+
+
+def _cross_validation(folds, models, names):
+    """CV figures from the fold models: soft vote on each held-out fold."""
+    oof = np.empty(len(folds.y))
+    fold_scores, member_scores = [], {name: [] for name in names}
+    for i in range(len(folds)):
+        _, _, X_val, y_val = folds.fold(i)
+        probas = [models[(i, name)].predict_proba(X_val)[:, 1] for name in names]
+        for name, p in zip(names, probas):
+            member_scores[name].append(accuracy_score(y_val, p > 0.5))
+        p = np.average(probas, axis=0, weights=ENSEMBLE_WEIGHTS)
+        oof[folds.splits[i][1]] = p
+        fold_scores.append(accuracy_score(y_val, p > 0.5))
+
+    return {
+        'cv_scores':          [float(s) for s in fold_scores],
+        'cv_accuracy_mean':   float(np.mean(fold_scores)),
+        'cv_accuracy_std':    float(np.std(fold_scores)),
+        'cv_member_accuracy': {name: float(np.mean(s)) for name, s in member_scores.items()},
+        'oof_roc_auc':        float(roc_auc_score(folds.y, oof)),
+    }
+
+
+def train_ensemble(X, y, workers=None, search=False, n_splits=5, max_linear_rows=None):
+    """
+    Fit the ensemble on (X, y) with cross-validation (skipped when
+    ``n_splits`` < 2, e.g. for disk-backed matrices too large to copy per fold).
+
+    Trees use float32 C-contiguous X as is. The linear member may copy it
+    to float64, so with ``max_linear_rows`` it is fitted on only the first
+    that many rows, which must then be in random order.
+
+    Returns (VotingClassifier, report). The report carries the CV accuracy
+    per fold, per-sub-estimator CV accuracy, out-of-fold ROC-AUC, the
+    search results (if any) and timings.
+    """
+    workers = resolve_workers(workers)
+    start = time.perf_counter()
+    folds = FoldCache(X, y, n_splits=n_splits)
+    report = {'workers': workers, 'folds': len(folds)}
+
+    params = None
+    if search and not len(folds):
+        raise ValueError("Hyperparameter search needs cross-validation folds (n_splits >= 2)")
+    if search:
+        print(f"Searching hyperparameters (successive halving, {workers} workers)...")
+        params, report['search'] = search_hyperparameters(build_estimators(), folds, workers)
+
+    # One task per (fold, sub-estimator) plus the final fit of each
+    # sub-estimator; forests only get inner threads the pool leaves idle.
+    estimators = build_estimators(params)
+    tasks = [(i, name) for i in range(len(folds)) for name, _ in estimators]
+    tasks += [(None, name) for name, _ in estimators]
+    inner_jobs = max(1, workers // len(tasks))
+    by_name = {name: est for name, est in estimators}
+    for name in FOREST_NAMES:
+        by_name[name].set_params(n_jobs=inner_jobs)
+
+    def data(i, name):
+        X_fit, y_fit = folds.fold(i)[:2] if i is not None else (folds.X, folds.y)
+        if name in LINEAR_NAMES and max_linear_rows is not None:
+            return X_fit[:max_linear_rows], y_fit[:max_linear_rows]
+        return X_fit, y_fit
+
+    if max_linear_rows is not None:
+        report['linear_rows'] = min(int(max_linear_rows), len(folds.y))
+
+    print(f"Fitting {len(tasks)} models ({len(folds)} folds x {len(estimators)} estimators + final) "
+          f"on {workers} workers...")
+    fit_start = time.perf_counter()
+    fitted = Parallel(n_jobs=workers)(
+        delayed(_fit)(clone(by_name[name]), *data(i, name))
+        for i, name in tasks
+    )
+    report['fit_seconds'] = time.perf_counter() - fit_start
+    models = dict(zip(tasks, fitted))
+
+    names = [name for name, _ in estimators]
+    if len(folds):
+        report.update(_cross_validation(folds, models, names))
+
+    # Serve with the forests' original n_jobs=-1 prediction setting
+    final = [(name, models[(None, name)]) for name in names]
+    for name, model in final:
+        if name in FOREST_NAMES:
+            model.set_params(n_jobs=-1)
+    voting = assemble_voting(final, ENSEMBLE_WEIGHTS, folds.y)
+    if params:
+        report['params'] = params
+    report['seconds'] = time.perf_counter() - start
+    return voting, report